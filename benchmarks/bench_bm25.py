@@ -0,0 +1,88 @@
+"""
+Latenza top-k di BM25Index (MaxScore) contro il punteggio esaustivo di tutte le
+posting dei termini della query, su un corpus sintetico con distribuzione di
+Zipf (poche parole molto frequenti, come il testo reale) e query lunghe.
+Verifica anche che i risultati coincidano.
+
+Uso (dalla radice del progetto):
+    python -m benchmarks.bench_bm25 --chunks 200000 --query-terms 4 16 32
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from vec_rag.chunking.records import ChunkRecord
+from vec_rag.index.bm25 import BM25Index, tokenize
+
+
+def make_records(n, vocabulary, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        words = np.minimum(rng.zipf(1.3, size=rng.integers(50, 300)), vocabulary)
+        text = " ".join(f"w{word}" for word in words)
+        yield ChunkRecord(chunk_id=f"c{i}", text=text, source="synthetic", index=i,
+                          page=None, start=0, end=len(text), token_count=len(words))
+
+
+def exhaustive_search(index, query, k):
+    """Punteggio completo di tutte le posting dei termini della query, senza potatura (riferimento)."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    all_scores, all_ids = [], []
+    for segment in index.segments:
+        docs = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0)
+        for term in terms:
+            term_id = segment.term_ids.get(term)
+            if term_id is None:
+                continue
+            idf = index._idf(sum(s.df(term) for s in index.segments))
+            term_docs, tfs = segment.postings(term_id)
+            term_scores = index._term_scores(idf, tfs, segment.doc_lengths[term_docs])
+            docs, inverse = np.unique(np.concatenate([docs, term_docs]), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate([scores, term_scores]), minlength=len(docs))
+        all_scores.append(scores)
+        all_ids.extend(segment.doc_ids[doc] for doc in docs)
+    scores = np.concatenate(all_scores) if all_scores else np.zeros(0)
+    order = np.argsort(-scores, kind="stable")[:k]
+    return [(all_ids[i], float(scores[i])) for i in order]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--segment-size", type=int, default=50000, help="Chunk per segmento")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--query-terms", type=int, nargs="+", default=[4, 16, 32])
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        index = BM25Index(directory)
+        index.add(make_records(args.chunks, args.vocabulary), segment_size=args.segment_size)
+        print(f"{len(index)} chunk, {len(index.segments)} segmenti: costruzione {time.perf_counter() - start:.2f}s")
+
+        rng = np.random.default_rng(1)
+        for num_terms in args.query_terms:
+            queries = [" ".join(f"w{word}" for word in np.minimum(rng.zipf(1.3, size=num_terms), args.vocabulary))
+                       for _ in range(args.queries)]
+
+            start = time.perf_counter()
+            found = [index.search(query, args.k) for query in queries]
+            fast = time.perf_counter() - start
+            start = time.perf_counter()
+            expected = [exhaustive_search(index, query, args.k) for query in queries]
+            slow = time.perf_counter() - start
+
+            for f, e in zip(found, expected):
+                assert np.allclose([score for _, score in f], [score for _, score in e], rtol=1e-4), \
+                    "I punteggi top-k non coincidono con il calcolo esaustivo"
+            print(f"  {num_terms:>3} termini: MaxScore {fast / args.queries * 1e3:8.2f} ms/query, "
+                  f"esaustivo {slow / args.queries * 1e3:8.2f} ms/query, speedup x{slow / fast:.1f}")
+
+
+if __name__ == "__main__":
+    main()
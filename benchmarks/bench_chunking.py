@@ -0,0 +1,198 @@
+"""
+Benchmark delle strategie di ChunkManager su corpora sintetici di dimensione
+crescente e sul paper di esempio in temp/. Per ogni coppia (strategia, corpus)
+misura chunk/s, token/s, picco di RSS, distribuzione della dimensione dei chunk
+(in token) e rapporto di overlap, e scrive i risultati in JSON per confrontare
+build diverse. Ogni caso gira in un sottoprocesso separato, cosi' il picco di
+RSS e' quello del solo caso. Il chunking semantico usa il backend di embedding
+locale "hashing", quindi il benchmark funziona offline.
+
+Uso (dalla radice del progetto):
+    python -m benchmarks.bench_chunking --corpus-mb 1 4 --output bench_chunking.json
+    python -m benchmarks.bench_chunking --strategies sentence-aware fixed_size --no-sample
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.bench_segmenter import load_sample_text
+
+_WORDS = ("the attention model layer encoder decoder training data sequence network output input "
+          "weights learning rate heads transformer results table figure il modello della rete con "
+          "dati risultati per una valore").split()
+
+
+def _sentence(rng):
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 30))).capitalize() + rng.choice(".....?!")
+
+
+def make_document(rng, target_chars):
+    """Documento sintetico misto: prosa a paragrafi, elenchi e righe corte tipo tabella."""
+    parts = []
+    size = 0
+    while size < target_chars:
+        kind = rng.random()
+        if kind < 0.6:
+            block = " ".join(_sentence(rng) for _ in range(rng.randint(3, 12)))
+        elif kind < 0.8:
+            block = "\n".join(f"- {_sentence(rng)}" for _ in range(rng.randint(3, 10)))
+        else:
+            block = "\n".join(" | ".join(str(rng.randint(0, 999)) for _ in range(5)) for _ in range(rng.randint(3, 10)))
+        parts.append(block)
+        size += len(block) + 2
+    return "\n\n".join(parts)
+
+
+def write_corpus(directory, total_mb, doc_kb=100, seed=0):
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    num_docs = max(1, int(total_mb * 1024 / doc_kb))
+    for i in range(num_docs):
+        (directory / f"doc_{i:05d}.txt").write_text(make_document(rng, doc_kb * 1024), encoding='utf-8')
+    return num_docs
+
+
+def _overlap_ratio(records):
+    """Frazione di testo dei chunk che ripete testo gia' coperto da altri chunk dello stesso documento."""
+    by_source = {}
+    for record in records:
+        if record.start is not None:
+            by_source.setdefault(record.source, []).append((record.start, record.end))
+    total = covered = 0
+    for spans in by_source.values():
+        spans.sort()
+        current_start = current_end = None
+        for start, end in spans:
+            total += end - start
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    covered += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            covered += current_end - current_start
+    return (total - covered) / total if total else 0.0
+
+
+def run_case(case):
+    """Esegue un caso nel processo corrente e restituisce le metriche."""
+    from vec_rag.chunking.chunk import ChunkManager
+
+    manager = ChunkManager(case["directory"], embedding_backend="hashing", use_embedding_cache=False,
+                           **case["options"])
+    start = time.perf_counter()
+    records = list(manager.iter_chunks(case["strategy"], max_workers=case["workers"]))
+    seconds = time.perf_counter() - start
+
+    tokens = np.array([record.token_count for record in records], dtype=np.int64)
+    corpus_bytes = sum(path.stat().st_size for path in Path(case["directory"]).glob("*.txt"))
+    result = {
+        "strategy": case["strategy"],
+        "corpus": case["corpus"],
+        "corpus_bytes": corpus_bytes,
+        "workers": case["workers"],
+        "seconds": seconds,
+        "chunks": len(records),
+        "chunks_per_sec": len(records) / seconds if seconds else 0.0,
+        "tokens_per_sec": float(tokens.sum()) / seconds if seconds else 0.0,
+        "mb_per_sec": corpus_bytes / seconds / 1e6 if seconds else 0.0,
+        # ru_maxrss e' in KB su Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "overlap_ratio": _overlap_ratio(records),
+        "located_ratio": sum(record.start is not None for record in records) / len(records) if records else 0.0,
+    }
+    if len(tokens):
+        result["chunk_tokens"] = {
+            "min": int(tokens.min()),
+            "p50": float(np.percentile(tokens, 50)),
+            "p90": float(np.percentile(tokens, 90)),
+            "p99": float(np.percentile(tokens, 99)),
+            "max": int(tokens.max()),
+            "mean": float(tokens.mean()),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus-mb", type=float, nargs="+", default=[1, 4, 16], help="Dimensioni dei corpora sintetici")
+    parser.add_argument("--doc-kb", type=int, default=100, help="Dimensione di ogni documento sintetico")
+    parser.add_argument("--strategies", nargs="+", default=None, help="Default: tutte quelle di _chunking_strategies")
+    parser.add_argument("--no-sample", action="store_true", help="Non includere il paper di esempio in temp/")
+    parser.add_argument("--workers", type=int, default=None, help="Processi per il chunking (default: seriale)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--output", default=None, help="File JSON dei risultati (default: stampa su stdout)")
+    parser.add_argument("--run-case", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        # Sottoprocesso: esegue un solo caso e stampa le metriche
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    strategies = args.strategies
+    if strategies is None:
+        from vec_rag.chunking.chunk import ChunkManager
+        with tempfile.TemporaryDirectory() as empty_dir:
+            strategies = list(ChunkManager(empty_dir)._chunking_strategies)
+
+    options = {"chunk_size": args.chunk_size, "max_tokens_per_chunk": args.max_tokens}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        corpora = []
+        if not args.no_sample:
+            sample_dir = Path(tmp) / "sample"
+            sample_dir.mkdir()
+            (sample_dir / "sample.txt").write_text(load_sample_text(), encoding='utf-8')
+            corpora.append(("sample_pdf", sample_dir))
+        for total_mb in args.corpus_mb:
+            corpus_dir = Path(tmp) / f"synthetic_{total_mb}mb"
+            write_corpus(corpus_dir, total_mb, args.doc_kb)
+            corpora.append((f"synthetic_{total_mb}mb", corpus_dir))
+
+        for corpus, directory in corpora:
+            for strategy in strategies:
+                case = {"strategy": strategy, "corpus": corpus, "directory": str(directory),
+                        "workers": args.workers, "options": options}
+                completed = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_chunking", "--run-case", json.dumps(case)],
+                    capture_output=True, text=True, cwd=os.getcwd(),
+                )
+                if completed.returncode != 0:
+                    error = completed.stderr.strip().splitlines()[-1:] or ["errore sconosciuto"]
+                    print(f"{corpus:>18} {strategy:>15}: FALLITO ({error[0]})", file=sys.stderr)
+                    results.append({"strategy": strategy, "corpus": corpus, "error": error[0]})
+                    continue
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+                results.append(result)
+                print(f"{corpus:>18} {strategy:>15}: {result['chunks']:>7} chunk, "
+                      f"{result['chunks_per_sec']:>9.0f} chunk/s, {result['tokens_per_sec']:>10.0f} token/s, "
+                      f"RSS {result['peak_rss_mb']:6.0f} MB, overlap {result['overlap_ratio']:.2f}", file=sys.stderr)
+
+    report = {
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "options": options,
+        "workers": args.workers,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Recall@k contro latenza di IVFIndex al variare di nprobe, rispetto alla ricerca
+esatta di ExactIndex, su dati sintetici a cluster (come gli embedding reali) o
+su un VectorStore esistente.
+
+Uso (dalla radice del progetto):
+    python -m benchmarks.bench_ivf --n 200000 --dim 128 --nlist 512 --nprobe 1 4 16 64
+    python -m benchmarks.bench_ivf --store vector_db/vectors --nlist 256
+"""
+import argparse
+import time
+
+import numpy as np
+
+from vec_rag.index.exact import ExactIndex
+from vec_rag.index.ivf import IVFIndex
+
+
+def make_clustered(n, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + rng.standard_normal((n, dim), dtype=np.float32)
+
+
+def recall_at_k(found, expected):
+    hits = sum(len(np.intersect1d(f, e)) for f, e in zip(found, expected))
+    return hits / expected.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=1000, help="Cluster dei dati sintetici")
+    parser.add_argument("--store", default=None, help="Usa i vettori di un VectorStore invece dei dati sintetici")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=512)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--metric", default="cosine", choices=["cosine", "ip", "l2"])
+    args = parser.parse_args()
+
+    if args.store:
+        from vec_rag.embedding.store import VectorStore
+        vectors = VectorStore(args.store).vectors
+    else:
+        vectors = make_clustered(args.n, args.dim, args.clusters)
+    rng = np.random.default_rng(1)
+    queries = np.asarray(vectors[np.sort(rng.choice(len(vectors), args.queries, replace=False))], dtype=np.float32)
+    queries = queries + 0.1 * rng.standard_normal(queries.shape, dtype=np.float32)
+
+    exact = ExactIndex(vectors, metric=args.metric)
+    start = time.perf_counter()
+    _, expected = exact.search(queries, args.k)
+    exact_seconds = time.perf_counter() - start
+    print(f"n={len(vectors)} dim={vectors.shape[1]} k={args.k} metric={args.metric}")
+    print(f"  esatta: {args.queries / exact_seconds:8.1f} QPS, {exact_seconds / args.queries * 1e3:7.3f} ms/query")
+
+    start = time.perf_counter()
+    ivf = IVFIndex(nlist=args.nlist, metric=args.metric, num_threads=args.threads).build(vectors)
+    print(f"  IVF nlist={args.nlist}: costruzione {time.perf_counter() - start:.2f}s")
+    for nprobe in args.nprobe:
+        start = time.perf_counter()
+        _, found = ivf.search(queries, args.k, nprobe=nprobe)
+        seconds = time.perf_counter() - start
+        print(f"    nprobe {nprobe:>4}: recall@{args.k} {recall_at_k(found, expected):.3f}, "
+              f"{args.queries / seconds:8.1f} QPS, {seconds / args.queries * 1e3:7.3f} ms/query, "
+              f"speedup x{exact_seconds / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
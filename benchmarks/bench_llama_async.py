@@ -0,0 +1,53 @@
+"""
+Throughput del client asincrono di LlamaParse contro il server stub locale,
+al variare del limite di concorrenza. Non usa il servizio reale.
+
+Uso (dalla radice del progetto):
+    python -m benchmarks.bench_llama_async --documents 50 --latency 1.0
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.llama_stub import StubLlamaParseServer
+from input_module.pdf_input.llama_async import AsyncLlamaExtractor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=1.0, help="Secondi di elaborazione simulati per documento")
+    parser.add_argument("--rate", type=float, default=50.0, help="Invii al secondo consentiti")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, StubLlamaParseServer(latency=args.latency) as server:
+        input_dir = Path(tmp) / "input"
+        input_dir.mkdir()
+        pdf_paths = []
+        for i in range(args.documents):
+            pdf_path = input_dir / f"doc_{i:04d}.pdf"
+            pdf_path.write_bytes(b"%PDF-1.4\n% stub\n%%EOF\n")
+            pdf_paths.append(pdf_path)
+
+        for concurrency in args.concurrency:
+            extractor = AsyncLlamaExtractor(
+                Path(tmp) / f"out_{concurrency}",
+                max_concurrency=concurrency,
+                requests_per_second=args.rate,
+                burst=concurrency,
+                api_key="llx-stub",
+                base_url=server.url,
+                check_interval=1,
+            )
+            start = time.perf_counter()
+            results = extractor.run(pdf_paths)
+            elapsed = time.perf_counter() - start
+            ok = sum(result["status"] == "ok" for result in results)
+            print(f"concorrenza {concurrency:>3}: {ok}/{len(results)} documenti in {elapsed:6.2f}s "
+                  f"({len(results) / elapsed:6.2f} doc/s)")
+
+
+if __name__ == "__main__":
+    main()
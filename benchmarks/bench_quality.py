@@ -0,0 +1,73 @@
+"""
+Micro-benchmark del controllo di qualita' del testo estratto: confronta la
+versione originale di _is_extracted_text_valid (piu' passate Python sul testo)
+con TextQualityScorer.
+
+Uso (dalla radice del progetto):
+    python -m benchmarks.bench_quality --size-mb 4 --repeat 5
+"""
+import argparse
+import random
+import time
+
+from input_module.utils.quality import TextQualityScorer
+
+
+def legacy_is_extracted_text_valid(text, min_words_per_page=10, min_valid_chars_ratio=0.7):
+    """Implementazione originale di ExtractorManager._is_extracted_text_valid."""
+    if not text.strip():
+        return False
+    words = text.split()
+    if len(words) < min_words_per_page:
+        return False
+    valid_chars = sum(1 for c in text if c.isalnum() or c.isspace() or c in '.,;:!?()-')
+    total_chars = len(text)
+    if total_chars == 0 or valid_chars / total_chars < min_valid_chars_ratio:
+        return False
+    unusual_patterns = ['���', '###', '...', '   ']
+    for pattern in unusual_patterns:
+        if pattern in text:
+            return False
+    return True
+
+
+def make_text(size_bytes, non_ascii=False, seed=0):
+    rng = random.Random(seed)
+    words = ["attention", "model", "layer", "the", "of", "encoder", "decoder", "training", "della", "rete"]
+    if non_ascii:
+        words += ["perché", "città", "così", "più"]
+    parts, length = [], 0
+    while length < size_bytes:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(5, 20))).capitalize() + ". "
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)
+
+
+def time_function(function, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=4.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    scorer = TextQualityScorer()
+    size = int(args.size_mb * 1024 * 1024)
+    for label, text in (("ascii", make_text(size)), ("non-ascii", make_text(size, non_ascii=True))):
+        assert legacy_is_extracted_text_valid(text) == scorer.score(text).is_valid()
+        legacy = time_function(legacy_is_extracted_text_valid, text, args.repeat)
+        scored = time_function(scorer.score, text, args.repeat)
+        print(f"{label:>9} {len(text) / 1e6:.1f}M caratteri: originale {legacy * 1000:8.1f} ms, "
+              f"scorer {scored * 1000:8.1f} ms, speedup x{legacy / scored:.1f}")
+
+
+if __name__ == "__main__":
+    main()
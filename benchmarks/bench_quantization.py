@@ -0,0 +1,62 @@
+"""
+Memoria e perdita di recall delle modalita' di quantizzazione (int8 scalare e
+product quantization, con e senza re-ranking esatto) rispetto alla ricerca
+esatta su float32.
+
+Uso (dalla radice del progetto):
+    python -m benchmarks.bench_quantization --n 100000 --dim 384 --pq-m 48 96
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_ivf import make_clustered, recall_at_k
+from vec_rag.index.exact import ExactIndex
+from vec_rag.index.quantization import ProductQuantizer, QuantizedIndex, ScalarQuantizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-m", type=int, nargs="+", default=[48, 96], help="Sottovettori (byte per vettore) del PQ")
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--metric", default="cosine", choices=["cosine", "ip", "l2"])
+    args = parser.parse_args()
+
+    vectors = make_clustered(args.n, args.dim, args.clusters)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.n, args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape, dtype=np.float32)
+
+    exact = ExactIndex(vectors, metric=args.metric)
+    start = time.perf_counter()
+    _, expected = exact.search(queries, args.k)
+    seconds = time.perf_counter() - start
+    print(f"n={args.n} dim={args.dim} k={args.k} metric={args.metric}")
+    print(f"  {'float32 esatta':>24}: {vectors.nbytes / 2**20:8.1f} MB ({vectors.nbytes / args.n:6.0f} B/vettore), "
+          f"recall@{args.k} 1.000, {args.queries / seconds:7.1f} QPS")
+
+    modes = [("int8", lambda: ScalarQuantizer())] + [(f"PQ m={m}", lambda m=m: ProductQuantizer(m)) for m in args.pq_m]
+    for name, make_quantizer in modes:
+        start = time.perf_counter()
+        index = QuantizedIndex(make_quantizer(), metric=args.metric, rerank_vectors=vectors,
+                               rerank_factor=args.rerank_factor).build(vectors)
+        build_seconds = time.perf_counter() - start
+        memory = index.memory_bytes()
+        for rerank in (False, True):
+            start = time.perf_counter()
+            _, found = index.search(queries, args.k, rerank=rerank)
+            seconds = time.perf_counter() - start
+            label = f"{name}{' + rerank' if rerank else ''}"
+            print(f"  {label:>24}: {memory / 2**20:8.1f} MB ({memory / args.n:6.1f} B/vettore), "
+                  f"recall@{args.k} {recall_at_k(found, expected):.3f}, {args.queries / seconds:7.1f} QPS"
+                  f"{f', costruzione {build_seconds:.1f}s' if not rerank else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Accuratezza e throughput di RegexSentenceSegmenter contro nltk.sent_tokenize:
+- su un piccolo insieme di frasi annotate a mano (abbreviazioni, decimali,
+  citazioni, punteggiatura italiana e inglese);
+- sul paper di esempio in temp/, misurando l'accordo dei confini con NLTK
+  (precision/recall rispetto a punkt) e i MB/s di entrambi.
+
+Uso (dalla radice del progetto):
+    python -m benchmarks.bench_segmenter --repeat 20
+"""
+import argparse
+import time
+
+import nltk
+import PyPDF2
+
+from input_module.utils.tools import find_project_root
+from vec_rag.chunking.segmenter import RegexSentenceSegmenter
+
+CASES = [
+    ("Vaswani et al. [31] proposed the Transformer. It relies on attention.",
+     ["Vaswani et al. [31] proposed the Transformer.", "It relies on attention."]),
+    ("The model reaches 28.4 BLEU. Training took 3.5 days on 8 GPUs.",
+     ["The model reaches 28.4 BLEU.", "Training took 3.5 days on 8 GPUs."]),
+    ("See Fig. 2 and Eq. 3 for details. The results are in Tab. 1.",
+     ["See Fig. 2 and Eq. 3 for details.", "The results are in Tab. 1."]),
+    ("Is attention all you need? We think so! Let us see.",
+     ["Is attention all you need?", "We think so!", "Let us see."]),
+    ("Il Dott. Rossi e il Prof. Bianchi sono arrivati. Poi sono ripartiti.",
+     ["Il Dott. Rossi e il Prof. Bianchi sono arrivati.", "Poi sono ripartiti."]),
+    ("Serve pazienza, cfr. cap. 3. Perché? Perché sì.",
+     ["Serve pazienza, cfr. cap. 3.", "Perché?", "Perché sì."]),
+    ("A. Vaswani and N. Shazeer wrote it, e.g. in Sec. 3. It was published in 2017.",
+     ["A. Vaswani and N. Shazeer wrote it, e.g. in Sec. 3.", "It was published in 2017."]),
+    ("He said \"it works.\" Then he left. (This was expected.) Nobody objected.",
+     ["He said \"it works.\"", "Then he left.", "(This was expected.)", "Nobody objected."]),
+    ("Take vitamin C. The rod is 3 m. Say no. See No. 5 instead.",
+     ["Take vitamin C.", "The rod is 3 m.", "Say no.", "See No. 5 instead."]),
+    ("Andiamo al mare. Siamo arrivati al. Poi si vedra'.",
+     ["Andiamo al mare.", "Siamo arrivati al.", "Poi si vedra'."]),
+]
+
+
+def load_sample_text():
+    pdf_path = next((find_project_root(marker_name="RAGnarok") / "temp").glob("*.pdf"))
+    with open(pdf_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        return ''.join((page.extract_text() or '') + "\n" for page in reader.pages)
+
+
+def boundaries(text, sentences):
+    """Offset di fine di ogni frase nel testo (le frasi sono sottostringhe in ordine)."""
+    ends = set()
+    cursor = 0
+    for sentence in sentences:
+        position = text.find(sentence, cursor)
+        if position < 0:
+            continue
+        cursor = position + len(sentence)
+        ends.add(cursor)
+    return ends
+
+
+def timed(split, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        sentences = split(text)
+    return sentences, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="Ripetizioni per la misura del throughput")
+    args = parser.parse_args()
+
+    segmenter = RegexSentenceSegmenter()
+    splitters = {"regex": segmenter.split}
+    try:
+        nltk.sent_tokenize("Test. Test.")
+        splitters["nltk"] = nltk.sent_tokenize
+    except LookupError:
+        print("Dati punkt di NLTK non disponibili (nltk.download('punkt_tab')): confronto solo sui casi annotati.")
+
+    print("Casi annotati:")
+    for name, split in splitters.items():
+        correct = sum(split(text) == expected for text, expected in CASES)
+        print(f"  {name:>5}: {correct}/{len(CASES)} corretti")
+
+    text = load_sample_text()
+    print(f"Paper di esempio ({len(text) / 1e3:.0f}k caratteri):")
+    results = {}
+    for name, split in splitters.items():
+        sentences, seconds = timed(split, text, args.repeat)
+        results[name] = sentences
+        print(f"  {name:>5}: {len(sentences):>5} frasi, {seconds * 1e3:7.2f} ms ({len(text) / seconds / 1e6:6.2f} MB/s)")
+
+    if "nltk" in results:
+        reference = boundaries(text, results["nltk"])
+        predicted = boundaries(text, results["regex"])
+        agreed = len(reference & predicted)
+        precision = agreed / len(predicted) if predicted else 0.0
+        recall = agreed / len(reference) if reference else 0.0
+        print(f"  Accordo dei confini con NLTK: precision {precision:.3f}, recall {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
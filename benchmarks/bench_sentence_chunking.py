@@ -0,0 +1,99 @@
+"""
+Throughput del chunking sentence-aware: algoritmo originale (ricodifica del
+chunk candidato a ogni frase) contro sentence_packing (una codifica per frase e
+somme prefisse). Verifica anche che i confini dei chunk coincidano.
+
+Uso (dalla radice del progetto):
+    python -m benchmarks.bench_sentence_chunking --pages 50 200 800
+"""
+import argparse
+import random
+import re
+import time
+
+import tiktoken
+
+from vec_rag.chunking.sentence_packing import chunk_sentences
+from vec_rag.chunking.tokenizer import TokenizerService
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def legacy_sentence_chunks(sentences, tokenizer, max_tokens_per_chunk, overlap_sentences):
+    """Algoritmo originale di ChunkManager._sentence_aware_chunking (con guardia sull'avanzamento)."""
+    chunks = []
+    current_chunk_sentences = []
+    chunk_start = 0
+    sentence_index = 0
+    while sentence_index < len(sentences):
+        sentence = sentences[sentence_index]
+        sentence_tokens = len(tokenizer.encode(sentence))
+        if sentence_tokens > max_tokens_per_chunk:
+            if current_chunk_sentences:
+                chunks.append(" ".join(current_chunk_sentences))
+                current_chunk_sentences = []
+            chunks.append(sentence)
+            sentence_index += 1
+            chunk_start = sentence_index
+            continue
+        potential_chunk_text = " ".join(current_chunk_sentences + [sentence])
+        if len(tokenizer.encode(potential_chunk_text)) <= max_tokens_per_chunk:
+            if not current_chunk_sentences:
+                chunk_start = sentence_index
+            current_chunk_sentences.append(sentence)
+            sentence_index += 1
+        else:
+            chunks.append(" ".join(current_chunk_sentences))
+            sentence_index = max(chunk_start + 1, sentence_index - overlap_sentences)
+            current_chunk_sentences = []
+    if current_chunk_sentences:
+        chunks.append(" ".join(current_chunk_sentences))
+    return chunks
+
+
+def make_book(pages, seed=0):
+    rng = random.Random(seed)
+    words = ("the attention model layer encoder decoder training data sequence network output "
+             "input weights learning rate 512 heads transformer results table figure").split()
+    sentences = []
+    for _ in range(pages * 25):
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(4, 40)))
+        sentences.append(sentence.capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+    return " ".join(sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--overlap", type=int, default=1)
+    parser.add_argument("--encoding", default="cl100k_base")
+    parser.add_argument("--threads", type=int, default=1, help="Thread per encode_batch")
+    parser.add_argument("--skip-legacy-above", type=int, default=400,
+                        help="Pagine oltre le quali non eseguire l'algoritmo originale (troppo lento)")
+    args = parser.parse_args()
+
+    tokenizer = tiktoken.get_encoding(args.encoding)
+    # Servizio senza cache, per misurare solo l'effetto dell'algoritmo
+    service = TokenizerService(args.encoding, memo_size=0, num_threads=args.threads)
+    for pages in args.pages:
+        text = make_book(pages)
+        sentences = _SENTENCE_RE.split(text)
+
+        start = time.perf_counter()
+        chunks = chunk_sentences(sentences, service.count, args.max_tokens, args.overlap, service.count_batch)
+        fast = time.perf_counter() - start
+        line = (f"{pages:>5} pagine, {len(text) / 1e6:5.2f}M caratteri, {len(chunks):>6} chunk: "
+                f"prefix-sum {fast:7.2f}s ({len(text) / fast / 1e6:6.2f} MB/s)")
+
+        if pages <= args.skip_legacy_above:
+            start = time.perf_counter()
+            legacy = legacy_sentence_chunks(sentences, tokenizer, args.max_tokens, args.overlap)
+            slow = time.perf_counter() - start
+            assert legacy == chunks, "I confini dei chunk non coincidono con l'algoritmo originale"
+            line += f", originale {slow:7.2f}s ({len(text) / slow / 1e6:6.2f} MB/s), speedup x{slow / fast:.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Server HTTP locale che imita le API di parsing di LlamaParse, usato dai benchmark
+del client asincrono (bench_llama_async) al posto del servizio reale.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLlamaParseServer:
+    """
+    Server HTTP locale che imita le API di parsing di LlamaParse (upload, stato del
+    job, risultato) con latenza e tasso di errore configurabili. Serve a misurare il
+    throughput del client senza usare il servizio reale:
+
+        from benchmarks.llama_stub import StubLlamaParseServer
+        with StubLlamaParseServer(latency=2.0) as server:
+            AsyncLlamaExtractor(out_dir, api_key="llx-stub", base_url=server.url,
+                                check_interval=1).run(pdf_paths)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=1.0, failure_rate=0.0):
+        """
+        Args:
+            host (str): Indirizzo di ascolto
+            port (int): Porta di ascolto (0 = porta libera scelta dal sistema)
+            latency (float): Secondi dopo i quali un job risulta completato
+            failure_rate (float): Probabilita' (0-1) che un upload risponda con errore 500
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not re.search(r"/parsing/upload$", self.path):
+                    return self._send_json(404, {"detail": "Not found"})
+                if random.random() < stub.failure_rate:
+                    return self._send_json(500, {"detail": "Stub failure"})
+                match = re.search(rb'filename="([^"]+)"', body)
+                job_id = str(uuid.uuid4())
+                with stub._lock:
+                    stub.jobs[job_id] = {
+                        "file": match.group(1).decode("utf-8", "replace") if match else "document",
+                        "created": time.monotonic(),
+                    }
+                self._send_json(200, {"id": job_id, "status": "PENDING"})
+
+            def do_GET(self):
+                match = re.search(r"/parsing/job/([^/]+)(/result/(\w+))?$", self.path)
+                job = stub.jobs.get(match.group(1)) if match else None
+                if job is None:
+                    return self._send_json(404, {"detail": "Job not found"})
+                done = time.monotonic() - job["created"] >= stub.latency
+                if not match.group(2):
+                    return self._send_json(200, {"id": match.group(1), "status": "SUCCESS" if done else "PENDING"})
+                if not done:
+                    return self._send_json(400, {"detail": "Job not completed"})
+                text = f"Testo di prova per {job['file']}"
+                self._send_json(200, {
+                    "markdown": text,
+                    "text": text,
+                    "pages": [{"page": 1, "text": text, "md": text}],
+                    "job_metadata": {"credits_used": 0, "job_pages": 1},
+                })
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
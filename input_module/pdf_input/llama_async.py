@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from llama_parse import LlamaParse
+
+
+class TokenBucket:
+    """
+    Rate limiter a token bucket per asyncio: concede al massimo `rate` richieste
+    al secondo con raffiche fino a `capacity` richieste.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate deve essere positivo.")
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncLlamaExtractor:
+    """
+    Client asyncio per LlamaParse: invia molti documenti in parallelo con un limite
+    di concorrenza, rate limiting a token bucket, retry con backoff esponenziale e
+    timeout per documento. Ogni risultato viene scritto in <output_dir>/<stem>.txt
+    appena e' pronto, senza attendere gli altri documenti.
+    """
+
+    def __init__(self, output_dir, result_type="markdown", max_concurrency=8, requests_per_second=2.0,
+                 burst=None, max_retries=3, backoff_base=1.0, max_backoff=60.0, timeout=600.0,
+                 cache=None, **parser_kwargs):
+        """
+        Args:
+            output_dir (str): Directory in cui scrivere i testi estratti
+            result_type (str): "markdown" oppure "text"
+            max_concurrency (int): Documenti in elaborazione contemporaneamente
+            requests_per_second (float): Nuovi invii al secondo consentiti
+            burst (int, optional): Invii consecutivi consentiti senza attesa
+            max_retries (int): Tentativi aggiuntivi dopo il primo fallimento
+            backoff_base (float): Attesa in secondi prima del primo retry (poi raddoppia)
+            max_backoff (float): Attesa massima tra due tentativi
+            timeout (float): Tempo massimo in secondi per un singolo tentativo
+            cache (ExtractionCache, optional): Cache condivisa con ExtractorManager
+            **parser_kwargs: Argomenti passati a LlamaParse (es. api_key, base_url, check_interval)
+        """
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.result_type = result_type
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.parser_kwargs = parser_kwargs
+
+    def _make_parser(self):
+        # Senza ignore_errors=False LlamaParse restituirebbe una lista vuota invece di
+        # sollevare l'errore, e i retry non scatterebbero
+        parser_kwargs = {"verbose": False, "ignore_errors": False, **self.parser_kwargs}
+        return LlamaParse(result_type=self.result_type, **parser_kwargs)
+
+    async def _parse(self, parser, file_path):
+        documents = await parser.aload_data(str(file_path))
+        return [str(document.text) for document in documents if getattr(document, 'text', None)]
+
+    def _write_output(self, file_path, texts):
+        """Scrive il testo estratto; se nessuna pagina ha testo non scrive nulla e restituisce None."""
+        if not any(text.strip() for text in texts):
+            logging.warning(f"{file_path.name}: LlamaParse non ha restituito testo, nessun file scritto.")
+            return None
+        output_path = self.output_dir / f"{file_path.stem}.txt"
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(texts))
+        return output_path
+
+    async def _extract_one(self, parser, file_path, semaphore, bucket):
+        file_path = Path(file_path)
+        start = time.monotonic()
+        result = {"file": file_path.name, "status": "failed", "attempts": 0, "seconds": 0.0, "error": None}
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = await asyncio.to_thread(self.cache.make_key, file_path, "llamaparse", result_type=self.result_type)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                written = await asyncio.to_thread(self._write_output, file_path, json.loads(cached))
+                result.update(status="cached" if written else "empty", seconds=time.monotonic() - start)
+                return result
+
+        for attempt in range(self.max_retries + 1):
+            result["attempts"] = attempt + 1
+            # Il semaforo copre solo il tentativo: durante l'attesa del backoff
+            # il posto va agli altri documenti
+            async with semaphore:
+                await bucket.acquire()
+                try:
+                    texts = await asyncio.wait_for(self._parse(parser, file_path), self.timeout)
+                except FileNotFoundError as e:
+                    result["error"] = str(e)
+                    break
+                except Exception as e:
+                    result["error"] = "timeout" if isinstance(e, asyncio.TimeoutError) else str(e)
+                else:
+                    written = await asyncio.to_thread(self._write_output, file_path, texts)
+                    if cache_key:
+                        # Un risultato senza testo resta in cache solo per failure_ttl
+                        self.cache.put(cache_key, json.dumps(texts), file_path.stat().st_size, failed=written is None)
+                    result.update(status="ok" if written else "empty", error=None)
+                    break
+            if attempt == self.max_retries:
+                break
+            delay = min(self.max_backoff, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+            logging.warning(f"{file_path.name}: tentativo {attempt + 1} fallito ({result['error']}), "
+                            f"nuovo tentativo tra {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        result["seconds"] = time.monotonic() - start
+        if result["status"] == "failed":
+            logging.error(f"{file_path.name}: estrazione LlamaParse fallita ({result['error']})")
+        return result
+
+    async def stream(self, file_paths):
+        """
+        Estrae i documenti in parallelo restituendo il risultato di ciascuno
+        nell'ordine in cui terminano.
+
+        Yields:
+            dict: {"file", "status" ("ok", "cached", "empty", "failed"), "attempts", "seconds", "error"}
+        """
+        parser = self._make_parser()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        bucket = TokenBucket(self.requests_per_second, self.burst)
+        tasks = [asyncio.create_task(self._extract_one(parser, path, semaphore, bucket)) for path in file_paths]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.cache is not None:
+                self.cache.save()
+
+    async def extract_many(self, file_paths):
+        """Estrae tutti i documenti e restituisce i risultati ordinati per nome file."""
+        results = [result async for result in self.stream(file_paths)]
+        return sorted(results, key=lambda result: result["file"])
+
+    def run(self, file_paths):
+        """
+        Punto di ingresso sincrono: esegue extract_many in un nuovo event loop. Se
+        il thread corrente ha gia' un loop in esecuzione (es. Jupyter o un server
+        asincrono), dove asyncio.run fallirebbe, il loop nuovo gira in un altro thread.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.extract_many(file_paths))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.extract_many(file_paths)).result()
@@ -1,14 +1,43 @@
 import os
+import json
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 import time
 import re
 import argparse
+import tempfile
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from input_module.utils.quality import TextQualityScorer
+
+
+def _init_ocr_worker(tesseract_threads, tesseract_cmd):
+    """
+    Inizializza un processo worker dell'OCR parallelo. OMP_THREAD_LIMIT limita
+    i thread OpenMP di ogni Tesseract lanciato da pytesseract, che eredita
+    l'ambiente del processo: impostato qui vale solo per i worker, non per il
+    processo principale ne' per altre estrazioni concorrenti.
+    """
+    os.environ["OMP_THREAD_LIMIT"] = str(tesseract_threads)
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+
+def _ocr_page_worker(pdf_path, page_num, dpi, lang):
+    """Renderizza ed esegue l'OCR di una pagina nel worker; il tempo misurato e' quello dell'OCR."""
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num)
+    try:
+        page_start = time.time()
+        page_text = pytesseract.image_to_string(images[0], lang=lang) if images else ""
+        return page_num, page_text, time.time() - page_start
+    finally:
+        for image in images:
+            image.close()
+
 
 class OCRPdfExtractor:
-    def __init__(self, lang='ita+eng', dpi=300, tesseract_path=None):
+    def __init__(self, lang='ita+eng', dpi=300, tesseract_path=None, page_window=4, ocr_workers=None, cache=None):
         """
         Inizializza l'estrattore OCR
         
@@ -16,9 +45,20 @@ class OCRPdfExtractor:
             lang (str): Lingue da utilizzare con Tesseract (es. 'ita+eng')
             dpi (int): Risoluzione per la conversione PDF-immagine
             tesseract_path (str): Percorso all'eseguibile di Tesseract (solo per Windows)
+            page_window (int): Numero massimo di pagine renderizzate in memoria
+                               contemporaneamente in modalita' streaming
+            ocr_workers (int, optional): Numero di pagine elaborate in parallelo da
+                                         Tesseract (default: numero di core)
+            cache (ExtractionCache, optional): Cache dei testi estratti; i PDF gia'
+                                               elaborati con stessi DPI e lingua non
+                                               vengono rielaborati
         """
         self.lang = lang
         self.dpi = dpi
+        self.page_window = page_window
+        self.ocr_workers = ocr_workers or os.cpu_count() or 1
+        self.cache = cache
+        self.quality_scorer = TextQualityScorer()
         
         # Configura il percorso di Tesseract se specificato (utile su Windows)
         if tesseract_path:
@@ -32,6 +72,36 @@ class OCRPdfExtractor:
             print(f"ERRORE: Tesseract OCR non trovato o non funzionante: {e}")
             print("Assicurati che Tesseract sia installato e, su Windows, specifica il percorso con tesseract_path")
     
+    def _cache_key(self, pdf_path, pages=None, mode="pages", **settings):
+        """
+        Chiave di cache di un'estrazione. mode distingue i metodi che producono
+        testi diversi: "range" (extract_text_from_pdf, che renderizza l'intervallo
+        pages[0]..pages[-1]) e "pages" (streaming e parallelo, pagina per pagina).
+        """
+        if self.cache is None:
+            return None
+        settings.setdefault("dpi", self.dpi)
+        settings["mode"] = mode
+        return self.cache.make_key(pdf_path, "ocr", lang=self.lang,
+                                   pages=sorted(set(pages)) if pages else None, **settings)
+
+    def _from_cache(self, cache_key, output_file=None):
+        """Restituisce il testo in cache (scrivendolo su output_file) oppure None."""
+        if cache_key is None:
+            return None
+        text = self.cache.get(cache_key)
+        if text is not None:
+            print("Testo OCR servito dalla cache.")
+            if output_file:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    f.write(text)
+        return text
+
+    def _store_in_cache(self, cache_key, pdf_path, text):
+        if cache_key is not None:
+            self.cache.put(cache_key, text, os.path.getsize(pdf_path))
+            self.cache.save()
+
     def extract_text_from_pdf(self, pdf_path, output_file=None, pages=None):
         """
         Estrae il testo da un PDF utilizzando OCR
@@ -48,6 +118,11 @@ class OCRPdfExtractor:
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"Il file PDF non esiste: {pdf_path}")
         
+        cache_key = self._cache_key(pdf_path, pages, mode="range")
+        cached = self._from_cache(cache_key, output_file)
+        if cached is not None:
+            return cached
+        
         print(f"Convertendo il PDF in immagini (DPI={self.dpi})...")
         start_time = time.time()
         
@@ -88,6 +163,7 @@ class OCRPdfExtractor:
                     f.write(full_text)
                 print(f"Testo salvato in: {output_file}")
             
+            self._store_in_cache(cache_key, pdf_path, full_text)
             print(f"Estrazione OCR completata in {time.time() - start_time:.2f} secondi")
             return full_text
             
@@ -95,6 +171,325 @@ class OCRPdfExtractor:
             print(f"Errore durante l'estrazione OCR: {e}")
             return ""
     
+    def _resolve_pages(self, pdf_path, pages=None):
+        """
+        Restituisce la lista ordinata dei numeri di pagina (1-indexed) da elaborare.
+        Se pages e' None legge il numero di pagine dal PDF senza renderizzarlo.
+        """
+        if pages:
+            return sorted(set(pages))
+        info = pdfinfo_from_path(pdf_path)
+        return list(range(1, info["Pages"] + 1))
+
+    @staticmethod
+    def _page_windows(page_numbers, window_size):
+        """
+        Raggruppa i numeri di pagina in finestre di pagine consecutive
+        lunghe al massimo window_size.
+        """
+        window = []
+        for page_num in page_numbers:
+            if window and (page_num != window[-1] + 1 or len(window) >= window_size):
+                yield window
+                window = []
+            window.append(page_num)
+        if window:
+            yield window
+
+    def iter_pages(self, pdf_path, pages=None, window_size=None):
+        """
+        Renderizza ed esegue l'OCR del PDF una finestra di pagine alla volta,
+        restituendo il testo di ogni pagina appena e' disponibile. In memoria
+        ci sono al massimo window_size immagini, indipendentemente dalla
+        lunghezza del documento.
+        
+        Args:
+            pdf_path (str): Percorso al file PDF
+            pages (list, optional): Numeri di pagina da elaborare (1-indexed)
+            window_size (int, optional): Pagine per finestra (default: self.page_window)
+        
+        Yields:
+            tuple: (numero pagina, testo pulito della pagina)
+        """
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"Il file PDF non esiste: {pdf_path}")
+        
+        window_size = window_size or self.page_window
+        if window_size <= 0:
+            raise ValueError("window_size deve essere positivo.")
+        
+        for window in self._page_windows(self._resolve_pages(pdf_path, pages), window_size):
+            images = convert_from_path(
+                pdf_path,
+                dpi=self.dpi,
+                first_page=window[0],
+                last_page=window[-1]
+            )
+            try:
+                for page_num, image in zip(window, images):
+                    page_text = pytesseract.image_to_string(image, lang=self.lang)
+                    yield page_num, self.clean_text(page_text)
+            finally:
+                # Libera le immagini della finestra prima di renderizzare la successiva
+                for image in images:
+                    image.close()
+                del images
+
+    def extract_text_from_pdf_streaming(self, pdf_path, output_file=None, pages=None, window_size=None):
+        """
+        Variante a memoria limitata di extract_text_from_pdf: le pagine vengono
+        renderizzate a finestre e il testo viene scritto man mano che viene
+        prodotto, con gli stessi marcatori di pagina, in un file temporaneo
+        accanto a output_file che lo sostituisce solo a estrazione completata
+        (in caso di errore output_file non viene toccato).
+        
+        Args:
+            pdf_path (str): Percorso al file PDF
+            output_file (str, optional): Percorso per salvare il testo estratto
+            pages (list, optional): Numeri di pagina da elaborare (1-indexed)
+            window_size (int, optional): Pagine per finestra (default: self.page_window)
+        
+        Returns:
+            str: Il testo estratto
+        """
+        cache_key = self._cache_key(pdf_path, pages) if os.path.exists(pdf_path) else None
+        cached = self._from_cache(cache_key, output_file)
+        if cached is not None:
+            return cached
+        
+        print(f"OCR in streaming (DPI={self.dpi}, finestra={window_size or self.page_window} pagine)...")
+        start_time = time.time()
+        
+        parts = []
+        out = tmp_path = None
+        if output_file:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_file)),
+                                            prefix=os.path.basename(output_file), suffix=".part")
+            out = os.fdopen(fd, 'w', encoding='utf-8')
+        try:
+            for page_num, page_text in self.iter_pages(pdf_path, pages, window_size):
+                if not page_text.strip():
+                    continue
+                part = f"\n\n--- Pagina {page_num} ---\n\n" + page_text
+                parts.append(part)
+                if out:
+                    out.write(part)
+                    out.flush()
+            if out:
+                out.close()
+                os.replace(tmp_path, output_file)
+        except Exception as e:
+            print(f"Errore durante l'estrazione OCR: {e}")
+            return ""
+        finally:
+            if out:
+                out.close()
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        
+        full_text = "".join(parts)
+        self._store_in_cache(cache_key, pdf_path, full_text)
+        if output_file:
+            print(f"Testo salvato in: {output_file}")
+        print(f"Estrazione OCR completata in {time.time() - start_time:.2f} secondi")
+        return full_text
+    
+    def extract_text_from_pdf_parallel(self, pdf_path, output_file=None, pages=None, workers=None, tesseract_threads=None):
+        """
+        Estrae il testo da un PDF eseguendo l'OCR di piu' pagine in parallelo.
+        Ogni pagina viene renderizzata ed elaborata da un processo worker, quindi
+        in memoria c'e' al massimo un'immagine per worker; il limite di thread di
+        Tesseract e' impostato solo nell'ambiente dei worker.
+        
+        Args:
+            pdf_path (str): Percorso al file PDF
+            output_file (str, optional): Percorso per salvare il testo estratto
+            pages (list, optional): Numeri di pagina da elaborare (1-indexed)
+            workers (int, optional): Pagine elaborate in parallelo (default: self.ocr_workers)
+            tesseract_threads (int, optional): Thread interni di ogni processo Tesseract.
+                                               Default: core disponibili / workers, cosi'
+                                               i due livelli non sovraccaricano la CPU
+        
+        Returns:
+            tuple: (testo estratto, dict {numero pagina: secondi di OCR}); se il testo
+                   viene dalla cache i secondi di ogni pagina sono 0.0
+        """
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"Il file PDF non esiste: {pdf_path}")
+        
+        workers = workers or self.ocr_workers
+        if workers <= 0:
+            raise ValueError("workers deve essere positivo.")
+        
+        cache_key = self._cache_key(pdf_path, pages)
+        cached = self._from_cache(cache_key, output_file)
+        if cached is not None:
+            return cached, {page_num: 0.0 for page_num in self._resolve_pages(pdf_path, pages)}
+        if tesseract_threads is None:
+            tesseract_threads = max(1, (os.cpu_count() or 1) // workers)
+        
+        page_numbers = self._resolve_pages(pdf_path, pages)
+        page_texts = {}
+        page_timings = {}
+        with ProcessPoolExecutor(max_workers=min(workers, max(1, len(page_numbers))), initializer=_init_ocr_worker,
+                                 initargs=(tesseract_threads, pytesseract.pytesseract.tesseract_cmd)) as executor:
+            futures = [executor.submit(_ocr_page_worker, pdf_path, page_num, self.dpi, self.lang)
+                       for page_num in page_numbers]
+            for future in futures:
+                page_num, page_text, elapsed = future.result()
+                page_texts[page_num] = self.clean_text(page_text)
+                page_timings[page_num] = elapsed
+        
+        # Ricomponi il documento nell'ordine delle pagine
+        full_text = "".join(
+            f"\n\n--- Pagina {page_num} ---\n\n" + page_texts[page_num]
+            for page_num in sorted(page_texts)
+            if page_texts[page_num].strip()
+        )
+        
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(full_text)
+        
+        self._store_in_cache(cache_key, pdf_path, full_text)
+        return full_text, page_timings
+    
+    def _ocr_page_with_confidence(self, image):
+        """
+        Esegue l'OCR di una pagina con image_to_data e ricostruisce il testo dalle
+        parole riconosciute, restituendo anche la confidenza media di Tesseract.
+        
+        Returns:
+            tuple: (testo pulito, confidenza media 0-100 oppure None se non ci sono parole)
+        """
+        data = pytesseract.image_to_data(image, lang=self.lang, output_type=pytesseract.Output.DICT)
+        
+        lines = {}
+        confidences = []
+        for i, word in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if conf < 0 or not word.strip():
+                continue
+            confidences.append(conf)
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(word)
+        
+        # Righe unite da a capo, paragrafi e blocchi separati da una riga vuota
+        parts = []
+        previous = None
+        for key in sorted(lines):
+            if previous is not None:
+                parts.append("\n" if key[:2] == previous[:2] else "\n\n")
+            parts.append(" ".join(lines[key]))
+            previous = key
+        
+        mean_confidence = sum(confidences) / len(confidences) if confidences else None
+        return self.clean_text("".join(parts)), mean_confidence
+
+    def extract_text_from_pdf_adaptive(self, pdf_path, output_file=None, pages=None, low_dpi=150,
+                                       high_dpi=None, min_confidence=70, escalate_empty=False, window_size=None):
+        """
+        Estrae il testo renderizzando prima ogni pagina a bassa risoluzione e
+        ripetendo l'OCR ad alta risoluzione solo per le pagine la cui confidenza
+        media di Tesseract e' sotto la soglia.
+        
+        Args:
+            pdf_path (str): Percorso al file PDF
+            output_file (str, optional): Percorso per salvare il testo estratto
+            pages (list, optional): Numeri di pagina da elaborare (1-indexed)
+            low_dpi (int): Risoluzione del primo passaggio
+            high_dpi (int, optional): Risoluzione delle pagine scalate (default: self.dpi)
+            min_confidence (float): Confidenza media minima (0-100) per accettare il primo passaggio
+            escalate_empty (bool): Se True scala anche le pagine in cui non e' stata
+                                   riconosciuta nessuna parola (di solito pagine bianche)
+            window_size (int, optional): Pagine renderizzate insieme (default: self.page_window)
+        
+        Returns:
+            tuple: (testo estratto, report) dove report contiene "pages", "escalated"
+                   (lista delle pagine scalate), "escalated_count", "confidence"
+                   ({pagina: [confidenza bassa, confidenza alta o None]}) e "cached"
+                   (True se testo e report vengono dalla cache)
+        """
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"Il file PDF non esiste: {pdf_path}")
+        
+        high_dpi = high_dpi or self.dpi
+        # In cache testo e report sono salvati insieme (JSON), quindi la voce non e'
+        # condivisa con le altre modalita' di estrazione
+        cache_key = self._cache_key(pdf_path, pages, dpi=[low_dpi, high_dpi], min_confidence=min_confidence,
+                                    escalate_empty=escalate_empty, with_report=True)
+        cached = self.cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            print("Testo OCR servito dalla cache.")
+            full_text, report = json.loads(cached)
+            report["confidence"] = {int(page_num): values for page_num, values in report["confidence"].items()}
+            report["cached"] = True
+            if output_file:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    f.write(full_text)
+            return full_text, report
+        
+        page_texts = {}
+        report = {"pages": 0, "escalated": [], "escalated_count": 0, "confidence": {}, "cached": False}
+        for window in self._page_windows(self._resolve_pages(pdf_path, pages), window_size or self.page_window):
+            images = convert_from_path(pdf_path, dpi=low_dpi, first_page=window[0], last_page=window[-1])
+            try:
+                for page_num, image in zip(window, images):
+                    page_text, confidence = self._ocr_page_with_confidence(image)
+                    page_texts[page_num] = page_text
+                    report["confidence"][page_num] = [confidence, None]
+            finally:
+                for image in images:
+                    image.close()
+                del images
+            
+            for page_num in window:
+                confidence = report["confidence"][page_num][0]
+                if confidence is None and not escalate_empty:
+                    continue
+                if confidence is not None and confidence >= min_confidence:
+                    continue
+                # Ri-renderizza solo questa pagina ad alta risoluzione
+                images = convert_from_path(pdf_path, dpi=high_dpi, first_page=page_num, last_page=page_num)
+                try:
+                    high_text, high_confidence = self._ocr_page_with_confidence(images[0])
+                finally:
+                    for image in images:
+                        image.close()
+                report["escalated"].append(page_num)
+                report["confidence"][page_num][1] = high_confidence
+                if high_confidence is not None and (confidence is None or high_confidence >= confidence):
+                    page_texts[page_num] = high_text
+        
+        report["pages"] = len(page_texts)
+        report["escalated_count"] = len(report["escalated"])
+        full_text = "".join(
+            f"\n\n--- Pagina {page_num} ---\n\n" + page_texts[page_num]
+            for page_num in sorted(page_texts)
+            if page_texts[page_num].strip()
+        )
+        
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(full_text)
+        
+        if cache_key is not None:
+            self.cache.put(cache_key, json.dumps([full_text, report]), os.path.getsize(pdf_path), failed=not full_text)
+            self.cache.save()
+        return full_text, report
+    
+    def score_pages(self, page_texts):
+        """
+        Calcola le metriche di qualita' del testo OCR di ogni pagina.
+        
+        Args:
+            page_texts (dict): {numero pagina: testo}, ad esempio da iter_pages
+        
+        Returns:
+            dict: {numero pagina: PageQualityScore}
+        """
+        return {page_num: self.quality_scorer.score(text) for page_num, text in page_texts.items()}
+    
     def clean_text(self, text):
         """
         Pulisce il testo estratto rimuovendo caratteri indesiderati
@@ -1,26 +1,86 @@
 import PyPDF2
 import nest_asyncio
 import os
+import json
+import hashlib
 import logging
-nest_asyncio.apply()
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict
 from pathlib import Path
 from llama_parse import LlamaParse
-from llama_index.core import SimpleDirectoryReader
 from input_module.utils.tools import find_project_root
+from input_module.utils.cache import ExtractionCache
+from input_module.utils.quality import TextQualityScorer
+from input_module.utils.manifest import IngestManifest
+from input_module.pdf_input.ocr.ocr_extractor import OCRPdfExtractor
+from input_module.pdf_input.llama_async import AsyncLlamaExtractor
 from dotenv import load_dotenv
 load_dotenv()
 
+
+def _extract_pdf_pages(pdf_path, first_page=0, last_page=None):
+    """
+    Estrae con PyPDF2 il testo delle pagine [first_page, last_page) di un PDF.
+    Funzione a livello di modulo per poter essere eseguita nei processi worker.
+
+    Returns:
+        list[str]: Il testo di ogni pagina (stringa vuota se la pagina non ha testo)
+    """
+    with open(pdf_path, 'rb') as pdf_file:
+        reader = PyPDF2.PdfReader(pdf_file)
+        num_pages = len(reader.pages)
+        last_page = num_pages if last_page is None else min(last_page, num_pages)
+        return [reader.pages[i].extract_text() or '' for i in range(first_page, last_page)]
+
+
+def _extract_pdf_task(pdf_path, max_pages):
+    """
+    Task del pool: estrae l'intero PDF se ha al massimo max_pages pagine,
+    altrimenti restituisce solo il numero di pagine cosi' che il chiamante
+    possa dividerlo in intervalli da distribuire sui worker.
+
+    Returns:
+        tuple: ("done", lista testi pagine) oppure ("split", numero pagine)
+    """
+    with open(pdf_path, 'rb') as pdf_file:
+        reader = PyPDF2.PdfReader(pdf_file)
+        num_pages = len(reader.pages)
+        if num_pages > max_pages:
+            return "split", num_pages
+        return "done", [page.extract_text() or '' for page in reader.pages]
+
+
 class ExtractorManager:
-    def __init__(self,input_path : str): 
+    def __init__(self,input_path : str, max_workers : int = None, use_cache : bool = True,
+                 cache_max_bytes : int = 1024 * 1024 * 1024, llama_result_type : str = "markdown",
+                 cache_failure_ttl : float = 3600, ocr_lang : str = 'ita+eng', ocr_dpi : int = 300,
+                 llama_blank_pages : bool = False): 
         self.input_path = Path(input_path)
+        # Numero di processi per l'estrazione parallela (None = tutti i core)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.llama_result_type = llama_result_type
+        # Impostazioni dell'OCR del routing per pagina; le pagine che restano bianche
+        # anche dopo l'OCR vanno a LlamaParse (a pagamento) solo se llama_blank_pages
+        self.ocr_lang = ocr_lang
+        self.ocr_dpi = ocr_dpi
+        self.llama_blank_pages = llama_blank_pages
+        self._ocr_extractor = None
+        self.quality_scorer = TextQualityScorer()
         self._create_output_dir()
+        # Cache dei testi estratti, indicizzata per contenuto del PDF e impostazioni del backend
+        self.cache = ExtractionCache(self.rag_path / ".cache" / "extraction", cache_max_bytes,
+                                     cache_failure_ttl) if use_cache else None
+        # Manifest dei PDF gia' estratti, per l'ingestione incrementale
+        input_key = hashlib.sha1(str(self.input_path.resolve()).encode('utf-8')).hexdigest()[:12]
+        self.manifest = IngestManifest(self.rag_path / ".cache" / "manifests" / f"extract_{input_key}.json")
 
 
     def _create_output_dir(self):
         
-        rag_path = find_project_root(marker_name="RAGnarok")
+        self.rag_path = find_project_root(marker_name="RAGnarok")
         output_subdir_name = "txt_input"
-        self.output_dir_path = rag_path / output_subdir_name
+        self.output_dir_path = self.rag_path / output_subdir_name
         self.output_dir_path.mkdir(parents=True, exist_ok=True)
 
     def _extract_text_from_pdf(self):
@@ -67,22 +127,28 @@ class ExtractorManager:
                 logging.info(f"Processando: {input_file_path.name} -> {output_file_path}")
 
                 try:
-                    # 6. Estrai testo dal PDF
-                    extracted_text = ''
-                    with open(input_file_path, 'rb') as pdf_file:
-                        reader = PyPDF2.PdfReader(pdf_file)
-                        # Aggiungi controllo per PDF criptati (opzionale)
-                        # if reader.is_encrypted:
-                        #     logging.warning(f"Il file {input_file_path.name} è criptato e non può essere processato.")
-                        #     continue # Salta al prossimo file
-
-                        for page_num, page in enumerate(reader.pages):
-                            page_text = page.extract_text()
-                            if page_text: # Aggiungi solo se l'estrazione ha prodotto testo
-                                extracted_text += page_text + "\n" # Aggiungi a capo tra le pagine (opzionale)
-                            # else:
-                            #     logging.debug(f"Nessun testo estratto da pagina {page_num + 1} di {input_file_path.name}")
-
+                    # 6. Estrai testo dal PDF (o recuperalo dalla cache se il file non e' cambiato)
+                    cache_key = self._cache_key(input_file_path, "pypdf2")
+                    extracted_text = self.cache.get(cache_key) if cache_key else None
+                    if extracted_text is not None:
+                        logging.info(f"{input_file_path.name} servito dalla cache.")
+                    else:
+                        extracted_text = ''
+                        with open(input_file_path, 'rb') as pdf_file:
+                            reader = PyPDF2.PdfReader(pdf_file)
+                            # Aggiungi controllo per PDF criptati (opzionale)
+                            # if reader.is_encrypted:
+                            #     logging.warning(f"Il file {input_file_path.name} è criptato e non può essere processato.")
+                            #     continue # Salta al prossimo file
+
+                            for page_num, page in enumerate(reader.pages):
+                                page_text = page.extract_text()
+                                if page_text: # Aggiungi solo se l'estrazione ha prodotto testo
+                                    extracted_text += page_text + "\n" # Aggiungi a capo tra le pagine (opzionale)
+                                # else:
+                                #     logging.debug(f"Nessun testo estratto da pagina {page_num + 1} di {input_file_path.name}")
+                        if cache_key:
+                            self.cache.put(cache_key, extracted_text, input_file_path.stat().st_size)
 
                     # 7. Scrivi il testo estratto nel file di output
                     if extracted_text: # Scrivi solo se è stato estratto del testo
@@ -104,130 +170,437 @@ class ExtractorManager:
                 elif input_file_path.is_dir():
                     logging.debug(f"Ignorata sottodirectory: {input_file_path.name}")
 
+        if self.cache:
+            self.cache.save()
         logging.info(f"Processo completato. Trovati {file_count} file PDF. Estratto testo da {processed_count} file.")
 
-    def _is_extracted_text_valid(self, text, min_words_per_page=10, min_valid_chars_ratio=0.7):
-        if not text.strip():
-            return False
-        
-        # Controllo della lunghezza minima
-        words = text.split()
-        if len(words) < min_words_per_page:
-            return False
-        
-        # Controllo del rapporto di caratteri validi
-        valid_chars = sum(1 for c in text if c.isalnum() or c.isspace() or c in '.,;:!?()-')
-        total_chars = len(text)
-        
-        if total_chars == 0 or valid_chars / total_chars < min_valid_chars_ratio:
-            return False
-        
-        # Controllo di pattern anomali (caratteri ripetuti, etc.)
-        unusual_patterns = ['���', '###', '...', '   ']
-        for pattern in unusual_patterns:
-            if pattern in text:
-                return False
-        
-        return True
+    def _prune_outputs(self, deleted_files):
+        """Rimuove da txt_input gli output dei PDF eliminati dalla directory di input."""
+        pruned = []
+        for deleted_file in deleted_files:
+            for output_path in (self.output_dir_path / f"{deleted_file.stem}.txt",
+                                self.output_dir_path / f"{deleted_file.stem}.pages.json"):
+                if output_path.exists():
+                    output_path.unlink()
+                    pruned.append(output_path.name)
+        return pruned
+
+    def _process_changes(self, changes):
+        """
+        Estrae i PDF aggiunti o modificati e rimuove gli output di quelli eliminati.
+
+        Returns:
+            list: I PDF estratti con successo (da confermare nel manifest)
+        """
+        pruned = self._prune_outputs(changes.deleted)
+        if pruned:
+            logging.info(f"Rimossi gli output di file eliminati: {pruned}")
+        if not changes.changed:
+            return []
+        summary = self._extract_text_from_pdf_parallel(pdf_files=changes.changed)
+        return [path for path in changes.changed if path.name not in summary["failed"]]
+
+    def extract_incremental(self):
+        """
+        Estrae solo i PDF aggiunti o modificati dall'ultima esecuzione, confrontando
+        dimensione, mtime e hash con il manifest, e rimuove gli output dei PDF eliminati.
+
+        Returns:
+            dict: {"added", "modified", "deleted", "unchanged", "failed"}
+        """
+        changes = self.manifest.scan(self.input_path, {".pdf"})
+        logging.info(f"Ingestione incrementale: {changes.summary()}")
+        processed = self._process_changes(changes)
+        self.manifest.commit(changes, processed)
+        report = changes.summary()
+        report["failed"] = sorted(path.name for path in changes.changed if path not in processed)
+        return report
+
+    def watch(self, interval=5.0, stop_event=None):
+        """
+        Osserva la directory di input ed estrae i PDF appena arrivano (o cambiano).
+
+        Args:
+            interval (float): Secondi tra due controlli
+            stop_event (threading.Event, optional): Interrompe l'osservazione quando impostato
+        """
+        self.manifest.watch(self.input_path, self._process_changes, {".pdf"}, interval, stop_event)
+
+    def _cache_key(self, pdf_path, backend, **settings):
+        """Chiave di cache per un file e un backend, oppure None se la cache e' disattivata."""
+        if self.cache is None:
+            return None
+        if backend == "pypdf2":
+            settings.setdefault("version", PyPDF2.__version__)
+        return self.cache.make_key(pdf_path, backend, **settings)
+
+    def _list_input_pdfs(self):
+        """Restituisce i PDF della directory di input in ordine deterministico."""
+        return sorted(
+            (p for p in self.input_path.iterdir() if p.is_file() and p.suffix.lower() == '.pdf'),
+            key=lambda p: p.name,
+        )
+
+    def _write_extracted_text(self, input_file_path, extracted_text):
+        """
+        Scrive in txt_input/<stem>.txt il testo estratto, con lo stesso
+        formato dell'estrazione seriale. Restituisce il percorso scritto o None.
+        """
+        if not extracted_text:
+            logging.warning(f"Nessun testo estratto da {input_file_path.name}. Nessun file .txt creato.")
+            return None
+        output_file_path = self.output_dir_path / f"{input_file_path.stem}.txt"
+        with open(output_file_path, 'w', encoding='utf-8') as txt_file:
+            txt_file.write(extracted_text)
+        logging.info(f"Testo estratto e salvato in: {output_file_path}")
+        return output_file_path
+
+    def _extract_text_from_pdf_parallel(self, max_workers=None, large_file_pages=200, pages_per_task=50, pdf_files=None):
+        """
+        Estrae il testo dai PDF della directory di input distribuendo il lavoro
+        su un pool di processi. I file con piu' di large_file_pages pagine vengono
+        divisi in intervalli da pages_per_task pagine elaborati in parallelo.
+
+        Args:
+            max_workers (int, optional): Numero di processi (default: self.max_workers)
+            large_file_pages (int): Soglia di pagine oltre la quale un file viene diviso
+            pages_per_task (int): Numero di pagine per ogni task di un file grande
+            pdf_files (list, optional): PDF da elaborare (default: tutti quelli della directory)
+
+        Returns:
+            dict: {"processed": [nomi file], "empty": [nomi file], "failed": {nome file: errore}}
+        """
+        if pages_per_task <= 0 or large_file_pages <= 0:
+            raise ValueError("large_file_pages e pages_per_task devono essere positivi.")
 
-    def _extract_text_llama(self):
-        try:
-            # 1. Trova la radice del progetto "RAGnarok"
-            rag_path = find_project_root(marker_name="RAGnarok")
-
-            # 2. Definisci la sottodirectory di output RELATIVA alla radice
-            output_subdir_name = "txt_input"
-            output_dir_path = rag_path / output_subdir_name
-
-            # 3. Assicura che la directory di output esista
-            output_dir_path.mkdir(parents=True, exist_ok=True)
-            print(f"Assicurata l'esistenza della directory di output: {output_dir_path}")
-
-            # --- Configurazione LlamaParse ---
-            parser = LlamaParse(
-                result_type="markdown",  # "markdown" and "text" are available
-                verbose=True,
-            )
-            file_extractor = {".pdf": parser}
-
-            # --- Lettura documenti ---
-            # Assicurati che self.input_path sia definito correttamente
-            # Potrebbe essere relativo a rag_path o un percorso assoluto
-            # Esempio: input_dir = rag_path / self.input_path se è relativo
-            input_dir = Path(self.input_path) # Assumi sia già il percorso corretto
-            print(f"Lettura documenti da: {input_dir}")
-            documents = SimpleDirectoryReader(
-                input_dir=str(input_dir), # SimpleDirectoryReader vuole una stringa
-                file_extractor=file_extractor
-            ).load_data()
-            print(f"Caricati {len(documents)} documenti.")
-
-            # --- Scrittura output ---
-            # Cicla sui documenti CARICATI per creare un file per ciascuno?
-            # O vuoi scrivere TUTTI i documenti in UN file?
-            # Il codice originale sembrava voler scrivere tutti i doc in ogni file, il che è strano.
-            # Modifico per creare UN file per OGNI documento caricato.
-
-            if not documents:
-                 print("Nessun documento caricato, nessuna scrittura eseguita.")
-                 return
-
-            for idx, document in enumerate(documents):
-                # Costruisci il percorso del file di output per QUESTO documento
-                # idx è l'indice (0, 1, 2, ...)
-                output_filename = f"llama_output{idx}.txt"
-                file_path = output_dir_path / output_filename
-
-                print(f"Scrittura del documento {idx+1}/{len(documents)} su: {file_path}")
-                try:
-                    # Scrivi il testo del singolo documento nel file corrispondente
-                    with open(file_path, "w", encoding='utf-8') as file:
-                        if hasattr(document, 'text') and document.text:
-                             file.write(str(document.text)) # Scrivi solo il testo del doc corrente
-                             # file.write("\n\n") # Aggiungi newline se vuoi separare qualcosa dopo?
+        self.output_dir_path.mkdir(parents=True, exist_ok=True)
+        pdf_files = self._list_input_pdfs() if pdf_files is None else sorted(pdf_files, key=lambda p: p.name)
+        logging.info(f"Inizio estrazione parallela di {len(pdf_files)} PDF da: {self.input_path}")
+
+        summary = {"processed": [], "empty": [], "failed": {}}
+        # Per ogni file: lista dei risultati per intervallo e intervalli mancanti
+        page_ranges = {}
+        pending_ranges = {}
+
+        max_workers = max_workers or self.max_workers
+        cache_keys = {}
+        # Task da inviare al pool: (funzione, argomenti, pdf, fase) dove la fase e'
+        # "digest" (hash del file per la cache), None (file intero) o l'indice dell'intervallo
+        if self.cache is None:
+            queued = deque((_extract_pdf_task, (str(pdf_path), large_file_pages), pdf_path, None) for pdf_path in pdf_files)
+        else:
+            # Anche l'hash dei file e' calcolato nei worker; i file non modificati
+            # vengono poi serviti dalla cache senza essere estratti
+            queued = deque((ExtractionCache.file_digest, (str(pdf_path),), pdf_path, "digest") for pdf_path in pdf_files)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            while queued or futures:
+                # Al massimo 2 task in volo per processo: la memoria non cresce con il numero di PDF
+                while queued and len(futures) < 2 * max_workers:
+                    function, args, pdf_path, range_index = queued.popleft()
+                    if pdf_path.name not in summary["failed"]:
+                        futures[executor.submit(function, *args)] = (pdf_path, range_index)
+                if not futures:
+                    continue
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pdf_path, range_index = futures.pop(future)
+                    if pdf_path.name in summary["failed"]:
+                        continue
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logging.error(f"Errore durante l'elaborazione di {pdf_path.name}: {e}. File saltato.")
+                        summary["failed"][pdf_path.name] = str(e)
+                        page_ranges.pop(pdf_path, None)
+                        continue
+
+                    if range_index == "digest":
+                        cache_keys[pdf_path] = self._cache_key(pdf_path, "pypdf2", content_digest=result)
+                        cached = self.cache.get(cache_keys[pdf_path])
+                        if cached is not None:
+                            self._collect_parallel_result(pdf_path, cached, summary)
                         else:
-                             print(f"  Attenzione: Documento {idx} non ha attributo 'text' o è vuoto.")
-                except IOError as e:
-                     print(f"Errore durante la scrittura del file {file_path}: {e}")
-                except Exception as e:
-                     print(f"Errore inatteso durante la scrittura del file {file_path}: {e}")
-
-            print("Processo di estrazione e scrittura completato.")
-
-        except FileNotFoundError as e:
-            print(f"Errore critico (radice progetto o input non trovato?): {e}")
-        except Exception as e:
-            print(f"Errore generale in extract_text_llama: {e}")
-            # Considera di loggare l'intero traceback per debug
-            import traceback
-            traceback.print_exc()
+                            queued.appendleft((_extract_pdf_task, (str(pdf_path), large_file_pages), pdf_path, None))
+                        continue
+
+                    if range_index is None:
+                        status, payload = result
+                        if status == "done":
+                            self._collect_parallel_result(pdf_path, self._join_pages(payload), summary, cache_keys.get(pdf_path))
+                            continue
+                        # File grande: dividi in intervalli di pagine
+                        starts = range(0, payload, pages_per_task)
+                        page_ranges[pdf_path] = [None] * len(starts)
+                        pending_ranges[pdf_path] = len(starts)
+                        logging.info(f"{pdf_path.name}: {payload} pagine divise in {len(starts)} task")
+                        # Gli intervalli passano davanti ai file in coda, per completare prima il file
+                        queued.extendleft(reversed([
+                            (_extract_pdf_pages, (str(pdf_path), start, start + pages_per_task), pdf_path, index)
+                            for index, start in enumerate(starts)
+                        ]))
+                        continue
+
+                    page_ranges[pdf_path][range_index] = result
+                    pending_ranges[pdf_path] -= 1
+                    if pending_ranges[pdf_path] == 0:
+                        page_texts = [text for chunk in page_ranges.pop(pdf_path) for text in chunk]
+                        self._collect_parallel_result(pdf_path, self._join_pages(page_texts), summary, cache_keys.get(pdf_path))
+
+        if self.cache:
+            self.cache.save()
+        # Ordine deterministico indipendente dall'ordine di completamento
+        summary["processed"].sort()
+        summary["empty"].sort()
+        summary["failed"] = dict(sorted(summary["failed"].items()))
+        logging.info(
+            f"Processo completato. Trovati {len(pdf_files)} file PDF. Estratto testo da "
+            f"{len(summary['processed'])} file, {len(summary['failed'])} falliti."
+        )
+        return summary
+
+    @staticmethod
+    def _join_pages(page_texts):
+        return ''.join(page_text + "\n" for page_text in page_texts if page_text)
+
+    def _collect_parallel_result(self, pdf_path, extracted_text, summary, cache_key=None):
+        if cache_key:
+            self.cache.put(cache_key, extracted_text, pdf_path.stat().st_size)
+        try:
+            if self._write_extracted_text(pdf_path, extracted_text):
+                summary["processed"].append(pdf_path.name)
+            else:
+                summary["empty"].append(pdf_path.name)
+        except OSError as e:
+            logging.error(f"Impossibile scrivere il testo di {pdf_path.name}: {e}")
+            summary["failed"][pdf_path.name] = str(e)
 
-    def _extract_ocr(self, file_pdf):
-        pass
+    def _is_extracted_text_valid(self, text, min_words_per_page=10, min_valid_chars_ratio=0.7):
+        # Numero minimo di parole, rapporto di caratteri validi e assenza di pattern
+        # anomali (caratteri ripetuti, etc.), calcolati in un'unica analisi della pagina
+        return self.quality_scorer.score(text).is_valid(min_words_per_page, min_valid_chars_ratio)
 
-    def _validate_ocr_extraction(self, file_pdf):
-        pass
+    def _extract_text_llama(self):
+        """
+        Estrae con LlamaParse tutti i PDF della directory di input, scrivendo ogni
+        documento in txt_input/<stem>.txt (vedi _extract_text_llama_async).
+
+        Returns:
+            list: Un risultato per file ({"file", "status", "attempts", "seconds", "error"})
+        """
+        logging.info(f"Estrazione LlamaParse da: {self.input_path}")
+        return self._extract_text_llama_async()
+
+    def _extract_text_llama_async(self, max_concurrency=8, requests_per_second=2.0, **kwargs):
+        """
+        Estrae con LlamaParse tutti i PDF della directory di input inviandoli in
+        parallelo. Ogni documento viene scritto in txt_input/<stem>.txt appena
+        termina, quindi un documento lento non blocca gli altri.
+
+        Args:
+            max_concurrency (int): Documenti in elaborazione contemporaneamente
+            requests_per_second (float): Nuovi invii al secondo consentiti
+            **kwargs: Altri argomenti di AsyncLlamaExtractor (max_retries, timeout,
+                      base_url, api_key, ...)
+
+        Returns:
+            list: Un risultato per file ({"file", "status", "attempts", "seconds", "error"})
+        """
+        extractor = AsyncLlamaExtractor(
+            self.output_dir_path,
+            result_type=self.llama_result_type,
+            max_concurrency=max_concurrency,
+            requests_per_second=requests_per_second,
+            cache=self.cache,
+            **kwargs,
+        )
+        results = extractor.run(self._list_input_pdfs())
+        failed = [result["file"] for result in results if result["status"] == "failed"]
+        logging.info(f"LlamaParse asincrono completato: {len(results) - len(failed)} file estratti, {len(failed)} falliti.")
+        return results
+
+    def _get_ocr_extractor(self):
+        """Crea l'estrattore OCR solo quando serve davvero (verifica Tesseract all'avvio)."""
+        if self._ocr_extractor is None:
+            self._ocr_extractor = OCRPdfExtractor(lang=self.ocr_lang, dpi=self.ocr_dpi, cache=self.cache)
+        return self._ocr_extractor
+
+    def _extract_ocr(self, file_pdf, pages=None):
+        """
+        Esegue l'OCR delle pagine indicate di un PDF.
+
+        Args:
+            file_pdf (Path): Percorso al file PDF
+            pages (list, optional): Numeri di pagina (1-indexed); None = tutte
+
+        Returns:
+            dict: {numero pagina: testo OCR}
+        """
+        ocr_extractor = self._get_ocr_extractor()
+        return dict(ocr_extractor.iter_pages(str(file_pdf), pages=pages))
+
+    def _validate_ocr_extraction(self, page_texts):
+        """Restituisce i numeri delle pagine OCR che non superano il controllo di qualita'."""
+        return [page_num for page_num, text in page_texts.items() if not self._is_extracted_text_valid(text)]
+
+    def _extract_pages_llama(self, file_pdf, pages):
+        """
+        Analizza con LlamaParse solo le pagine indicate di un PDF.
+
+        Args:
+            file_pdf (Path): Percorso al file PDF
+            pages (list): Numeri di pagina (1-indexed)
+
+        Returns:
+            dict: {numero pagina: testo}
+        """
+        # Il percorso sincrono di LlamaParse gira un event loop annidato
+        nest_asyncio.apply()
+        parser = LlamaParse(
+            result_type=self.llama_result_type,
+            target_pages=",".join(str(page_num - 1) for page_num in pages),  # LlamaParse usa indici 0-based
+            verbose=False,
+        )
+        page_texts = {}
+        for job_result in parser.get_json_result(str(file_pdf)):
+            for position, page in enumerate(job_result.get("pages", [])):
+                page_num = page.get("page", pages[position] if position < len(pages) else None)
+                text = page.get("md" if self.llama_result_type == "markdown" else "text", "")
+                if page_num in pages:
+                    page_texts[page_num] = text or ""
+        return page_texts
+
+    def _extract_pages_cached(self, file_pdf, backend, extract, pages):
+        """
+        Esegue extract(file_pdf, pages) passando dalla cache del singolo backend:
+        se un backend successivo fallisce, alla riesecuzione non si ripaga quello
+        che era gia' riuscito.
+
+        Returns:
+            dict: {numero pagina: testo}
+        """
+        settings = {"ocr_lang": self.ocr_lang, "ocr_dpi": self.ocr_dpi} if backend == "ocr" \
+            else {"result_type": self.llama_result_type}
+        cache_key = self._cache_key(file_pdf, f"routed-{backend}", pages=pages, **settings)
+        cached = self.cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return {int(page_num): text for page_num, text in json.loads(cached).items()}
+        results = extract(file_pdf, pages)
+        if cache_key:
+            self.cache.put(cache_key, json.dumps(results), file_pdf.stat().st_size,
+                           failed=not any(text.strip() for text in results.values()))
+        return results
+
+    def _route_pages(self, file_pdf):
+        """
+        Estrae un PDF pagina per pagina scegliendo il backend piu' economico che
+        produce testo valido: PyPDF2 per tutte le pagine, poi OCR solo per le pagine
+        che non superano il controllo di qualita', infine LlamaParse solo per quelle
+        ancora non valide. Le pagine in cui l'OCR non trova testo (pagine bianche)
+        non vengono inviate a LlamaParse, salvo con llama_blank_pages.
+
+        Args:
+            file_pdf (Path): Percorso al file PDF
+
+        Returns:
+            tuple: (lista testi pagine, lista di record {"page", "backend", "valid", "quality"},
+                    dict {backend: errore} dei backend falliti)
+        """
+        page_texts = _extract_pdf_pages(str(file_pdf))
+        records = [
+            {"page": page_num, "backend": "pypdf2", "valid": self._is_extracted_text_valid(text)}
+            for page_num, text in enumerate(page_texts, start=1)
+        ]
+        failing = [record["page"] for record in records if not record["valid"]]
+
+        errors = {}
+        blank_pages = set()
+        escalations = [("ocr", self._extract_ocr), ("llamaparse", self._extract_pages_llama)]
+        for backend, extract in escalations:
+            if backend == "llamaparse" and not self.llama_blank_pages:
+                failing = [page_num for page_num in failing if page_num not in blank_pages]
+            if not failing:
+                break
+            logging.info(f"{file_pdf.name}: {len(failing)} pagine inviate a {backend}")
+            try:
+                results = self._extract_pages_cached(file_pdf, backend, extract, failing)
+            except Exception as e:
+                logging.error(f"Errore {backend} su {file_pdf.name}: {e}. Pagine lasciate al backend precedente.")
+                errors[backend] = str(e)
+                continue
+            if backend == "ocr":
+                blank_pages = {page_num for page_num, text in results.items() if not text.strip()}
+            for page_num, text in results.items():
+                record = records[page_num - 1]
+                if self._is_extracted_text_valid(text):
+                    page_texts[page_num - 1] = text
+                    record.update(backend=backend, valid=True)
+                elif len(text.strip()) > len(page_texts[page_num - 1].strip()):
+                    # Nessun backend e' valido: conserva il testo piu' ricco
+                    page_texts[page_num - 1] = text
+                    record["backend"] = backend
+            failing = [record["page"] for record in records if not record["valid"]]
+
+        for record, score in zip(records, self.quality_scorer.score_pages(page_texts)):
+            record["quality"] = asdict(score)
+        return page_texts, records, errors
+
+    def _extract_routed(self, file_pdf):
+        """
+        Estrae un PDF con il routing per pagina, scrive txt_input/<stem>.txt e
+        txt_input/<stem>.pages.json con il backend usato per ogni pagina e il suo
+        offset di inizio nel testo. Il risultato del documento va in cache solo se
+        nessun backend e' fallito; i risultati dei singoli backend riusciti sono in
+        cache a parte (vedi _extract_pages_cached).
+
+        Returns:
+            list: I record per pagina
+        """
+        cache_key = self._cache_key(file_pdf, "routed", result_type=self.llama_result_type,
+                                    ocr_lang=self.ocr_lang, ocr_dpi=self.ocr_dpi,
+                                    llama_blank_pages=self.llama_blank_pages)
+        cached = self.cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            page_texts, records = json.loads(cached)
+        else:
+            page_texts, records, errors = self._route_pages(file_pdf)
+            # Se OCR o LlamaParse sono falliti le pagine restano degradate: non vanno in
+            # cache, cosi' vengono riestratte quando il backend torna disponibile
+            if cache_key and not errors:
+                self.cache.put(cache_key, json.dumps([page_texts, records]), file_pdf.stat().st_size)
+
+        self._write_extracted_text(file_pdf, self._join_pages(page_texts))
+        # Offset in caratteri dell'inizio di ogni pagina nel .txt (vedi _join_pages),
+        # usato a valle per attribuire i chunk alle pagine
+        offset = 0
+        for record, page_text in zip(records, page_texts):
+            record["start"] = offset
+            if page_text:
+                offset += len(page_text) + 1
+        records_path = self.output_dir_path / f"{file_pdf.stem}.pages.json"
+        with open(records_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=2)
+        return records
 
     def _decide_extraction (self):
-        for file_pdf in os.listdir(self.output_dir_path):
-            with open(file_pdf, 'r') as file:
-                content = file.read()
-            if self._is_extracted_text_valid(content) is False:
-                self._extract_ocr(file_pdf)
-                result = self._validate_ocr_extraction(file_pdf)
-                if result is False:
-                    self._extract_text_llama()
-                               
+        """
+        Estrae ogni PDF della directory di input scegliendo il backend pagina per
+        pagina, cosi' che solo le pagine non valide vengano inviate a OCR e LlamaParse.
+        """
+        for file_pdf in self._list_input_pdfs():
+            try:
+                records = self._extract_routed(file_pdf)
+            except Exception as e:
+                logging.error(f"Errore imprevisto durante l'elaborazione di {file_pdf.name}: {e}. File saltato.")
+                continue
+            backends = {}
+            for record in records:
+                backends[record["backend"]] = backends.get(record["backend"], 0) + 1
+            logging.info(f"{file_pdf.name}: pagine per backend {backends}")
+        if self.cache:
+            self.cache.save()
 
     def extract_text(self):
-        
-        type_of_extr =  self._decide_extraction()
-        if type_of_extr == "pdf":
-            self._extract_text_from_pdf()
-        elif type_of_extr == "llama":
-            self._extract_text_llama()
-        elif type_of_extr == "ocr":
-            self._extract_ocr()
-        else:
-            print("Tipo di estrazione non supportato.")
+        self._decide_extraction()
+        logging.info("Estrazione completata con routing per pagina.")
 
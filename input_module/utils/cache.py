@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from input_module.utils.tools import find_project_root
+
+
+class ExtractionCache:
+    """
+    Cache persistente dei testi estratti, indicizzata per contenuto.
+
+    La chiave e' l'hash SHA-256 dei byte del PDF combinato con il backend di
+    estrazione e le sue impostazioni (DPI, lingua, result_type, ...), quindi un
+    file rinominato o spostato viene comunque servito dalla cache, mentre un
+    cambio di impostazioni produce una nuova voce.
+    """
+
+    INDEX_FILENAME = "index.json"
+
+    def __init__(self, cache_dir=None, max_bytes=1024 * 1024 * 1024, failure_ttl=3600):
+        """
+        Args:
+            cache_dir (str, optional): Directory della cache
+                                       (default: <RAGnarok>/.cache/extraction)
+            max_bytes (int): Dimensione massima dei testi in cache; oltre questa
+                             soglia vengono rimosse le voci usate meno di recente
+            failure_ttl (float): Secondi di validita' delle estrazioni fallite o vuote
+                                 (0 = non metterle in cache), cosi' un errore
+                                 transitorio non resta in cache per sempre
+        """
+        if cache_dir is None:
+            cache_dir = find_project_root(marker_name="RAGnarok") / ".cache" / "extraction"
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.failure_ttl = failure_ttl
+        self._index_path = self.cache_dir / self.INDEX_FILENAME
+        self._entries = {}
+        self._stats = {"hits": 0, "misses": 0, "bytes_saved": 0, "evictions": 0}
+        self._load_index()
+        self._size = sum(entry["size"] for entry in self._entries.values())
+
+    def _load_index(self):
+        if not self._index_path.exists():
+            return
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._entries = data.get("entries", {})
+            self._stats.update(data.get("stats", {}))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Indice della cache illeggibile ({e}), la cache viene azzerata.")
+            self._entries = {}
+
+    def save(self):
+        """Scrive l'indice su disco in modo atomico."""
+        tmp_path = self._index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"entries": self._entries, "stats": self._stats}, f)
+        os.replace(tmp_path, self._index_path)
+
+    @staticmethod
+    def file_digest(path, block_size=1024 * 1024):
+        """Calcola l'hash SHA-256 del contenuto di un file leggendolo a blocchi."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def make_key(self, pdf_path, backend, content_digest=None, **settings):
+        """
+        Costruisce la chiave di cache per un PDF.
+
+        Args:
+            pdf_path (str): Percorso al file PDF
+            backend (str): Nome del backend di estrazione (es. 'pypdf2', 'ocr', 'llamaparse')
+            content_digest (str, optional): Hash SHA-256 del file gia' calcolato
+                                            (ad es. da un worker), altrimenti viene letto il file
+            **settings: Impostazioni del backend che influenzano il testo prodotto
+        """
+        if content_digest is None:
+            content_digest = self.file_digest(pdf_path)
+        payload = json.dumps(
+            {"content": content_digest, "backend": backend, "settings": settings},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.txt"
+
+    def get(self, key):
+        """Restituisce il testo in cache per la chiave, oppure None."""
+        entry = self._entries.get(key)
+        entry_path = self._entry_path(key)
+        expired = entry is not None and entry.get("expires") is not None and entry["expires"] <= time.time()
+        if entry is None or expired or not entry_path.exists():
+            if entry is not None:
+                self._size -= self._entries.pop(key)["size"]
+                if expired:
+                    entry_path.unlink(missing_ok=True)
+            self._stats["misses"] += 1
+            return None
+        with open(entry_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        entry["last_access"] = time.time()
+        self._stats["hits"] += 1
+        self._stats["bytes_saved"] += entry.get("source_size", 0)
+        return text
+
+    def put(self, key, text, source_size=0, failed=None):
+        """
+        Salva un testo estratto in cache.
+
+        Args:
+            key (str): Chiave ottenuta da make_key
+            text (str): Testo estratto
+            source_size (int): Dimensione in byte del PDF sorgente, usata per le statistiche
+            failed (bool, optional): Estrazione fallita o senza risultato (default: testo vuoto).
+                                     Queste voci scadono dopo failure_ttl secondi
+
+        L'indice non viene riscritto a ogni inserimento: chiamare save() al termine.
+        """
+        failed = not text if failed is None else failed
+        if failed and self.failure_ttl <= 0:
+            return
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(entry_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        previous = self._entries.get(key)
+        if previous is not None:
+            self._size -= previous["size"]
+        self._entries[key] = {
+            "size": entry_path.stat().st_size,
+            "source_size": source_size,
+            "last_access": time.time(),
+            "expires": time.time() + self.failure_ttl if failed else None,
+        }
+        self._size += self._entries[key]["size"]
+        self._evict()
+
+    def _evict(self):
+        if self._size <= self.max_bytes:
+            return
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_access"]):
+            if self._size <= self.max_bytes:
+                break
+            self._size -= self._entries.pop(key)["size"]
+            try:
+                self._entry_path(key).unlink()
+            except FileNotFoundError:
+                pass
+            self._stats["evictions"] += 1
+
+    def stats(self):
+        """Restituisce le statistiche della cache (hit, miss, byte risparmiati, occupazione)."""
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+        }
@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+from input_module.pdf_input.read import ExtractorManager, _extract_pdf_pages, _extract_pdf_task
+from input_module.utils.cache import ExtractionCache
+
+
+@dataclass
+class IngestJob:
+    """Stato di un file caricato nella coda di ingestione."""
+    job_id: str
+    filename: str
+    path: Path
+    status: str = "queued"  # queued, running, done, failed
+    progress: float = 0.0
+    message: str = ""
+    output_path: Path = None
+    error: str = None
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: float = None
+
+
+class IngestQueue:
+    """
+    Coda di ingestione in background per i file caricati dal front end.
+
+    I file sono identificati dall'hash SHA-256 del contenuto: caricare di nuovo lo
+    stesso file (anche da un altro utente o dopo un rerun di Streamlit) restituisce
+    il job esistente invece di rielaborarlo. I job sono gestiti da un pool di thread
+    che distribuisce l'estrazione delle pagine su un pool di processi condiviso,
+    cosi' l'interfaccia resta reattiva e legge solo lo stato dei job.
+    """
+
+    TEXT_SUFFIXES = {".txt", ".csv", ".json"}
+
+    def __init__(self, upload_dir="temp", max_jobs=4, max_processes=None, pages_per_task=20):
+        """
+        Args:
+            upload_dir (str): Directory in cui salvare i file caricati
+            max_jobs (int): Job elaborati contemporaneamente
+            max_processes (int, optional): Processi per l'estrazione (default: numero di core)
+            pages_per_task (int): Pagine per task di estrazione; determina anche la
+                                  granularita' dell'avanzamento
+        """
+        self.upload_dir = Path(upload_dir)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.pages_per_task = pages_per_task
+        self.manager = ExtractorManager(str(self.upload_dir), max_workers=max_processes)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._job_pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="ingest")
+        self._process_pool = ProcessPoolExecutor(max_workers=self.manager.max_workers)
+
+    def submit(self, data, filename):
+        """
+        Accoda un file caricato. Se lo stesso contenuto e' gia' in coda, in
+        elaborazione o elaborato, restituisce il job esistente.
+
+        Args:
+            data (bytes): Contenuto del file
+            filename (str): Nome originale del file
+
+        Returns:
+            str: Identificativo del job (hash del contenuto)
+        """
+        job_id = hashlib.sha256(data).hexdigest()
+        name = Path(filename).name
+        path = self.upload_dir / name
+        # L'hash di un file omonimo gia' presente si calcola fuori dal lock: il lock
+        # serve solo a registrare il job, cosi' upload concorrenti e polling non
+        # aspettano l'I/O su disco
+        existing_digest = ExtractionCache.file_digest(path) if path.exists() else None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status != "failed":
+                return job_id
+            owner = next((other for other in self._jobs.values() if other.path == path), None)
+            if (owner is not None and owner.job_id != job_id) or existing_digest not in (None, job_id):
+                # Stesso nome ma contenuto diverso: evita di sovrascrivere l'altro file
+                path = self.upload_dir / f"{Path(name).stem}_{job_id[:8]}{Path(name).suffix}"
+            self._jobs[job_id] = IngestJob(job_id=job_id, filename=name, path=path)
+
+        try:
+            # Scrittura su un file temporaneo e rinomina atomica: il job non vede mai un file parziale
+            fd, tmp_path = tempfile.mkstemp(dir=self.upload_dir, suffix=".part")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error(f"Impossibile salvare {name}: {e}")
+            self._update(job_id, status="failed", error=str(e), message="Errore", finished_at=time.time())
+            return job_id
+        self._job_pool.submit(self._run_job, job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Restituisce una copia dello stato del job, oppure None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return replace(job) if job is not None else None
+
+    def jobs(self):
+        """Restituisce una copia dello stato di tutti i job, dal piu' recente."""
+        with self._lock:
+            return sorted((replace(job) for job in self._jobs.values()), key=lambda job: -job.submitted_at)
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            for key, value in changes.items():
+                setattr(job, key, value)
+
+    def _run_job(self, job_id):
+        job = self.get(job_id)
+        self._update(job_id, status="running", message="Estrazione in corso")
+        try:
+            if job.path.suffix.lower() == ".pdf":
+                output_path = self._process_pdf(job)
+            elif job.path.suffix.lower() in self.TEXT_SUFFIXES:
+                text = job.path.read_text(encoding="utf-8", errors="replace")
+                output_path = self.manager._write_extracted_text(job.path, text)
+            else:
+                raise ValueError(f"Formato file non supportato: {job.path.suffix}")
+            self._update(job_id, status="done", progress=1.0, output_path=output_path,
+                         message="Completato" if output_path else "Nessun testo estratto",
+                         finished_at=time.time())
+        except Exception as e:
+            logging.error(f"Ingestione di {job.filename} fallita: {e}")
+            self._update(job_id, status="failed", error=str(e), message="Errore", finished_at=time.time())
+
+    def _process_pdf(self, job):
+        with self._cache_lock:
+            # L'id del job e' gia' l'hash SHA-256 del contenuto
+            cache_key = self.manager._cache_key(job.path, "pypdf2", content_digest=job.job_id)
+            extracted_text = self.manager.cache.get(cache_key) if cache_key else None
+
+        if extracted_text is None:
+            status, payload = self._process_pool.submit(_extract_pdf_task, str(job.path), self.pages_per_task).result()
+            if status == "done":
+                page_texts = payload
+            else:
+                # Documento grande: estrai per intervalli di pagine aggiornando l'avanzamento
+                num_pages = payload
+                futures = [
+                    self._process_pool.submit(_extract_pdf_pages, str(job.path), start, start + self.pages_per_task)
+                    for start in range(0, num_pages, self.pages_per_task)
+                ]
+                page_texts = []
+                for future in futures:
+                    page_texts.extend(future.result())
+                    self._update(job.job_id, progress=min(0.99, len(page_texts) / num_pages),
+                                 message=f"Pagine estratte: {len(page_texts)}/{num_pages}")
+            extracted_text = self.manager._join_pages(page_texts)
+            if cache_key:
+                with self._cache_lock:
+                    self.manager.cache.put(cache_key, extracted_text, job.path.stat().st_size)
+                    self.manager.cache.save()
+
+        return self.manager._write_extracted_text(job.path, extracted_text)
+
+    def shutdown(self, wait=True):
+        self._job_pool.shutdown(wait=wait)
+        self._process_pool.shutdown(wait=wait)
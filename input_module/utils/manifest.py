@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from input_module.utils.cache import ExtractionCache
+
+
+@dataclass
+class ChangeSet:
+    """File aggiunti, modificati, eliminati e invariati rispetto al manifest."""
+    added: list = field(default_factory=list)
+    modified: list = field(default_factory=list)
+    deleted: list = field(default_factory=list)
+    unchanged: list = field(default_factory=list)
+
+    @property
+    def changed(self):
+        """File da (ri)elaborare: aggiunti e modificati, in ordine di nome."""
+        return sorted(self.added + self.modified, key=lambda path: path.name)
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.deleted)
+
+    def summary(self):
+        return {
+            "added": [path.name for path in self.added],
+            "modified": [path.name for path in self.modified],
+            "deleted": [path.name for path in self.deleted],
+            "unchanged": len(self.unchanged),
+        }
+
+
+class IngestManifest:
+    """
+    Manifest persistente dei file di una directory (percorso, dimensione, mtime e
+    hash del contenuto) per l'ingestione incrementale. L'hash viene ricalcolato
+    solo quando dimensione o mtime cambiano, quindi una scansione di una directory
+    invariata costa una stat() per file.
+    """
+
+    def __init__(self, manifest_path):
+        """
+        Args:
+            manifest_path (str): File JSON in cui salvare il manifest
+        """
+        self.manifest_path = Path(manifest_path)
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        self._entries = {}
+        self._scanned = {}
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Manifest illeggibile ({e}): tutti i file saranno rielaborati.")
+
+    @staticmethod
+    def _list_files(directory, suffixes=None):
+        return sorted(
+            (path for path in Path(directory).iterdir()
+             if path.is_file() and (suffixes is None or path.suffix.lower() in suffixes)),
+            key=lambda path: path.name,
+        )
+
+    def scan(self, directory, suffixes=None):
+        """
+        Confronta il contenuto della directory con il manifest senza modificarlo.
+
+        Args:
+            directory (str): Directory da esaminare
+            suffixes (set, optional): Estensioni da considerare (es. {".pdf"})
+
+        Returns:
+            ChangeSet: Le differenze rispetto all'ultima ingestione confermata
+        """
+        directory = Path(directory)
+        changes = ChangeSet()
+        seen = set()
+        for path in self._list_files(directory, suffixes):
+            key = str(path.resolve())
+            seen.add(key)
+            stat = path.stat()
+            entry = self._entries.get(key)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                changes.unchanged.append(path)
+                continue
+            new_entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": ExtractionCache.file_digest(path)}
+            self._scanned[key] = new_entry
+            if entry is None:
+                changes.added.append(path)
+            elif entry["sha256"] == new_entry["sha256"]:
+                # Solo mtime cambiato (es. file copiato di nuovo): contenuto invariato
+                changes.unchanged.append(path)
+            else:
+                changes.modified.append(path)
+
+        directory_key = str(directory.resolve())
+        for key in sorted(self._entries):
+            if key not in seen and os.path.dirname(key) == directory_key:
+                if suffixes is None or Path(key).suffix.lower() in suffixes:
+                    changes.deleted.append(Path(key))
+        return changes
+
+    def commit(self, changes, processed=None):
+        """
+        Registra nel manifest l'esito di un'ingestione e lo salva su disco.
+
+        Args:
+            changes (ChangeSet): Il risultato di scan()
+            processed (list, optional): File elaborati con successo; quelli esclusi
+                                        restano da elaborare alla prossima scansione.
+                                        Default: tutti i file modificati o aggiunti
+        """
+        processed = changes.changed if processed is None else processed
+        for path in list(processed) + changes.unchanged:
+            key = str(Path(path).resolve())
+            if key in self._scanned:
+                self._entries[key] = self._scanned.pop(key)
+        for path in changes.deleted:
+            self._entries.pop(str(path), None)
+        self.save()
+
+    def save(self):
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def watch(self, directory, callback, suffixes=None, interval=5.0, stop_event=None):
+        """
+        Osserva la directory e chiama callback(changes) quando compaiono file nuovi,
+        modificati o eliminati. Un file viene segnalato solo quando dimensione e mtime
+        sono rimasti stabili tra due controlli, per non elaborare file ancora in copia.
+        Il callback restituisce i file elaborati con successo (None = tutti).
+
+        Args:
+            directory (str): Directory da osservare
+            callback (callable): Funzione chiamata con il ChangeSet
+            suffixes (set, optional): Estensioni da considerare
+            interval (float): Secondi tra due controlli
+            stop_event (threading.Event, optional): Interrompe l'osservazione quando impostato
+        """
+        last_seen = {}
+        while stop_event is None or not stop_event.is_set():
+            changes = self.scan(directory, suffixes)
+            current = {}
+            stable = ChangeSet(deleted=changes.deleted, unchanged=changes.unchanged)
+            for path in changes.added + changes.modified:
+                stat = path.stat()
+                current[path] = (stat.st_size, stat.st_mtime_ns)
+                if last_seen.get(path) == current[path]:
+                    (stable.added if path in changes.added else stable.modified).append(path)
+            last_seen = current
+
+            if stable:
+                logging.info(f"Cambiamenti rilevati in {directory}: {stable.summary()}")
+                processed = callback(stable)
+                self.commit(stable, processed)
+            if stop_event is not None:
+                stop_event.wait(interval)
+            else:
+                time.sleep(interval)
@@ -0,0 +1,101 @@
+import string
+from dataclasses import dataclass
+
+# Caratteri considerati validi da _is_extracted_text_valid oltre ad alfanumerici e spazi
+_VALID_PUNCTUATION = '.,;:!?()-'
+
+# Byte ASCII validi (isalnum, isspace o punteggiatura ammessa), eliminati con bytes.translate
+_ASCII_VALID = (
+    string.ascii_letters + string.digits + string.whitespace + '\x1c\x1d\x1e\x1f' + _VALID_PUNCTUATION
+).encode('ascii')
+
+# Pattern anomali tipici di estrazioni fallite (caratteri sostitutivi, ripetizioni)
+_GARBAGE_PATTERNS = ('���', '###', '...', '   ')
+
+_ITALIAN_STOPWORDS = frozenset(
+    "il lo la gli le di del della che non per una uno sono con nel nella anche come questo questa".split()
+)
+_ENGLISH_STOPWORDS = frozenset(
+    "the of and to is that for with are this was from which have not be by an we".split()
+)
+
+
+@dataclass
+class PageQualityScore:
+    """Metriche di qualita' del testo estratto da una pagina."""
+    char_count: int
+    word_count: int
+    valid_char_ratio: float
+    garbage_hits: int
+    language: str
+
+    def is_valid(self, min_words_per_page=10, min_valid_chars_ratio=0.7):
+        """Stesso verdetto di ExtractorManager._is_extracted_text_valid."""
+        return (
+            self.word_count >= max(min_words_per_page, 1)
+            and self.valid_char_ratio >= min_valid_chars_ratio
+            and self.garbage_hits == 0
+        )
+
+
+class TextQualityScorer:
+    """
+    Calcola le metriche di qualita' di un testo estratto senza cicli Python
+    carattere per carattere: i byte ASCII validi del testo codificato in UTF-8
+    vengono rimossi con bytes.translate e solo i pochi caratteri rimasti (non
+    ASCII o non validi) vengono esaminati uno per uno. Parole e pattern anomali sono contati
+    con split() e count(), che lavorano in C.
+    """
+
+    def __init__(self, min_language_hits=3, language_sample_words=2000):
+        """
+        Args:
+            min_language_hits (int): Parole funzionali minime per assegnare una lingua
+            language_sample_words (int): Parole della pagina usate per stimare la lingua
+        """
+        self.min_language_hits = min_language_hits
+        self.language_sample_words = language_sample_words
+
+    def score(self, text):
+        """
+        Calcola le metriche di una pagina.
+
+        Args:
+            text (str): Testo della pagina
+
+        Returns:
+            PageQualityScore: Le metriche della pagina
+        """
+        char_count = len(text)
+        if not char_count:
+            return PageQualityScore(0, 0, 0.0, 0, "unknown")
+
+        # Restano i caratteri ASCII non validi e tutti i caratteri non ASCII: eliminare
+        # byte ASCII non spezza mai le sequenze multibyte, quindi il resto si decodifica
+        remaining = text.encode('utf-8', 'surrogatepass').translate(None, _ASCII_VALID)
+        if remaining.isascii():
+            invalid_chars = len(remaining)
+        else:
+            remaining = remaining.decode('utf-8', 'surrogatepass')
+            invalid_chars = sum(1 for c in remaining if c.isascii() or not (c.isalnum() or c.isspace()))
+
+        words = text.split()
+        return PageQualityScore(
+            char_count=char_count,
+            word_count=len(words),
+            valid_char_ratio=(char_count - invalid_chars) / char_count,
+            garbage_hits=sum(text.count(pattern) for pattern in _GARBAGE_PATTERNS),
+            language=self._guess_language(words[:self.language_sample_words]),
+        )
+
+    def score_pages(self, page_texts):
+        """Calcola le metriche per una lista di pagine."""
+        return [self.score(text) for text in page_texts]
+
+    def _guess_language(self, words):
+        sample = [word.lower() for word in words]
+        italian = sum(map(_ITALIAN_STOPWORDS.__contains__, sample))
+        english = sum(map(_ENGLISH_STOPWORDS.__contains__, sample))
+        if max(italian, english) < self.min_language_hits:
+            return "unknown"
+        return "it" if italian >= english else "en"
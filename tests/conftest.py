@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Il progetto non e' un pacchetto installato: i test importano i moduli dalla radice
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,60 @@
+from vec_rag.chunking.dedup import ChunkDeduplicator
+
+TEXT_A = "il gatto dorme sul divano del salotto tutto il pomeriggio senza muoversi mai"
+TEXT_C = "domani mattina partiamo presto per la montagna con gli zaini pieni di provviste"
+TEXT_B = "la relazione annuale descrive i risultati finanziari del gruppo nel secondo trimestre"
+
+
+def test_changed_chunk_replaces_its_old_state(tmp_path):
+    db_path = tmp_path / "dedup.sqlite"
+    first = ChunkDeduplicator(db_path=db_path)
+    assert first.check("doc.txt#0", TEXT_A)[0] is None
+    first.close()
+
+    # Stesso chunk_id posizionale, testo nuovo: non deve essere duplicato di se stesso
+    second = ChunkDeduplicator(db_path=db_path)
+    assert second.check("doc.txt#0", TEXT_B)[0] is None
+    # Il vecchio testo non e' piu' rappresentato da doc.txt#0
+    assert second.check("other.txt#0", TEXT_A)[0] is None
+    second.close()
+
+
+def test_remove_sources_promotes_duplicates(tmp_path):
+    doc, doc2, copy = (str(tmp_path / name) for name in ("doc.txt", "doc.txt2", "copy.txt"))
+    dedup = ChunkDeduplicator(db_path=tmp_path / "dedup.sqlite")
+    assert dedup.check("doc.txt#0", TEXT_A, doc)[0] is None
+    assert dedup.check("doc.txt#1", TEXT_B, doc)[0] is None
+    assert dedup.check("doc.txt2#0", TEXT_C, doc2)[0] is None
+    assert dedup.check("copy.txt#0", TEXT_A, copy)[0] == "doc.txt#0"
+    assert dedup.check("copy.txt#1", TEXT_A, copy)[0] == "doc.txt#0"
+
+    # copy.txt#0 non e' mai stato emesso: diventa canonico e va rielaborato
+    assert dedup.remove_sources([doc]) == ["copy.txt#0"]
+    assert dedup.sources_of(["copy.txt#0"]) == {"copy.txt#0": copy}
+    assert dedup.canonical("copy.txt#1") == "copy.txt#0"
+    assert dedup.check("new.txt#0", TEXT_A)[0] == "copy.txt#0"
+    # I chunk di un documento con lo stesso prefisso nel nome restano
+    assert dedup.check("new.txt#1", TEXT_C)[0] == "doc.txt2#0"
+    dedup.close()
+
+
+def test_remove_sources_matches_full_path(tmp_path):
+    first, second = str(tmp_path / "a" / "doc.txt"), str(tmp_path / "b" / "doc.txt")
+    dedup = ChunkDeduplicator(db_path=tmp_path / "dedup.sqlite")
+    assert dedup.check(f"{first}#0", TEXT_A, first)[0] is None
+    assert dedup.check(f"{second}#0", TEXT_B, second)[0] is None
+
+    assert dedup.remove_sources([first]) == []
+    assert dedup.sources_of([f"{first}#0", f"{second}#0"]) == {f"{second}#0": second}
+    dedup.close()
+
+
+def test_changed_canonical_promotes_its_duplicate(tmp_path):
+    dedup = ChunkDeduplicator(db_path=tmp_path / "dedup.sqlite")
+    assert dedup.check("doc.txt#0", TEXT_A)[0] is None
+    assert dedup.check("copy.txt#0", TEXT_A)[0] == "doc.txt#0"
+
+    assert dedup.check("doc.txt#0", TEXT_B)[0] is None
+    assert dedup.promoted == ["copy.txt#0"]
+    assert dedup.canonical("copy.txt#0") == "copy.txt#0"
+    dedup.close()
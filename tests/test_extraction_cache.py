@@ -0,0 +1,36 @@
+import os
+import time
+
+from input_module.utils.cache import ExtractionCache
+
+
+def test_cache_key_follows_content_and_settings(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache")
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4 uno")
+    key = cache.make_key(pdf, "ocr", dpi=300)
+    cache.put(key, "testo estratto", source_size=12)
+
+    renamed = tmp_path / "b.pdf"
+    os.replace(pdf, renamed)
+    assert cache.make_key(renamed, "ocr", dpi=300) == key
+    assert cache.get(key) == "testo estratto"
+    assert cache.make_key(renamed, "ocr", dpi=200) != key
+    assert cache.make_key(renamed, "pypdf2", dpi=300) != key
+
+    renamed.write_bytes(b"%PDF-1.4 due")
+    assert cache.make_key(renamed, "ocr", dpi=300) != key
+
+
+def test_cache_failures_expire(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache", failure_ttl=0)
+    cache.put("k" * 64, "")
+    assert cache.get("k" * 64) is None
+
+    cache = ExtractionCache(tmp_path / "cache", failure_ttl=0.01)
+    cache.put("f" * 64, "", failed=True)
+    cache.put("s" * 64, "testo")
+    time.sleep(0.02)
+    assert cache.get("s" * 64) == "testo"
+    assert cache.get("f" * 64) is None
+    assert not cache._entry_path("f" * 64).exists()
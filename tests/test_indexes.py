@@ -0,0 +1,204 @@
+import numpy as np
+import pytest
+
+from vec_rag.chunking.records import ChunkRecord
+from vec_rag.index.bm25 import BM25Index, tokenize
+from vec_rag.index.exact import ExactIndex
+from vec_rag.index.ivf import IVFIndex
+from vec_rag.index.quantization import ProductQuantizer, QuantizedIndex, ScalarQuantizer
+
+METRICS = ("cosine", "ip", "l2")
+
+
+def _data(n=600, dim=16, nq=7, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32), rng.standard_normal((nq, dim)).astype(np.float32)
+
+
+def _brute_force(vectors, queries, k, metric):
+    """Righe e punteggi esatti (piu' alti = migliori), calcolati in un colpo solo."""
+    if metric == "cosine":
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ vectors.T
+    if metric == "l2":
+        scores = -((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    rows = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    return rows, np.take_along_axis(scores, rows, axis=1)
+
+
+def _check(metric, scores, rows, expected_rows, expected_scores):
+    np.testing.assert_array_equal(rows, expected_rows)
+    expected = -expected_scores if metric == "l2" else expected_scores
+    np.testing.assert_allclose(scores, expected, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_exact_matches_brute_force(metric):
+    vectors, queries = _data()
+    index = ExactIndex(vectors, metric, block_size=128, query_batch_size=3)
+    _check(metric, *index.search(queries, k=5), *_brute_force(vectors, queries, 5, metric))
+
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_ivf_with_all_cells_matches_brute_force(metric):
+    vectors, queries = _data()
+    index = IVFIndex(nlist=8, metric=metric, num_threads=2, block_size=128).build(vectors, iterations=5)
+    _check(metric, *index.search(queries, k=5, nprobe=8), *_brute_force(vectors, queries, 5, metric))
+
+
+@pytest.mark.parametrize("quantizer", [ScalarQuantizer, lambda: ProductQuantizer(m=4, iterations=5)])
+@pytest.mark.parametrize("metric", METRICS)
+def test_quantized_with_full_rerank_matches_brute_force(quantizer, metric):
+    vectors, queries = _data()
+    # rerank_factor * k >= n: il re-ranking esatto rivaluta tutti i vettori
+    index = QuantizedIndex(quantizer(), metric, block_size=128, rerank_vectors=vectors, rerank_factor=len(vectors))
+    index.build(vectors)
+    _check(metric, *index.search(queries, k=5), *_brute_force(vectors, queries, 5, metric))
+
+
+@pytest.mark.parametrize("in_place", [True, False])
+def test_ivf_save_and_load(tmp_path, in_place):
+    vectors, queries = _data()
+    directory = tmp_path / "ivf"
+    index = IVFIndex(nlist=8, metric="l2", nprobe=3).build(
+        vectors, directory=directory if in_place else None, iterations=5)
+    assert isinstance(index.vectors, np.memmap)
+    expected = index.search(queries, k=5)
+    index.save(directory)
+    assert (directory / "norms.npy").exists()
+    loaded = IVFIndex.load(directory)
+    for got, want in zip(loaded.search(queries, k=5), expected):
+        np.testing.assert_array_equal(got, want)
+
+
+def test_empty_query_batch():
+    vectors, _ = _data()
+    empty = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+    ivf = IVFIndex(nlist=8, num_threads=2).build(vectors, iterations=2)
+    quantized = QuantizedIndex(ScalarQuantizer()).build(vectors)
+    for index in (ExactIndex(vectors), ivf, quantized):
+        scores, rows = index.search(empty, k=5)
+        assert scores.shape == rows.shape == (0, 5)
+
+
+def test_non_positive_k():
+    vectors, queries = _data()
+    ivf = IVFIndex(nlist=8).build(vectors, iterations=2)
+    quantized = QuantizedIndex(ScalarQuantizer()).build(vectors)
+    for index in (ExactIndex(vectors), ivf, quantized):
+        for k in (0, -3):
+            scores, rows = index.search(queries, k=k)
+            assert scores.shape == rows.shape == (len(queries), 0)
+
+
+def _bm25_brute_force(documents, query, k1=1.2, b=0.75):
+    tokens = {doc_id: tokenize(text) for doc_id, text in documents.items()}
+    n = len(tokens)
+    avgdl = sum(len(words) for words in tokens.values()) / n
+    scores = {}
+    for term in dict.fromkeys(tokenize(query)):
+        df = sum(term in words for words in tokens.values())
+        idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        for doc_id, words in tokens.items():
+            tf = words.count(term)
+            if tf:
+                norm = k1 * (1.0 - b + b * len(words) / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+    return scores
+
+
+def _corpus(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(60)]
+    # Frequenze molto diverse tra i termini, come in un corpus reale
+    weights = 1.0 / np.arange(1, len(words) + 1)
+    weights /= weights.sum()
+    return {f"doc.txt#{i}": " ".join(rng.choice(words, size=rng.integers(3, 40), p=weights)) for i in range(n)}
+
+
+def _records(documents):
+    return [ChunkRecord(chunk_id=chunk_id, text=text, source=chunk_id.split("#")[0], index=i, start=None, end=None,
+                        token_count=len(text.split()))
+            for i, (chunk_id, text) in enumerate(documents.items())]
+
+
+def _check_bm25(index, documents, queries=("w0 w5 w33", "w59", "w1 w2 w3 w4 w50 w51", "assente")):
+    assert len(index) == len(documents)
+    for query in queries:
+        expected = _bm25_brute_force(documents, query)
+        results = index.search(query, k=10)
+        top = sorted(expected.values(), reverse=True)[:10]
+        np.testing.assert_allclose([score for _, score in results], top, rtol=1e-4)
+        for chunk_id, score in results:
+            assert expected[chunk_id] == pytest.approx(score, rel=1e-4)
+
+
+def test_bm25_matches_exhaustive_scoring(tmp_path):
+    documents = _corpus()
+    index = BM25Index(tmp_path / "bm25")
+    index.add(_records(documents), segment_size=70)
+    _check_bm25(index, documents)
+
+
+def test_bm25_remove_sources(tmp_path):
+    documents = {chunk_id.replace("doc.txt", f"doc{i % 3}.txt"): text
+                 for i, (chunk_id, text) in enumerate(_corpus().items())}
+    index = BM25Index(tmp_path / "bm25")
+    index.add(_records(documents), segment_size=70)
+
+    assert index.remove_sources(["doc1.txt"]) == 100
+    documents = {chunk_id: text for chunk_id, text in documents.items() if not chunk_id.startswith("doc1.txt#")}
+    _check_bm25(index, documents)
+    _check_bm25(BM25Index(tmp_path / "bm25"), documents)
+
+    # Documento modificato: i nuovi chunk sostituiscono quelli vecchi
+    index.remove_sources(["doc2.txt"])
+    changed = {f"doc2.txt#{i}": f"w{i} w{i + 1} nuovo" for i in range(5)}
+    index.add(_records(changed))
+    documents = {chunk_id: text for chunk_id, text in documents.items() if not chunk_id.startswith("doc2.txt#")}
+    documents.update(changed)
+    _check_bm25(BM25Index(tmp_path / "bm25"), documents, ("w0 w5 w33", "nuovo w3", "w2"))
+
+
+def test_bm25_remove_sources_matches_full_path(tmp_path):
+    documents = {"a/doc.txt#0": "w0 w1", "b/doc.txt#0": "w0 w2", "a/doc.txt#1": "w1 w3"}
+    index = BM25Index(tmp_path / "bm25")
+    index.add(_records(documents))
+
+    assert index.remove_sources(["a/doc.txt"]) == 2
+    _check_bm25(BM25Index(tmp_path / "bm25"), {"b/doc.txt#0": "w0 w2"}, ("w0", "w1 w2"))
+
+
+def test_bm25_skips_fully_deleted_postings(tmp_path):
+    documents = {f"doc.txt#{i}": "alpha beta" for i in range(5)}
+    documents["long.txt#0"] = "rare " + "filler " * 200
+    index = BM25Index(tmp_path / "bm25")
+    index.add(_records(documents))
+
+    index.remove_sources(["long.txt"])
+    del documents["long.txt#0"]
+    _check_bm25(index, documents, ("alpha rare", "rare", "filler beta"))
+    assert index.search("alpha rare", k=1)[0][0].startswith("doc.txt#")
+
+
+def test_bm25_ignores_interrupted_segment(tmp_path):
+    documents = _corpus(50)
+    index = BM25Index(tmp_path / "bm25")
+    index.add(_records(documents))
+    # Segmento scritto ma non registrato (interruzione prima di index.json)
+    (tmp_path / "bm25" / "seg_000001").mkdir()
+    (tmp_path / "bm25" / "seg_000002.tmp").mkdir()
+    index = BM25Index(tmp_path / "bm25")
+    extra = {"new.txt#0": "w0 w1 aggiunto"}
+    index.add(_records(extra))
+    documents.update(extra)
+    _check_bm25(BM25Index(tmp_path / "bm25"), documents, ("w0 aggiunto", "w7"))
+    assert sorted(child.name for child in (tmp_path / "bm25").iterdir() if child.is_dir()) == ["seg_000000", "seg_000001"]
+
+
+def test_quantized_empty_index():
+    vectors, queries = _data()
+    index = QuantizedIndex(ScalarQuantizer())
+    scores, rows = index.search(queries, k=5)
+    assert scores.shape == rows.shape == (len(queries), 0)
@@ -0,0 +1,40 @@
+import os
+
+from input_module.utils.manifest import IngestManifest
+
+
+def test_manifest_detects_changes(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("uno")
+    (docs / "b.txt").write_text("due")
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    changes = manifest.scan(docs)
+    assert [path.name for path in changes.added] == ["a.txt", "b.txt"]
+    manifest.commit(changes)
+
+    (docs / "a.txt").write_text("uno, modificato")
+    (docs / "b.txt").unlink()
+    (docs / "c.txt").write_text("tre")
+    stat = (docs / "c.txt").stat()
+    changes = IngestManifest(tmp_path / "manifest.json").scan(docs)
+    assert changes.summary() == {"added": ["c.txt"], "modified": ["a.txt"], "deleted": ["b.txt"], "unchanged": 0}
+
+    # Solo mtime cambiato: contenuto invariato
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    manifest.commit(manifest.scan(docs))
+    os.utime(docs / "c.txt", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    changes = manifest.scan(docs)
+    assert not changes
+    assert len(changes.unchanged) == 2
+
+
+def test_manifest_keeps_unprocessed_files_pending(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("uno")
+    (docs / "b.txt").write_text("due")
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    changes = manifest.scan(docs)
+    manifest.commit(changes, processed=[docs / "a.txt"])
+    assert [path.name for path in manifest.scan(docs).added] == ["b.txt"]
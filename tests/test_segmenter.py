@@ -0,0 +1,25 @@
+import pytest
+
+from vec_rag.chunking.segmenter import RegexSentenceSegmenter
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Vaswani et al. [31] proposed the Transformer. It relies on attention.",
+     ["Vaswani et al. [31] proposed the Transformer.", "It relies on attention."]),
+    ("The model reaches 28.4 BLEU. Training took 3.5 days.",
+     ["The model reaches 28.4 BLEU.", "Training took 3.5 days."]),
+    ("A. Vaswani and N. Shazeer wrote it, e.g. in Sec. 3. It was published in 2017.",
+     ["A. Vaswani and N. Shazeer wrote it, e.g. in Sec. 3.", "It was published in 2017."]),
+    ("Take vitamin C. It helps.", ["Take vitamin C.", "It helps."]),
+    ("The rod is 3 m. The next one is longer.", ["The rod is 3 m.", "The next one is longer."]),
+    ("Say no. See No. 5 instead.", ["Say no.", "See No. 5 instead."]),
+    ("Siamo arrivati al. Poi si vedra'.", ["Siamo arrivati al.", "Poi si vedra'."]),
+])
+def test_split(text, expected):
+    assert RegexSentenceSegmenter().split(text) == expected
+
+
+def test_spans_are_offsets_into_the_text():
+    text = "  Prima frase. Seconda frase!  "
+    spans = RegexSentenceSegmenter().spans(text)
+    assert [text[start:end] for start, end in spans] == ["Prima frase.", "Seconda frase!"]
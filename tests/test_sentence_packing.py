@@ -0,0 +1,40 @@
+import random
+import re
+
+import pytest
+
+from benchmarks.bench_sentence_chunking import legacy_sentence_chunks
+from vec_rag.chunking.sentence_packing import chunk_sentences
+
+# Pre-token come tiktoken (lo spazio si attacca alla parola successiva), spezzati ogni 3 caratteri:
+# " abc" conta 2 token e "abc" 1, quindi la correzione di giunzione non e' banale
+_PRETOKEN_RE = re.compile(r" ?\w+| ?[^\w\s]+|\s+")
+
+
+class _Tokenizer:
+    def encode(self, text):
+        return [piece[i:i + 3] for piece in _PRETOKEN_RE.findall(text) for i in range(0, len(piece), 3)]
+
+
+def _sentences(n, seed):
+    rng = random.Random(seed)
+    words = ["a", "ab", "abc", "abcd", "transformer", "x1", "(nota)", "42", "e'", "l'attenzione"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(1, 30))) + rng.choice(".!?") for _ in range(n)]
+
+
+@pytest.mark.parametrize("max_tokens", [5, 20, 64])
+@pytest.mark.parametrize("overlap", [0, 1, 3])
+def test_same_chunks_as_legacy_algorithm(max_tokens, overlap):
+    tokenizer = _Tokenizer()
+    for seed in range(5):
+        sentences = _sentences(120, seed)
+        expected = legacy_sentence_chunks(sentences, tokenizer, max_tokens, overlap)
+        count = lambda text: len(tokenizer.encode(text))
+        assert chunk_sentences(sentences, count, max_tokens, overlap) == expected
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        chunk_sentences(["Una frase."], len, 0)
+    with pytest.raises(ValueError):
+        chunk_sentences(["Una frase."], len, 10, overlap_sentences=-1)
@@ -0,0 +1,66 @@
+import pytest
+
+from vec_rag.chunking.records import ChunkRecord, locate_chunks
+from vec_rag.chunking.span_store import SpanStore
+
+
+def _records(source, text, chunks):
+    records = []
+    for index, (chunk, span) in enumerate(zip(chunks, locate_chunks(text, chunks))):
+        start, end = span if span is not None else (None, None)
+        records.append(ChunkRecord(chunk_id=f"{source}#{index}", text=chunk, source=source, index=index,
+                                   start=start, end=end, token_count=len(chunk.split())))
+    return records
+
+
+def test_round_trip(tmp_path):
+    documents = {
+        "a.txt": ("Prima frase. Seconda frase con àccenti ñ. Terza.",
+                  ["Prima frase. Seconda frase", "Seconda frase con àccenti ñ.", "Terza."]),
+        "b.txt": ("Un altro documento.", ["Un altro documento."]),
+    }
+    store = SpanStore()
+    for source, (text, chunks) in documents.items():
+        store.add_document(source, text, _records(source, text, chunks))
+    store.save(tmp_path)
+    loaded = SpanStore.load(tmp_path)
+
+    expected = [chunk for _, chunks in documents.values() for chunk in chunks]
+    for candidate in (store, loaded):
+        assert list(candidate) == expected
+        assert [candidate.source(doc_id) for doc_id in range(candidate.num_documents)] == list(documents)
+        assert [candidate.document_text(doc_id) for doc_id in range(candidate.num_documents)] == \
+            [text for text, _ in documents.values()]
+        assert candidate.span(1)[0] == 0 and candidate.span(3)[0] == 1
+
+
+def test_unlocatable_chunk_is_kept_outside_the_document():
+    text = "Hello world ñ."
+    store = SpanStore()
+    store.add_document("a.txt", text, _records("a.txt", text, ["Hello world", "rewritten"]))
+    store.add_document("b.txt", "Second.", _records("b.txt", "Second.", ["Second."]))
+
+    assert list(store) == ["Hello world", "rewritten", "Second."]
+    assert store.document_text(0) == text
+    assert store.document_text(1) == "Second."
+
+
+def test_loaded_store_is_read_only(tmp_path):
+    store = SpanStore()
+    store.add_document("a.txt", "Testo.", _records("a.txt", "Testo.", ["Testo."]))
+    store.save(tmp_path)
+    loaded = SpanStore.load(tmp_path)
+    with pytest.raises(RuntimeError):
+        loaded.add_document("b.txt", "Altro.", [])
+
+
+def test_locate_chunks_tolerates_whitespace_within_window():
+    sentences = [f"Frase numero {i}." for i in range(2000)]
+    text = "\n".join(sentences)
+    chunks = [" ".join(sentences[i:i + 3]) for i in range(0, 2000, 3)]
+    # Chunk riscritto (es. decodifica con U+FFFD) in mezzo al documento
+    chunks.insert(10, "Frase numero �.")
+    spans = locate_chunks(text, chunks)
+    assert spans[10] is None
+    for chunk, span in zip(chunks[:10] + chunks[11:], spans[:10] + spans[11:]):
+        assert text[span[0]:span[1]].split() == chunk.split()
@@ -0,0 +1,73 @@
+import numpy as np
+
+from vec_rag.chunking.records import ChunkRecord
+from vec_rag.embedding.pipeline import EmbeddingPipeline
+from vec_rag.embedding.store import VectorStore, VectorStoreWriter
+
+
+def _write(path, vectors):
+    writer = VectorStoreWriter(path, vectors.shape[1], "test")
+    writer.append([f"doc#{i}" for i in range(len(vectors))], [str(i) for i in range(len(vectors))], vectors)
+    writer.close()
+
+
+def test_rewrite_keeps_open_readers_valid(tmp_path):
+    path = tmp_path / "vectors"
+    first = np.arange(12, dtype=np.float32).reshape(4, 3)
+    _write(path, first)
+    reader = VectorStore(path)
+
+    second = -np.arange(6, dtype=np.float32).reshape(2, 3)
+    _write(path, second)
+    assert VectorStore.exists(path)
+    # Il lettore aperto prima della riscrittura vede ancora la sua versione
+    np.testing.assert_array_equal(reader.vectors, first)
+    assert reader.chunk_id(3) == "doc#3"
+    reader.close()
+
+    _write(path, first)
+    current = VectorStore(path)
+    np.testing.assert_array_equal(current.vectors, first)
+    assert current.chunk_ids([1, 0]) == ["doc#1", "doc#0"]
+    current.close()
+    # Restano solo la versione corrente e la precedente
+    assert len([child for child in path.iterdir() if child.is_dir()]) == 2
+
+
+def test_rewrite_keeps_versions_being_written(tmp_path):
+    path = tmp_path / "vectors"
+    vectors = np.ones((2, 3), dtype=np.float32)
+    _write(path, vectors)
+    # Un altro writer ha iniziato a scrivere ma non ha ancora pubblicato
+    pending = VectorStoreWriter(path, 3, "test")
+    _write(path, vectors)
+    _write(path, vectors)
+    assert pending.tmp_path.exists()
+    pending.append(["doc#0"], ["0"], vectors[:1])
+    pending.close()
+    current = VectorStore(path)
+    assert current.path == pending.tmp_path
+    current.close()
+
+
+def _records(source, texts):
+    name = source.rsplit("/", 1)[-1]
+    return [ChunkRecord(chunk_id=f"{name}#{i}", text=text, source=source, index=i, start=None, end=None)
+            for i, text in enumerate(texts)]
+
+
+def test_pipeline_remove_sources_and_append(tmp_path):
+    pipeline = EmbeddingPipeline(backend="hashing", store_path=tmp_path / "vectors", batch_size=2)
+    pipeline.run(_records("in/a.txt", ["uno", "due", "tre"]) + _records("in/b.txt", ["quattro"]))
+
+    pipeline.remove_sources(["in/a.txt"])
+    store = VectorStore(tmp_path / "vectors")
+    assert [chunk_id for _, chunk_id in store.iter_ids()] == ["b.txt#0"]
+    store.close()
+
+    stats = pipeline.run(_records("in/a.txt", ["uno nuovo"]) + _records("in/b.txt", ["quattro"]), append=True)
+    assert stats["reused"] == 1
+    store = VectorStore(tmp_path / "vectors")
+    assert sorted(chunk_id for _, chunk_id in store.iter_ids()) == ["a.txt#0", "b.txt#0"]
+    assert len(store) == 2
+    store.close()
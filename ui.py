@@ -1,39 +1,54 @@
 import streamlit as st
-import os
-from input_module.pdf_input.read import extract_text_from_pdf
+import time
+from input_module.utils.ingest_queue import IngestQueue
+
+
+@st.cache_resource
+def get_ingest_queue():
+    # Una sola coda per processo Streamlit, condivisa da tutte le sessioni
+    return IngestQueue(upload_dir="temp")
+
 
 def main():
     # Titolo dell'app
     st.title("Carica un file per l'elaborazione")
 
+    ingest_queue = get_ingest_queue()
+    uploads = st.session_state.setdefault("uploads", {})
+
     # Widget per il caricamento del file
-    uploaded_file = st.file_uploader("Trascina o seleziona un file", type=["txt", "csv", "json", "pdf"])  # Specifica i formati supportati
-
-    if uploaded_file is not None:
-        # Mostra il nome del file caricato
-        st.success(f"File caricato: {uploaded_file.name}")
-        
-        # Salvataggio temporaneo
-        save_path = os.path.join("temp", uploaded_file.name)
-        os.makedirs("temp", exist_ok=True)
-        
-        with open(save_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        st.info(f"File salvato temporaneamente in {save_path}")
-
-        extract_text_from_pdf(save_path)
-        
-        # Aggiungi qui la tua logica di elaborazione
-        st.write("🔄 Elaborazione del file in corso...")
-        
-        # Esempio di elaborazione: lettura del contenuto se è un file di testo
-        if uploaded_file.type == "text/plain":
-            with open(save_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            st.text_area("Contenuto del file:", content, height=200)
-        
-        st.success("✅ Elaborazione completata!")
+    uploaded_files = st.file_uploader(
+        "Trascina o seleziona un file",
+        type=["txt", "csv", "json", "pdf"],  # Specifica i formati supportati
+        accept_multiple_files=True,
+    )
+
+    for uploaded_file in uploaded_files or []:
+        # Streamlit riesegue lo script a ogni interazione: accoda ogni upload una volta sola.
+        # La coda deduplica comunque per contenuto, anche tra utenti diversi.
+        if uploaded_file.file_id not in uploads:
+            uploads[uploaded_file.file_id] = ingest_queue.submit(uploaded_file.getvalue(), uploaded_file.name)
+
+    running = False
+    for job_id in uploads.values():
+        job = ingest_queue.get(job_id)
+        if job is None:
+            continue
+        if job.status in ("queued", "running"):
+            running = True
+            st.progress(job.progress, text=f"🔄 {job.filename}: {job.message or 'In coda'}")
+        elif job.status == "done":
+            st.success(f"✅ {job.filename}: {job.message}")
+            if job.output_path and job.path.suffix.lower() == ".txt":
+                with open(job.output_path, "r", encoding="utf-8") as f:
+                    st.text_area("Contenuto del file:", f.read(), height=200, key=job_id)
+        else:
+            st.error(f"❌ {job.filename}: {job.error}")
+
+    # Aggiorna lo stato finche' ci sono job in corso
+    if running:
+        time.sleep(1)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -1,17 +1,27 @@
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain_openai.embeddings import OpenAIEmbeddings
+from langchain_experimental.text_splitter import SemanticChunker, combine_sentences
 import os
-from RAGnarok.input_module.pdf_input.read import get_input_path
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.text_splitter import TokenTextSplitter
-import tiktoken # Importato per mostrare il conteggio dei token (opzionale per lo split)
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from vec_rag.chunking.sentence_packing import sentence_token_counts, pack_sentences
+from vec_rag.chunking.tokenizer import get_tokenizer
+from vec_rag.chunking.records import ChunkRecord, locate_chunks, page_of
+from vec_rag.chunking.parallel import ParallelChunkExecutor
+from vec_rag.chunking.span_store import SpanStore
+from vec_rag.chunking.segmenter import RegexSentenceSegmenter
 import nltk
 import re 
 import numpy as np
-from langchain.schema.document import Document
 import inspect
+import json
 import logging
+import time
+import hashlib
+from collections import deque
+from pathlib import Path
+from input_module.utils.tools import find_project_root
+from input_module.utils.manifest import IngestManifest
+from vec_rag.embedding.backends import get_embedding_backend
+from vec_rag.embedding.cache import EmbeddingCache
+from vec_rag.embedding.embeddings import CachedEmbeddings
 
 
 class ChunkManager:
@@ -21,11 +31,28 @@ class ChunkManager:
                  verbose = False,
                  overlap_sentences = 1,
                  separator = "\n\n",
-                 min_chunk_size = 1):
-        #TODO : build documents from reading the directory path
+                 min_chunk_size = 1,
+                 embedding_backend = "openai",
+                 embedding_batch_size = 512,
+                 use_embedding_cache = True,
+                 sentence_segmenter = "nltk",
+                 prefer_semantic_in_auto = False,
+                 auto_analysis_chars = 5000,
+                 auto_section_chars = 50000,
+                 auto_report_max = 10000,
+                 analysis_cache_max = 10000,
+                 cache_dir = None):
         #TODO : cambiare i parametri delle funzioni prendendo quelli del costruttore 
-        self.documents = self._build_documents(directory_path)
+        self.directory_path = Path(directory_path)
+        # Cache su disco (manifest, analisi automatiche, embedding): default <RAGnarok>/.cache,
+        # cercata solo al primo uso cosi' il ChunkManager si crea anche fuori dal progetto
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._manifest = None
+        # File saltati da iter_documents perche' illeggibili (anche nei worker paralleli)
+        self.skipped_files = []
         self.encoding_name = encoding_name
+        # Tokenizer condiviso dal processo: encoder in cache, conteggi a lotti e memo LRU
+        self.tokenizer = get_tokenizer(encoding_name)
         self.verbose = verbose
         self.overlap_sentences = overlap_sentences
         self.separator = separator
@@ -34,14 +61,85 @@ class ChunkManager:
         self.breakpoint_threshold_type = breakpoint_threshold_type
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # "openai", "hashing" (locale, offline) o un'istanza di EmbeddingBackend
+        self.embedding_backend = embedding_backend
+        self.embedding_batch_size = embedding_batch_size
+        self.use_embedding_cache = use_embedding_cache
+        # "nltk" (punkt) o "regex" (RegexSentenceSegmenter, veloce e senza dati esterni;
+        # da rendere predefinito solo dopo il confronto con NLTK di benchmarks/bench_segmenter)
+        if sentence_segmenter not in ("regex", "nltk"):
+            raise ValueError(f"Segmentatore di frasi sconosciuto: '{sentence_segmenter}'. Validi: ['regex', 'nltk']")
+        self.sentence_segmenter = sentence_segmenter
+        self._segmenter = RegexSentenceSegmenter()
+        self._embeddings = None
+        # Modalita' automatica: strategia scelta per documento (o sezione dei documenti lunghi)
+        self.prefer_semantic_in_auto = prefer_semantic_in_auto
+        self.openai_api_key_present = bool(os.environ.get("OPENAI_API_KEY"))
+        self.auto_analysis_chars = auto_analysis_chars
+        self.auto_section_chars = auto_section_chars
+        # Ultime auto_report_max decisioni; i totali di automatic_summary() coprono tutte le decisioni
+        self.auto_report_max = auto_report_max
+        self.auto_report = deque(maxlen=auto_report_max)
+        self._auto_totals = {"sections": 0, "documents": 0, "strategies": {}, "cached_analyses": 0,
+                             "analysis_seconds": 0.0}
+        self.analysis_cache_max = analysis_cache_max
+        self._analysis_cache = None
         self._chunking_strategies = {
             "semantic": self._semantic_chunking,
             "recursive": self._recursive_chunking,
             "fixed_size": self._fixed_size_chunking,
             "separator": self._section_chunking_by_separator,
             "sentence-aware": self._sentence_aware_chunking,
+            "automatic": self._automatic_chunking,
         }
 
+    def config(self):
+        """Argomenti del costruttore che ricreano questo ChunkManager (es. nei processi worker)."""
+        return {
+            "directory_path": str(self.directory_path),
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "breakpoint_threshold_type": self.breakpoint_threshold_type,
+            "encoding_name": self.encoding_name,
+            "max_tokens_per_chunk": self.max_tokens_per_chunk,
+            "verbose": self.verbose,
+            "overlap_sentences": self.overlap_sentences,
+            "separator": self.separator,
+            "min_chunk_size": self.min_chunk_size,
+            "embedding_backend": self.embedding_backend,
+            "embedding_batch_size": self.embedding_batch_size,
+            "use_embedding_cache": self.use_embedding_cache,
+            "sentence_segmenter": self.sentence_segmenter,
+            "prefer_semantic_in_auto": self.prefer_semantic_in_auto,
+            "auto_analysis_chars": self.auto_analysis_chars,
+            "auto_section_chars": self.auto_section_chars,
+            "auto_report_max": self.auto_report_max,
+            "analysis_cache_max": self.analysis_cache_max,
+            "cache_dir": None if self.cache_dir is None else str(self.cache_dir),
+        }
+
+    def _cache_path(self, *parts):
+        cache_dir = self.cache_dir if self.cache_dir is not None else find_project_root(marker_name="RAGnarok") / ".cache"
+        return cache_dir.joinpath(*parts)
+
+    @property
+    def manifest(self):
+        """Manifest del chunking incrementale di questa directory, creato al primo uso."""
+        if self._manifest is None:
+            directory_key = hashlib.sha1(str(self.directory_path.resolve()).encode('utf-8')).hexdigest()[:12]
+            self._manifest = IngestManifest(self._cache_path("manifests", f"chunk_{directory_key}.json"))
+        return self._manifest
+
+    @property
+    def _analysis_cache_path(self):
+        return self._cache_path("auto_analysis.json")
+
+    def _split_sentences(self, text):
+        """Divide il testo in frasi con il segmentatore scelto nel costruttore."""
+        if self.sentence_segmenter == "nltk":
+            return nltk.sent_tokenize(text)
+        return self._segmenter.split(text)
+
     def check_args(self, function_type,**kwargs):
         sig = inspect.signature(self._chunking_strategies[function_type])
         required_params = [
@@ -77,49 +175,97 @@ class ChunkManager:
 
 
 
-    def _semantic_chunking(self):
-        # This is a long document we can split up.
-        directory_input = get_input_path()
-        for index,file in enumerate(os.listdir(directory_input)):
-            with open(file) as f:
-                state_of_the_union = f.read()
-            text_splitter = SemanticChunker(OpenAIEmbeddings(), self.breakpoint_threshold_type)
-            docs = text_splitter.create_documents([state_of_the_union])
-            with open(f"chunked_{file}_{index}.txt", "w") as f:
-                for doc in docs:
-                    f.write(doc[0].page_content + "\n\n")
-
-    def _recursive_chunking(self):
-        directory_input = get_input_path()
-        for index,file in enumerate(os.listdir(directory_input)):
-            loader = PyPDFLoader(file)
-            documents = loader.load()
-            text_splitter = RecursiveCharacterTextSplitter(
-                breakpoint_threshold_type=self.breakpoint_threshold_type,
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap,
-                length_function=len,
-                is_separator_regex=False
-            )
-            naive_chunks = text_splitter.split_documents(documents)
-            for chunk in naive_chunks[10:15]:
-                print(chunk.page_content+ "\n")
-                with open(f"chunked_texts/chunked_{file}_{index}.txt", "w") as f:
-                    f.write(chunk.page_content + "\n\n")
-
-    def _fixed_size_chunking (self):
-        directory_input = get_input_path()
-        for index,file in enumerate(os.listdir(directory_input)):
-            loader = PyPDFLoader(file)
-            documents = loader.load()
-            text_splitter = TokenTextSplitter(
-                encoding_name=self.encoding_name,
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap,
-                length_function=len,
-                is_separator_regex=False
+    @property
+    def embeddings(self):
+        """Embeddings per il chunking semantico, creati alla prima richiesta e con cache su disco."""
+        if self._embeddings is None:
+            cache = None
+            if self.use_embedding_cache:
+                cache = EmbeddingCache(self._cache_path("embeddings.sqlite"))
+            self._embeddings = CachedEmbeddings(
+                get_embedding_backend(self.embedding_backend), cache=cache, batch_size=self.embedding_batch_size
             )
-            return text_splitter.split_documents(documents)
+        return self._embeddings
+
+    def _semantic_chunker(self):
+        return SemanticChunker(self.embeddings, breakpoint_threshold_type=self.breakpoint_threshold_type)
+
+    def _semantic_chunking(self, text: str) -> list[str]:
+        """Divide il testo nei punti in cui cambia l'argomento (distanza tra embedding di frasi vicine)."""
+        if not isinstance(text, str) or not text.strip():
+            return []
+        return self._semantic_chunker().split_text(text)
+
+    def _semantic_chunking_many(self, texts: list[str]) -> list[list[str]]:
+        """
+        Chunking semantico di piu' testi. Le frasi (combinate come fa SemanticChunker)
+        di tutti i testi vengono embeddate prima, insieme e a lotti grandi, quindi lo
+        split dei singoli testi legge solo vettori gia' calcolati o in cache.
+        """
+        text_splitter = self._semantic_chunker()
+        pending = []
+        for text in texts:
+            if not isinstance(text, str) or not text.strip():
+                continue
+            sentences = [{"sentence": sentence, "index": i}
+                         for i, sentence in enumerate(re.split(text_splitter.sentence_split_regex, text))]
+            if len(sentences) > 1:
+                combined = combine_sentences(sentences, text_splitter.buffer_size)
+                pending.extend(sentence["combined_sentence"] for sentence in combined)
+        if pending:
+            self.embeddings.prefetch(pending)
+            if self.verbose:
+                print(f"Embedding pronti per {len(pending)} frasi di {len(texts)} testi.")
+
+        try:
+            return [text_splitter.split_text(text) if isinstance(text, str) and text.strip() else [] for text in texts]
+        finally:
+            # I vettori restano nella cache su disco: non tenerli in memoria tra un lotto e l'altro
+            self.embeddings.clear()
+
+    def _recursive_chunking(self, text: str) -> list[str]:
+        """
+        Divide il testo ricorsivamente (paragrafi, righe, parole) in chunk di al
+        massimo chunk_size token, contati con il tokenizer condiviso (come le altre strategie).
+        """
+        if not isinstance(text, str) or not text.strip():
+            return []
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self._overlap_tokens(),
+            length_function=self.tokenizer.count,
+            is_separator_regex=False
+        )
+        return text_splitter.split_text(text)
+
+    def _overlap_tokens(self) -> int:
+        """chunk_overlap nelle unita' di chunk_size: un valore tra 0 e 1 e' una frazione di chunk_size."""
+        if 0 < self.chunk_overlap < 1:
+            return int(self.chunk_overlap * self.chunk_size)
+        return int(self.chunk_overlap)
+
+    def _fixed_size_chunking (self, text: str) -> list[str]:
+        """
+        Divide il testo in finestre di chunk_size token con chunk_overlap token
+        di sovrapposizione (come TokenTextSplitter), codificando il testo una
+        sola volta con il tokenizer condiviso.
+        """
+        if not isinstance(text, str) or not text:
+            return []
+        overlap = self._overlap_tokens()
+        if overlap >= self.chunk_size:
+            raise ValueError("chunk_overlap deve essere minore di chunk_size.")
+
+        token_ids = self.tokenizer.encode(text)
+        chunks = []
+        start = 0
+        while start < len(token_ids):
+            end = min(start + self.chunk_size, len(token_ids))
+            chunks.append(self.tokenizer.decode(token_ids[start:end]))
+            if end == len(token_ids):
+                break
+            start += self.chunk_size - overlap
+        return chunks
 
     def _analyze_document_content(self, text: str) -> dict:
         """Analizza il contenuto testuale per estrarre metriche utili."""
@@ -157,7 +303,7 @@ class ChunkManager:
 
         # Analisi Linguistica (NLTK)
         try:
-            sentences = nltk.sent_tokenize(text)
+            sentences = self._split_sentences(text)
             analysis["sentence_count"] = len(sentences)
             if analysis["sentence_count"] > 1: # Ha senso calcolare solo se ci sono più frasi
                 sentence_lengths = [len(s) for s in sentences]
@@ -182,76 +328,183 @@ class ChunkManager:
 
         # 1. Priorità alla struttura a paragrafi se forte
         if analysis["has_strong_paragraph_structure"]:
-            print("Analysis Recommendation: Strong paragraph structure detected -> 'section'")
-            return "section"
+            if self.verbose:
+                print("Analysis Recommendation: Strong paragraph structure detected -> 'separator'")
+            return "separator"
 
         # 2. Se è prosa, considera Semantico o Sentence
         if analysis["is_likely_prose"]:
-            # Preferisci semantico se richiesto e possibile?
-            if self.prefer_semantic_in_auto and self.openai_api_key_present:
+            # Semantico solo se richiesto e se c'e' un backend di embedding utilizzabile
+            semantic_available = self.openai_api_key_present or self.embedding_backend != "openai"
+            if self.prefer_semantic_in_auto and semantic_available:
+                if self.verbose:
                     print("Analysis Recommendation: Prose detected, semantic preferred and possible -> 'semantic'")
-                    return "semantic"
-            else:
-                    # Altrimenti usa sentence (NLTK deve aver funzionato per is_likely_prose=True)
-                    print("Analysis Recommendation: Prose detected -> 'sentence'")
-                    return "sentence"
+                return "semantic"
+            # Altrimenti usa sentence-aware (la segmentazione deve aver funzionato per is_likely_prose=True)
+            if self.verbose:
+                print("Analysis Recommendation: Prose detected -> 'sentence-aware'")
+            return "sentence-aware"
 
-        # 3. Fallback generico se non è prosa chiaramente strutturata o NLTK ha fallito
+        # 3. Fallback generico se non è prosa chiaramente strutturata o la segmentazione ha fallito
         # Potresti aggiungere qui logica per rilevare codice/liste e usare recursive
-        print("Analysis Recommendation: No clear prose or paragraph structure detected -> 'recursive' (fallback)")
+        if self.verbose:
+            print("Analysis Recommendation: No clear prose or paragraph structure detected -> 'recursive' (fallback)")
         return "recursive"
 
-    def _automatic_chunking(self, documents: list[Document], **kwargs) -> list[Document]:
+    def _sample_text(self, text: str) -> str:
+        """
+        Campione rappresentativo del testo per l'analisi: il testo intero se e' corto,
+        altrimenti finestre distribuite uniformemente (inizio, parti centrali, fine)
+        per un totale di circa auto_analysis_chars caratteri.
         """
-        Analizza il contenuto e applica automaticamente la strategia di chunking ritenuta migliore.
+        if len(text) <= self.auto_analysis_chars:
+            return text
+        num_windows = 5
+        window = self.auto_analysis_chars // num_windows
+        step = (len(text) - window) / (num_windows - 1)
+        windows = []
+        for i in range(num_windows):
+            start = int(i * step)
+            if start:
+                # Parte dalla parola successiva per non spezzarla
+                space = text.find(" ", start, start + 100)
+                start = space + 1 if space >= 0 else start
+            windows.append(text[start:start + window])
+        # Unite con uno spazio: un separatore di paragrafo falserebbe l'analisi della struttura
+        return " ".join(windows)
+
+    def _section_bounds(self, text: str) -> list[tuple[int, int]]:
         """
-        # Analizza un campione rappresentativo (es. i primi N documenti o i primi X caratteri totali)
-        representative_text = ""
-        chars_to_analyze = 5000 # Analizza fino a X caratteri
-        for doc in documents:
-            if doc.page_content and isinstance(doc.page_content, str):
-                representative_text += doc.page_content + "\n\n" # Aggiungi separatore tra pagine/doc
-                if len(representative_text) >= chars_to_analyze:
+        Divide i documenti piu' lunghi di auto_section_chars in sezioni, tagliando
+        preferibilmente tra paragrafi, cosi' ogni sezione puo' avere la sua strategia.
+        """
+        bounds = []
+        start = 0
+        while len(text) - start > self.auto_section_chars:
+            limit = start + self.auto_section_chars
+            cut = -1
+            for boundary in ("\n\n", "\n", " "):
+                cut = text.rfind(boundary, start + self.auto_section_chars // 2, limit)
+                if cut >= 0:
+                    cut += len(boundary)
                     break
-        representative_text = representative_text[:chars_to_analyze]
-
-        if not representative_text:
-             print("Automatic Chunking: No text content found to analyze. Falling back to recursive.")
-             return self._recursive_chunking(documents)
-
-        # Esegui l'analisi
-        analysis_results = self._analyze_document_content(representative_text)
-        # Stampa riassunto analisi (utile per debug)
-        print("\n--- Document Analysis Summary ---")
-        for key, value in analysis_results.items():
-             if isinstance(value, float):
-                 print(f"  {key}: {value:.2f}")
-             else:
-                 print(f"  {key}: {value}")
-        print("-----------------------------")
-
-
-        # Ottieni la strategia raccomandata
-        chosen_strategy = self._recommend_chunking_strategy(analysis_results)
-
-        print(f"\nAutomatic Chunking: Applying '{chosen_strategy}' strategy based on analysis...")
-
-        chunks = self._chunking_strategies[chosen_strategy](**kwargs)
+            cut = cut if cut > start else limit
+            bounds.append((start, cut))
+            start = cut
+        bounds.append((start, len(text)))
+        return bounds
+
+    def _cached_analysis(self, sample: str) -> tuple[dict, bool]:
+        """Analisi del campione, letta dalla cache su disco se lo stesso contenuto e' gia' stato analizzato."""
+        if self._analysis_cache is None:
+            self._analysis_cache = {}
+            if self._analysis_cache_path.exists():
+                try:
+                    with open(self._analysis_cache_path, 'r', encoding='utf-8') as f:
+                        self._analysis_cache = json.load(f)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Cache delle analisi illeggibile ({e}): verra' ricreata.")
+
+        key = hashlib.sha256(f"{self.sentence_segmenter}\0{sample}".encode('utf-8')).hexdigest()
+        analysis = self._analysis_cache.get(key)
+        if analysis is not None:
+            return analysis, True
+        analysis = {
+            name: float(value) if isinstance(value, np.floating) else value
+            for name, value in self._analyze_document_content(sample).items()
+        }
+        self._analysis_cache[key] = analysis
+        while len(self._analysis_cache) > self.analysis_cache_max:
+            # Rimuove l'analisi inserita per prima
+            del self._analysis_cache[next(iter(self._analysis_cache))]
+        return analysis, False
 
-        return chunks 
+    def save_analysis_cache(self):
+        """
+        Salva la cache delle analisi, unendola a quella su disco (altri processi possono
+        averla aggiornata) e tenendo solo le analysis_cache_max voci piu' recenti.
+        """
+        if not self._analysis_cache:
+            return
+        entries = {}
+        if self._analysis_cache_path.exists():
+            try:
+                with open(self._analysis_cache_path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = {}
+        # Le voci di questo processo vanno in coda, come le piu' recenti
+        entries = {key: value for key, value in entries.items() if key not in self._analysis_cache}
+        entries.update(self._analysis_cache)
+        entries = dict(list(entries.items())[-self.analysis_cache_max:])
+        self._analysis_cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._analysis_cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self._analysis_cache_path)
+
+    def _automatic_chunking(self, text: str, source=None) -> list[str]:
+        """
+        Analizza il documento e applica la strategia di chunking ritenuta migliore.
+        I documenti lunghi vengono divisi in sezioni, ognuna con la propria
+        strategia. Ogni decisione viene registrata in self.auto_report insieme al
+        costo dell'analisi (vedi automatic_summary()).
+        """
+        if not isinstance(text, str) or not text.strip():
+            return []
 
+        chunks = []
+        for section_index, (start, end) in enumerate(self._section_bounds(text)):
+            section = text[start:end]
+            started = time.perf_counter()
+            analysis, cached = self._cached_analysis(self._sample_text(section))
+            strategy = self._recommend_chunking_strategy(analysis)
+            self._record_decisions([{
+                "source": str(source) if source is not None else None,
+                "section": section_index,
+                "start": start,
+                "end": end,
+                "strategy": strategy,
+                "cached": cached,
+                "analysis_seconds": time.perf_counter() - started,
+            }])
+            if self.verbose:
+                origin = f"{Path(source).name} " if source is not None else ""
+                print(f"Automatic Chunking: {origin}sezione {section_index} [{start}:{end}] -> '{strategy}'"
+                      f"{' (analisi in cache)' if cached else ''}")
+            chunks.extend(self._chunking_strategies[strategy](section))
+        return chunks
 
-   
-    def _sentence_aware_chunking(self) -> list[str]:
+    def _record_decisions(self, decisions):
+        """Registra decisioni della modalita' automatica (anche quelle prese nei worker paralleli)."""
+        totals = self._auto_totals
+        for decision in decisions:
+            self.auto_report.append(decision)
+            totals["sections"] += 1
+            totals["documents"] += decision["section"] == 0
+            totals["strategies"][decision["strategy"]] = totals["strategies"].get(decision["strategy"], 0) + 1
+            totals["cached_analyses"] += decision["cached"]
+            totals["analysis_seconds"] += decision["analysis_seconds"]
+
+    def automatic_summary(self) -> dict:
+        """Riepilogo delle decisioni della modalita' automatica: strategie scelte e costo dell'analisi."""
+        return {**self._auto_totals, "strategies": dict(self._auto_totals["strategies"])}
+
+    def _sentence_aware_chunking(self, text: str) -> list[str]:
         """
 
         Divide il testo in chunk rispettando i confini delle frasi.
 
+        Ogni frase viene codificata una sola volta e i chunk vengono composti con
+        le somme prefisse dei conteggi di token (vedi sentence_packing), con gli
+        stessi confini del confronto frase per frase sul testo unito.
+
         Args:
             text: Il testo di input da dividere.
+
+        Parametri dal costruttore:
             max_tokens_per_chunk: Il numero massimo desiderato di token per chunk.
-                                Il chunk finale potrebbe superarlo leggermente a causa
-                                dell'aggiunta dell'ultima frase.
+                                Una frase piu' lunga del limite diventa un chunk a se'.
             overlap_sentences: Il numero di frasi da sovrapporre tra chunk consecutivi.
             encoding_name: Il nome della codifica tiktoken da usare per contare i token.
             verbose: Se True, stampa informazioni dettagliate durante il processo.
@@ -259,8 +512,6 @@ class ChunkManager:
         Returns:
             Una lista di stringhe, dove ogni stringa è un chunk di testo.
         """
-        self.chunk_overlap = 1
-        text =  documents.page_content
         if not isinstance(text, str) or not text.strip():
             return []
         if self.max_tokens_per_chunk <= 0:
@@ -268,122 +519,30 @@ class ChunkManager:
         if self.overlap_sentences < 0:
             raise ValueError("overlap_sentences non può essere negativo.")
 
-        tokenizer = tiktoken.get_encoding(self.encoding_name)
-
         # 1. Dividi in frasi
-        sentences = nltk.sent_tokenize(text)
+        sentences = self._split_sentences(text)
         if not sentences:
             return []
 
         if self.verbose:
             print(f"Testo diviso in {len(sentences)} frasi.")
 
-        chunks = []
-        current_chunk_sentences = []
-        current_chunk_tokens = 0
-        sentence_index = 0
-
-        while sentence_index < len(sentences):
-            sentence = sentences[sentence_index]
-            # Usa l'encoding corretto per contare i token della frase corrente
-            sentence_tokens = len(tokenizer.encode(sentence))
-
-            # --- Gestione frase troppo lunga ---
-            if sentence_tokens > max_tokens_per_chunk:
-                if verbose:
-                    print(f"Attenzione: Frase {sentence_index} è più lunga ({sentence_tokens} tokens) "
-                        f"di max_tokens_per_chunk ({max_tokens_per_chunk}). Verrà aggiunta come chunk separato.")
-
-                # Se c'è un chunk in costruzione, finalizzalo prima
-                if current_chunk_sentences:
-                    chunk_text = " ".join(current_chunk_sentences)
-                    chunks.append(chunk_text)
-                    if verbose:
-                        print(f"  Chunk finalizzato (terminante alla frase {sentence_index-1}) con {current_chunk_tokens} tokens.")
-                    current_chunk_sentences = [] # Resetta per il prossimo giro
-                    current_chunk_tokens = 0
-
-                # Aggiungi la frase lunga come chunk a sé stante
-                chunks.append(sentence)
-                if verbose:
-                    print(f"  Aggiunta frase lunga {sentence_index} come chunk separato.")
-
-                sentence_index += 1 # Passa alla frase successiva
-                continue # Salta il resto del ciclo per questa iterazione
-
-            # --- Calcolo token potenziale se si aggiunge la frase corrente ---
-            # Unisci le frasi temporaneamente per un conteggio più accurato (include spazi)
-            potential_chunk_list = current_chunk_sentences + [sentence]
-            potential_chunk_text = " ".join(potential_chunk_list)
-            potential_tokens = len(tokenizer.encode(potential_chunk_text))
-
-            # --- Verifica se aggiungere la frase supera il limite ---
-            if potential_tokens <= max_tokens_per_chunk:
-                # Aggiungi la frase al chunk corrente
-                current_chunk_sentences.append(sentence)
-                current_chunk_tokens = potential_tokens # Aggiorna con il conteggio accurato
-                if verbose:
-                    print(f"  Frase {sentence_index}: Aggiunta al chunk corrente. Tokens totali: {current_chunk_tokens}/{max_tokens_per_chunk}")
-                sentence_index += 1 # Passa alla prossima frase da valutare
-            else:
-                # Limite superato: finalizza il chunk corrente (se non è vuoto)
-                if current_chunk_sentences:
-                    chunk_text = " ".join(current_chunk_sentences)
-                    chunks.append(chunk_text)
-                    if verbose:
-                        print(f"Chunk finalizzato (terminante alla frase {sentence_index-1}) con {current_chunk_tokens} tokens.")
-
-                # --- Inizia un nuovo chunk con sovrapposizione ---
-                # Quante frasi indietro iniziare per il nuovo chunk?
-                # `sentence_index` è l'indice della frase che *non* ci stava.
-                # Il chunk precedente terminava a `sentence_index - 1`.
-                # Il nuovo chunk deve iniziare `overlap_sentences` prima della fine del precedente.
-                # Indice di inizio per il *nuovo* chunk = max(0, indice_fine_precedente - overlap_sentences + 1)
-                #                                     = max(0, (sentence_index - 1) - overlap_sentences + 1)
-                #                                     = max(0, sentence_index - overlap_sentences)
-
-                # Tuttavia, è più semplice pensare a quale indice RITORNARE per iniziare il prossimo chunk.
-                # Se overlap=1, vogliamo che la *prossima* iterazione inizi dalla *ultima* frase del chunk appena creato.
-                # Se overlap=0, la prossima iterazione inizia da `sentence_index`.
-                # Se overlap=N, la prossima iterazione inizia da `max(0, sentence_index - N)`.
-
-                # Calcola l'indice da cui la *prossima* iterazione del `while` dovrà ripartire
-                start_next_iteration_index = max(0, sentence_index - overlap_sentences)
-
-                # Siccome il loop incrementa `sentence_index` alla fine (o all'inizio del giro dopo `continue`),
-                # dobbiamo impostare `sentence_index` qui in modo che al prossimo giro sia corretto.
-                # Se l'indice di partenza calcolato è lo stesso di `sentence_index`, significa che
-                # l'overlap non ha effetto (magari perché la frase era troppo lunga o siamo all'inizio).
-                # Evitiamo loop infiniti.
-                if start_next_iteration_index >= sentence_index and overlap_sentences > 0:
-                    if verbose:
-                        print(f"  Attenzione: Overlap ({overlap_sentences}) non applicabile o causerebbe stallo all'indice {sentence_index}. Procedo senza overlap forzato per questo passaggio.")
-                    # In questo caso raro, si procede come se overlap fosse 0 per questo specifico passaggio
-                    start_next_iteration_index = sentence_index # Forziamo l'avanzamento
-
-                sentence_index = start_next_iteration_index
-
-                if verbose:
-                    print(f"  Inizio nuovo chunk. Prossima iterazione partirà dalla frase indice: {sentence_index}")
-
-                # Resetta per il nuovo chunk
-                current_chunk_sentences = []
-                current_chunk_tokens = 0
-                # La frase `sentence_index` (che prima non ci stava) verrà riconsiderata
-                # all'inizio della prossima iterazione del while loop.
-
-
-        # Aggiungi l'ultimo chunk rimasto, se ce n'è uno
-        if current_chunk_sentences:
-            chunk_text = " ".join(current_chunk_sentences)
-            chunks.append(chunk_text)
-            if verbose:
-                print(f"Chunk finale aggiunto con {current_chunk_tokens} tokens.")
+        # 2. Conta i token di ogni frase una sola volta
+        alone, joined = sentence_token_counts(sentences, self.tokenizer.count, self.tokenizer.count_batch)
+
+        # 3. Componi i chunk con aritmetica sugli indici (overlap compreso)
+        spans = pack_sentences(alone, joined, self.max_tokens_per_chunk, self.overlap_sentences)
+        chunks = [" ".join(sentences[start:end]) for start, end in spans]
+
+        if self.verbose:
+            for start, end in spans:
+                tokens = alone[start] + sum(joined[start + 1:end])
+                print(f"  Chunk frasi {start}-{end - 1}: {tokens} tokens")
 
         return chunks
 
 
-    def _section_chunking_by_separator(self) -> list[str]:
+    def _section_chunking_by_separator(self, text: str) -> list[str]:
         """
         Divide il testo in chunk basandosi su un separatore specificato.
 
@@ -391,6 +550,8 @@ class ChunkManager:
 
         Args:
             text: Il testo di input da dividere.
+
+        Parametri dal costruttore:
             separator: La stringa usata come delimitatore per le sezioni.
                     Default: "\\n\\n" (doppio a capo, comune per i paragrafi).
             min_chunk_size: La dimensione minima (in caratteri) che un chunk
@@ -400,86 +561,267 @@ class ChunkManager:
         Returns:
             Una lista di stringhe, dove ogni stringa è un chunk (sezione).
         """
-
-        text =  documents.page_content
         if not isinstance(text, str) or not text.strip():
             return []
         if not isinstance(self.separator, str) or not self.separator:
-            # Se il separatore non è valido, ritorna il testo intero come unico chunk
-            # o solleva un errore, a seconda di come vuoi gestire il caso.
-            # Qui lo trattiamo come un unico chunk se il testo non è vuoto.
-            return [text.strip()] if text.strip() else []
-
-        # Dividi il testo usando il separatore
-        # Usiamo re.split per gestire meglio i separatori che potrebbero essere
-        # espressioni regolari e per potenzialmente mantenere i separatori se necessario
-        # (anche se qui li stiamo rimuovendo, che è il comportamento di default di split).
-        # Usare string.split(separator) è spesso sufficiente per separatori semplici.
-        # chunks = text.split(separator)
-        chunks = re.split(f"({re.escape(self.separator)})", text) # re.split mantiene il separatore se catturato con ()
-                                                            # ma crea più elementi nella lista, quindi dobbiamo gestirlo
-
-        # Ricostruiamo i chunk, rimuovendo gli spazi e filtrando quelli troppo piccoli
-        processed_chunks = []
-        current_chunk = ""
-        for i, part in enumerate(chunks):
-            if i % 2 == 0: # Parti di testo tra i separatori
-                current_chunk += part
-            else: # Separatore stesso (catturato da re.split)
-                # Decidi se vuoi includere il separatore o no.
-                # Per la divisione per paragrafo, di solito NON lo includi.
-                # current_chunk += part # -> Includerebbe il separatore alla fine del chunk precedente
-
-                # Finalizza il chunk corrente se non è vuoto e rispetta la dimensione minima
-                trimmed_chunk = current_chunk.strip()
-                if trimmed_chunk and len(trimmed_chunk) >= self.min_chunk_size:
-                    processed_chunks.append(trimmed_chunk)
-                current_chunk = "" # Inizia un nuovo chunk virtuale dopo il separatore
-
-        # Aggiungi l'ultimo pezzo di testo dopo l'ultimo separatore (o se non c'erano separatori)
-        trimmed_last_chunk = current_chunk.strip()
-        if trimmed_last_chunk and len(trimmed_last_chunk) >= self.min_chunk_size:
-            processed_chunks.append(trimmed_last_chunk)
-
-        # Alternativa più semplice se non ti serve mantenere i separatori e re.split confonde:
-        # chunks_simple = text.split(separator)
-        # processed_chunks = [chunk.strip() for chunk in chunks_simple if chunk.strip() and len(chunk.strip()) >= min_chunk_size]
-
-        # Scegliamo l'implementazione più semplice con string.split per minimalismo
-        chunks_simple = text.split(self.separator)
-        final_chunks = [
-            chunk.strip()
-            for chunk in chunks_simple
-            if chunk.strip() and len(chunk.strip()) >= self.min_chunk_size
-        ]
-
+            # Separatore non valido: il testo intero diventa un unico chunk
+            return [text.strip()]
+
+        final_chunks = []
+        for chunk in text.split(self.separator):
+            chunk = chunk.strip()
+            if chunk and len(chunk) >= self.min_chunk_size:
+                final_chunks.append(chunk)
         return final_chunks
 
+    def _list_input_files(self):
+        """File di testo della directory di input, in ordine deterministico."""
+        return sorted(
+            (path for path in self.directory_path.iterdir() if path.is_file() and path.suffix.lower() == ".txt"),
+            key=lambda path: path.name,
+        )
+
+    def scan_changes(self):
+        """
+        Confronta la directory di input con il manifest dell'ultimo chunking.
+
+        Returns:
+            ChangeSet: File aggiunti e modificati da rielaborare (changes.changed) e
+                       file eliminati i cui chunk vanno rimossi a valle (changes.deleted)
+        """
+        return self.manifest.scan(self.directory_path, {".txt"})
+
+    def commit_changes(self, changes, processed=None):
+        """Conferma nel manifest i file elaborati con successo (default: tutti i cambiati)."""
+        self.manifest.commit(changes, processed)
+
+    def chunk_incremental(self, strategy="sentence-aware", stores=(), changes=None, max_workers=None,
+                          deduplicator=None):
+        """
+        Chunking incrementale: rielabora solo i documenti aggiunti o modificati
+        dall'ultima esecuzione. Prima di produrre i nuovi chunk rimuove dagli
+        store a valle (indici, vector store, ...) quelli dei documenti modificati,
+        eliminati o rimasti a meta' in un'esecuzione interrotta; il manifest viene
+        confermato solo quando tutti i chunk sono stati consumati, e solo per i
+        file effettivamente letti (quelli illeggibili restano da rielaborare).
+
+        Gli store devono aggiungere i chunk prodotti a quelli che gia' contengono:
+        per EmbeddingPipeline usare run(records, append=True), perche' run()
+        senza append riscrive lo store con i soli chunk ricevuti.
+
+        Args:
+            strategy (str): Strategia di chunking
+            stores (iterable): Store a valle con un metodo remove_sources(sources)
+            changes (ChangeSet, optional): Risultato di scan_changes() (default: nuova scansione)
+            max_workers (int, optional): Processi per il chunking (vedi iter_chunks)
+            deduplicator (ChunkDeduplicator, optional): Scarta i duplicati (vedi iter_chunks);
+                                                        anche da qui vengono rimossi i chunk obsoleti,
+                                                        e i loro duplicati promossi a canonici
+                                                        vengono prodotti di nuovo
+
+        Yields:
+            ChunkRecord: I chunk dei documenti aggiunti o modificati, da aggiungere agli store
+        """
+        stores = list(stores)
+        for store in stores:
+            if not callable(getattr(store, "remove_sources", None)):
+                raise TypeError(f"{type(store).__name__} non ha un metodo remove_sources(sources).")
+        changes = self.scan_changes() if changes is None else changes
+        # Stessa forma di ChunkRecord.source (directory di input / nome del file)
+        stale = sorted({str(self.directory_path / Path(path).name) for path in changes.deleted + changes.changed})
+        promoted = []
+        promoted_start = len(deduplicator.promoted) if deduplicator is not None else 0
+        if stale:
+            for store in stores:
+                store.remove_sources(stale)
+            if deduplicator is not None:
+                promoted = deduplicator.remove_sources(stale)
+            if self.verbose:
+                print(f"Chunking incrementale: {changes.summary()}")
+        skipped_start = len(self.skipped_files)
+        if changes.changed:
+            yield from self.iter_chunks(strategy, changes.changed, max_workers=max_workers, deduplicator=deduplicator)
+        if deduplicator is not None:
+            promoted += deduplicator.promoted[promoted_start:]
+            yield from self._iter_promoted(strategy, promoted, deduplicator, max_workers)
+        skipped = {Path(path).resolve() for path in self.skipped_files[skipped_start:]}
+        self.commit_changes(changes, [path for path in changes.changed if Path(path).resolve() not in skipped])
+
+    def _iter_promoted(self, strategy, chunk_ids, deduplicator, max_workers=None):
+        """
+        Chunk diventati canonici al posto di un chunk rimosso: erano stati scartati
+        come duplicati, quindi non sono negli store a valle. Vengono ricostruiti
+        rielaborando i loro documenti (invariati) con la stessa strategia.
+        """
+        wanted = set(chunk_ids)
+        if not wanted:
+            return
+        sources = sorted({source for source in deduplicator.sources_of(wanted).values() if source is not None})
+        for record in self.iter_chunks(strategy, sources, max_workers=max_workers):
+            if record.chunk_id in wanted:
+                yield record
+
     def _count_tokens(self, text):
         """Helper to count tokens."""
-        return len(self.tokenizer.encode(text))
-
-    def chunk(self, document: Document, type = "semantic", include_metadata = False, separator = "\n\n"):
-        import tempfile
-        #TODO: implementare la lettura della directory path passata come argomento 
-        #TODO: 
-        document = self.documents
-
-
-        if type == "semantic":
-            self._semantic_chunking()
-        elif type == "recursive":
-            self._recursive_chunking()
-        elif type == "fixed_size":
-            self._fixed_size_chunking(self.chunk_size, self.chunk_overlap)
-        elif type == "separator":
-            self._section_chunking_by_separator(separator)
-        elif type == "sentence-aware":
-            self._sentence_aware_chunking(text=document)
-        elif type == "automatic":
-            self._automatic_chunking(document)
-
-
-            raise ValueError(f"Unknown chunking type: {type}")
-        
-        
+        return self.tokenizer.count(text)
+
+    def _read_document(self, path):
+        """
+        Legge un file di testo e, se l'estrazione ha scritto <stem>.pages.json,
+        gli offset di inizio di ogni pagina.
+
+        Returns:
+            tuple: (testo, lista di offset di inizio pagina oppure None)
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        page_starts = None
+        pages_path = path.with_name(f"{path.stem}.pages.json")
+        if pages_path.exists():
+            try:
+                with open(pages_path, 'r', encoding='utf-8') as f:
+                    page_starts = [record["start"] for record in json.load(f)]
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"{pages_path.name} illeggibile ({e}): pagine non disponibili.")
+        return text, page_starts
+
+    def iter_documents(self, files=None):
+        """
+        Legge i documenti uno alla volta.
+
+        Args:
+            files (list, optional): File da leggere (default: tutti i .txt della directory)
+
+        Yields:
+            tuple: (percorso, testo, offset di inizio pagina o None)
+        """
+        for path in (self._list_input_files() if files is None else files):
+            path = Path(path)
+            try:
+                text, page_starts = self._read_document(path)
+            except (OSError, UnicodeDecodeError) as e:
+                logging.error(f"Impossibile leggere {path.name}: {e}. File saltato.")
+                self.skipped_files.append(path)
+                continue
+            yield path, text, page_starts
+
+    def _document_id(self, path):
+        """
+        Prefisso dei chunk_id di un documento: il nome per i file della directory di
+        input, il percorso completo per quelli esterni (file omonimi in directory
+        diverse non devono condividere i chunk_id).
+        """
+        try:
+            return path.relative_to(self.directory_path).as_posix()
+        except ValueError:
+            return str(path)
+
+    def _records(self, path, text, page_starts, chunks):
+        """Trasforma i chunk di un documento in ChunkRecord con offset, pagina e token."""
+        document_id = self._document_id(path)
+        chunks = [chunk for chunk in chunks if chunk.strip()]
+        token_counts = self.tokenizer.count_batch(chunks)
+        for index, (chunk, span, token_count) in enumerate(zip(chunks, locate_chunks(text, chunks), token_counts)):
+            start, end = span if span is not None else (None, None)
+            yield ChunkRecord(
+                chunk_id=f"{document_id}#{index}",
+                text=chunk,
+                source=str(path),
+                index=index,
+                page=page_of(page_starts, start),
+                start=start,
+                end=end,
+                token_count=token_count,
+            )
+
+    def iter_chunks(self, strategy="sentence-aware", files=None, semantic_batch_docs=16, max_workers=None,
+                    docs_per_task=16, deduplicator=None):
+        """
+        Chunking in streaming: legge un documento alla volta e produce i chunk man
+        mano, quindi la memoria non cresce con la dimensione del corpus.
+
+        Args:
+            strategy (str): Una delle strategie di _chunking_strategies
+            files (list, optional): File da elaborare (default: tutti i .txt della directory,
+                                    per l'incrementale passare scan_changes().changed)
+            semantic_batch_docs (int): Documenti embeddati insieme dalla strategia "semantic"
+            max_workers (int, optional): Se maggiore di 1, elabora i documenti su un pool di
+                                         processi (ParallelChunkExecutor) mantenendo l'ordine
+            docs_per_task (int): Documenti per task nella modalita' parallela
+            deduplicator (ChunkDeduplicator, optional): Se presente, scarta i chunk duplicati
+                                                        o quasi duplicati di chunk gia' prodotti
+
+        Yields:
+            ChunkRecord: I chunk, documento per documento e in ordine di posizione
+        """
+        if strategy not in self._chunking_strategies:
+            raise ValueError(f"Unknown chunking type: '{strategy}'. Tipi validi: {list(self._chunking_strategies.keys())}")
+
+        if deduplicator is not None:
+            yield from deduplicator.filter(self.iter_chunks(strategy, files, semantic_batch_docs, max_workers, docs_per_task))
+            return
+
+        if max_workers is not None and max_workers > 1:
+            executor = ParallelChunkExecutor(self.config(), max_workers=max_workers, docs_per_task=docs_per_task)
+            yield from executor.iter_chunks(strategy, self._list_input_files() if files is None else files,
+                                            on_decisions=self._record_decisions, on_skipped=self.skipped_files.extend)
+            if strategy == "automatic" and self.verbose:
+                print(f"Automatic Chunking: {self.automatic_summary()}")
+            return
+
+        for path, text, page_starts, chunks in self._iter_chunked_documents(strategy, files, semantic_batch_docs):
+            yield from self._records(path, text, page_starts, chunks)
+
+    def _iter_chunked_documents(self, strategy, files=None, semantic_batch_docs=16):
+        """Applica la strategia documento per documento: produce (percorso, testo, pagine, chunk)."""
+        documents = self.iter_documents(files)
+        if strategy == "semantic":
+            # Pochi documenti alla volta: embedding a lotti grandi ma memoria limitata
+            while True:
+                batch = [document for _, document in zip(range(semantic_batch_docs), documents)]
+                if not batch:
+                    break
+                for (path, text, page_starts), chunks in zip(batch, self._semantic_chunking_many([text for _, text, _ in batch])):
+                    yield path, text, page_starts, chunks
+            return
+
+        if strategy == "automatic":
+            try:
+                for path, text, page_starts in documents:
+                    yield path, text, page_starts, self._automatic_chunking(text, source=path)
+            finally:
+                self.save_analysis_cache()
+                if self.verbose:
+                    print(f"Automatic Chunking: {self.automatic_summary()}")
+            return
+
+        chunk_text = self._chunking_strategies[strategy]
+        for path, text, page_starts in documents:
+            chunks = chunk_text(text)
+            if self.verbose:
+                print(f"{path.name}: {len(chunks)} chunk ({strategy})")
+            yield path, text, page_starts, chunks
+
+    def build_span_store(self, strategy="sentence-aware", files=None, store=None):
+        """
+        Esegue il chunking salvando i risultati in uno SpanStore: il testo di ogni
+        documento una volta sola e i chunk come intervalli, senza stringhe per chunk.
+
+        Args:
+            strategy (str): Strategia di chunking
+            files (list, optional): File da elaborare (default: tutti i .txt della directory)
+            store (SpanStore, optional): Store a cui aggiungere i documenti (default: nuovo)
+
+        Returns:
+            SpanStore: Lo store con i documenti elaborati
+        """
+        if strategy not in self._chunking_strategies:
+            raise ValueError(f"Unknown chunking type: '{strategy}'. Tipi validi: {list(self._chunking_strategies.keys())}")
+        store = SpanStore() if store is None else store
+        for path, text, page_starts, chunks in self._iter_chunked_documents(strategy, files):
+            store.add_document(path, text, self._records(path, text, page_starts, chunks))
+        return store
+
+    def chunk(self, type = "semantic", files = None, max_workers = None):
+        """Come iter_chunks, ma restituisce tutti i ChunkRecord in una lista."""
+        return list(self.iter_chunks(type, files, max_workers=max_workers))
@@ -0,0 +1,332 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import tempfile
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def _lsh_params(num_perm, threshold):
+    """
+    Sceglie bande e righe per banda (bands * rows = num_perm) in modo che la
+    soglia della curva LSH, circa (1 / bands) ** (1 / rows), sia vicina alla soglia richiesta.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class ChunkDeduplicator:
+    """
+    Elimina i chunk duplicati prima dell'embedding: duplicati esatti (hash del
+    testo normalizzato) e quasi duplicati (MinHash su trigrammi di parole con LSH a
+    bande, similarita' di Jaccard stimata >= threshold). Lo stato (hash, bucket LSH,
+    firme, documento di origine e mappatura scartato -> canonico) sta in un
+    database SQLite su disco, quindi la memoria resta limitata anche con milioni
+    di chunk. Se un chunk canonico viene rimosso (documento modificato o
+    eliminato), il primo dei suoi duplicati diventa canonico al suo posto: i
+    chunk promossi non sono mai arrivati agli store a valle e vanno rielaborati
+    (vedi remove_sources e promoted).
+    """
+
+    def __init__(self, threshold=0.85, num_perm=128, shingle_size=3, db_path=None, seed=1, batch_size=1000):
+        """
+        Args:
+            threshold (float): Similarita' di Jaccard minima per considerare due chunk quasi duplicati
+            num_perm (int): Numero di permutazioni MinHash (lunghezza della firma)
+            shingle_size (int): Parole per shingle
+            db_path (str, optional): Database SQLite dello stato (default: file temporaneo)
+            seed (int): Seme delle permutazioni; va mantenuto tra esecuzioni sullo stesso database
+            batch_size (int): Chunk per transazione SQLite
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold deve essere compreso tra 0 e 1.")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.batch_size = batch_size
+        self.bands, self.rows = _lsh_params(num_perm, threshold)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        if db_path is None:
+            self._tmp_dir = tempfile.TemporaryDirectory()
+            db_path = Path(self._tmp_dir.name) / "dedup.sqlite"
+        else:
+            self._tmp_dir = None
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path)
+        self._conn = sqlite3.connect(str(self.db_path))
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=OFF;
+            CREATE TABLE IF NOT EXISTS exact (digest BLOB PRIMARY KEY, chunk_id TEXT);
+            CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, source TEXT, digest BLOB, signature BLOB);
+            CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER, chunk_id TEXT);
+            CREATE INDEX IF NOT EXISTS buckets_bucket ON buckets (bucket);
+            CREATE TABLE IF NOT EXISTS mapping (chunk_id TEXT PRIMARY KEY, canonical_id TEXT, kind TEXT, similarity REAL);
+            CREATE INDEX IF NOT EXISTS exact_chunk ON exact (chunk_id);
+            CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source);
+            CREATE INDEX IF NOT EXISTS buckets_chunk ON buckets (chunk_id);
+            CREATE INDEX IF NOT EXISTS mapping_canonical ON mapping (canonical_id);
+        """)
+        self.seen = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self._pending = 0
+        # Duplicati diventati canonici perche' il loro canonico e' stato rimosso o
+        # cambiato durante check(): vanno inviati agli store a valle
+        self.promoted = []
+
+    @staticmethod
+    def _normalize(text):
+        return " ".join(_WORD_RE.findall(text.lower()))
+
+    def _signature(self, words):
+        """Firma MinHash (uint32) degli shingle di parole, o None se il testo non ha parole."""
+        if not words:
+            return None
+        k = self.shingle_size
+        shingles = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # Permutazioni (a * x + b) mod p, troncate a 32 bit
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _bucket_keys(self, signature):
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(rows, digest_size=8, person=band.to_bytes(8, 'little')).digest()
+            keys.append(int.from_bytes(digest, 'little', signed=True))
+        return keys
+
+    def _record_duplicate(self, chunk_id, canonical_id, kind, similarity):
+        self._conn.execute("INSERT OR REPLACE INTO mapping VALUES (?, ?, ?, ?)",
+                           (chunk_id, canonical_id, kind, similarity))
+
+    def _register_canonical(self, chunk_id, digest, signature):
+        if signature is not None:
+            self._conn.executemany("INSERT INTO buckets VALUES (?, ?)",
+                                   [(key, chunk_id) for key in self._bucket_keys(signature)])
+        self._conn.execute("INSERT OR IGNORE INTO exact VALUES (?, ?)", (digest, chunk_id))
+
+    def _forget(self, chunk_ids):
+        """
+        Cancella lo stato dei chunk indicati. I duplicati di un canonico cancellato
+        non restano senza rappresentante: il primo (in ordine di chunk_id) diventa
+        canonico e gli altri vengono riassegnati a lui se restano duplicati,
+        altrimenti vengono promossi a loro volta.
+
+        Returns:
+            list[str]: I chunk promossi a canonici
+        """
+        removed = set(chunk_ids)
+        promoted = []
+        for chunk_id in chunk_ids:
+            row = self._conn.execute("SELECT signature FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            canonical = self._conn.execute("SELECT 1 FROM exact WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            self._conn.execute("DELETE FROM chunks WHERE chunk_id = ?", (chunk_id,))
+            self._conn.execute("DELETE FROM mapping WHERE chunk_id = ?", (chunk_id,))
+            if canonical is None:
+                continue
+            self._conn.execute("DELETE FROM exact WHERE chunk_id = ?", (chunk_id,))
+            self._conn.execute("DELETE FROM buckets WHERE chunk_id = ?", (chunk_id,))
+            duplicates = [
+                (duplicate_id, digest, None if blob is None else np.frombuffer(blob, dtype=np.uint32))
+                for duplicate_id, digest, blob in self._conn.execute(
+                    "SELECT m.chunk_id, c.digest, c.signature FROM mapping m JOIN chunks c ON c.chunk_id = m.chunk_id "
+                    "WHERE m.canonical_id = ? ORDER BY m.chunk_id", (chunk_id,)).fetchall()
+                if duplicate_id not in removed
+            ]
+            self._conn.execute("DELETE FROM mapping WHERE canonical_id = ?", (chunk_id,))
+            # I duplicati esatti hanno lo stesso testo normalizzato, quindi la stessa firma
+            old_signature = None if row is None or row[0] is None else np.frombuffer(row[0], dtype=np.uint32)
+            while duplicates:
+                new_id, new_digest, new_signature = duplicates.pop(0)
+                if new_signature is None:
+                    new_signature = old_signature
+                    if new_signature is not None:
+                        self._conn.execute("UPDATE chunks SET signature = ? WHERE chunk_id = ?",
+                                           (new_signature.tobytes(), new_id))
+                self._conn.execute("DELETE FROM mapping WHERE chunk_id = ?", (new_id,))
+                self._register_canonical(new_id, new_digest, new_signature)
+                promoted.append(new_id)
+                remaining = []
+                for duplicate_id, digest, signature in duplicates:
+                    if digest == new_digest:
+                        self._record_duplicate(duplicate_id, new_id, "exact", 1.0)
+                        continue
+                    signature = old_signature if signature is None else signature
+                    similarity = 0.0
+                    if signature is not None and new_signature is not None:
+                        similarity = float(np.mean(signature == new_signature))
+                    if similarity >= self.threshold:
+                        self._record_duplicate(duplicate_id, new_id, "near", similarity)
+                    else:
+                        remaining.append((duplicate_id, digest, signature))
+                duplicates = remaining
+        return promoted
+
+    def remove_sources(self, sources):
+        """
+        Dimentica i chunk dei documenti indicati (modificati o eliminati), ad esempio
+        da ChunkManager.chunk_incremental: i chunk_id sono posizionali, quindi il
+        nuovo testo di un documento non deve trovare i suoi vecchi chunk.
+
+        Args:
+            sources (iterable[str]): Percorsi dei documenti (ChunkRecord.source)
+
+        Returns:
+            list[str]: I duplicati promossi a canonici al posto dei chunk rimossi; non
+                       sono mai stati inviati a valle e vanno rielaborati
+        """
+        sources = list(sources)
+        chunk_ids = []
+        for start in range(0, len(sources), 500):
+            batch = sources[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            chunk_ids.extend(chunk_id for (chunk_id,) in self._conn.execute(
+                f"SELECT chunk_id FROM chunks WHERE source IN ({placeholders}) ORDER BY chunk_id", batch))
+        promoted = self._forget(chunk_ids)
+        self._conn.commit()
+        return promoted
+
+    def sources_of(self, chunk_ids):
+        """Documento di origine di ciascun chunk registrato: {chunk_id: source}."""
+        chunk_ids = list(chunk_ids)
+        found = {}
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._conn.execute(
+                f"SELECT chunk_id, source FROM chunks WHERE chunk_id IN ({placeholders})", batch).fetchall())
+        return found
+
+    def check(self, chunk_id, text, source=None):
+        """
+        Registra un chunk e dice se e' un duplicato. Un chunk gia' registrato con
+        lo stesso testo mantiene il suo stato; se il testo e' cambiato il vecchio
+        stato viene sostituito (gli eventuali duplicati promossi finiscono in promoted).
+
+        Args:
+            chunk_id (str): Id del chunk
+            text (str): Testo del chunk
+            source (str, optional): Documento di origine, usato da remove_sources
+
+        Returns:
+            tuple: (chunk_id canonico o None se il chunk va tenuto, tipo "exact"/"near", similarita')
+        """
+        self.seen += 1
+        words = self._normalize(text).split()
+        digest = hashlib.blake2b(" ".join(words).encode('utf-8'), digest_size=16).digest()
+        known = self._conn.execute("SELECT digest FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        if known is not None:
+            if known[0] == digest:
+                # Gia' registrato con lo stesso testo in un'esecuzione precedente
+                row = self._conn.execute(
+                    "SELECT canonical_id, kind, similarity FROM mapping WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                if row is None:
+                    return None, None, 1.0
+                if row[1] == "exact":
+                    self.exact_duplicates += 1
+                else:
+                    self.near_duplicates += 1
+                return tuple(row)
+            # Stesso chunk_id posizionale con un testo nuovo (documento modificato)
+            self.promoted.extend(self._forget([chunk_id]))
+
+        row = self._conn.execute("SELECT chunk_id FROM exact WHERE digest = ?", (digest,)).fetchone()
+        if row is not None:
+            self.exact_duplicates += 1
+            self._conn.execute("INSERT INTO chunks VALUES (?, ?, ?, NULL)", (chunk_id, source, digest))
+            self._record_duplicate(chunk_id, row[0], "exact", 1.0)
+            return row[0], "exact", 1.0
+
+        signature = self._signature(words)
+        blob = None if signature is None else signature.tobytes()
+        self._conn.execute("INSERT INTO chunks VALUES (?, ?, ?, ?)", (chunk_id, source, digest, blob))
+        if signature is not None:
+            keys = self._bucket_keys(signature)
+            placeholders = ",".join("?" * len(keys))
+            candidates = self._conn.execute(
+                f"SELECT DISTINCT b.chunk_id, c.signature FROM buckets b JOIN chunks c ON c.chunk_id = b.chunk_id "
+                f"WHERE b.bucket IN ({placeholders})", keys
+            ).fetchall()
+            best_id, best_similarity = None, 0.0
+            for candidate_id, candidate_blob in candidates:
+                if candidate_id == chunk_id or candidate_blob is None:
+                    continue
+                similarity = float(np.mean(np.frombuffer(candidate_blob, dtype=np.uint32) == signature))
+                if similarity > best_similarity:
+                    best_id, best_similarity = candidate_id, similarity
+            if best_id is not None and best_similarity >= self.threshold:
+                self.near_duplicates += 1
+                self._record_duplicate(chunk_id, best_id, "near", best_similarity)
+                return best_id, "near", best_similarity
+        self._register_canonical(chunk_id, digest, signature)
+
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._conn.commit()
+            self._pending = 0
+        return None, None, 1.0
+
+    def filter(self, records):
+        """
+        Filtra un flusso di ChunkRecord lasciando passare solo i canonici.
+        I duplicati scartati restano consultabili con canonical() e duplicates_of().
+        """
+        try:
+            for record in records:
+                canonical_id, _, _ = self.check(record.chunk_id, record.text, record.source)
+                if canonical_id is None:
+                    yield record
+        finally:
+            self._conn.commit()
+            logging.info(f"Deduplicazione: {self.stats()}")
+
+    def canonical(self, chunk_id):
+        """Chunk canonico di un chunk (lo stesso id se non e' stato scartato)."""
+        row = self._conn.execute("SELECT canonical_id FROM mapping WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        return chunk_id if row is None else row[0]
+
+    def duplicates_of(self, canonical_id):
+        """Chunk scartati come duplicati del chunk canonico: lista di (chunk_id, tipo, similarita')."""
+        return self._conn.execute(
+            "SELECT chunk_id, kind, similarity FROM mapping WHERE canonical_id = ? ORDER BY chunk_id", (canonical_id,)
+        ).fetchall()
+
+    def stats(self):
+        dropped = self.exact_duplicates + self.near_duplicates
+        return {
+            "seen": self.seen,
+            "kept": self.seen - dropped,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "dedup_ratio": dropped / self.seen if self.seen else 0.0,
+            "bands": self.bands,
+            "rows_per_band": self.rows,
+        }
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+        if self._tmp_dir is not None:
+            self._tmp_dir.cleanup()
@@ -0,0 +1,109 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# ChunkManager del processo worker, creato una volta sola dall'initializer
+_worker_manager = None
+
+
+def _init_worker(config):
+    """Initializer dei worker: riceve la configurazione una volta e costruisce il ChunkManager."""
+    global _worker_manager
+    from vec_rag.chunking.chunk import ChunkManager
+
+    _worker_manager = ChunkManager(**config)
+    # Le decisioni della modalita' automatica vengono restituite e svuotate a ogni
+    # task: nessun limite qui, il limite vale nel processo principale
+    _worker_manager.auto_report = deque()
+
+
+def _chunk_task(strategy, paths):
+    """
+    Chunking di un lotto di file nel worker.
+
+    Returns:
+        tuple: (ChunkRecord nell'ordine dei file, decisioni della modalita' automatica del lotto,
+                file saltati perche' illeggibili)
+    """
+    records = list(_worker_manager.iter_chunks(strategy, files=paths))
+    decisions = list(_worker_manager.auto_report)
+    _worker_manager.auto_report.clear()
+    skipped = list(_worker_manager.skipped_files)
+    _worker_manager.skipped_files.clear()
+    return records, decisions, skipped
+
+
+class ParallelChunkExecutor:
+    """
+    Esegue il chunking di molti documenti su un pool di processi. I file vengono
+    raggruppati in task (per numero e per dimensione), la configurazione della
+    strategia viaggia verso i worker una sola volta tramite l'initializer e i
+    risultati sono restituiti nello stesso ordine dell'esecuzione seriale.
+    """
+
+    def __init__(self, config, max_workers=None, docs_per_task=16, task_bytes=4 * 1024 * 1024, max_pending=None):
+        """
+        Args:
+            config (dict): Argomenti del costruttore di ChunkManager (vedi ChunkManager.config())
+            max_workers (int, optional): Processi worker (default: numero di core)
+            docs_per_task (int): Documenti massimi per task
+            task_bytes (int): Dimensione massima (in byte) dei documenti di un task,
+                              superata solo se il task contiene un solo documento
+            max_pending (int, optional): Task in volo al massimo (default: 2 per worker),
+                                         per tenere limitata la memoria dei risultati in attesa
+        """
+        self.config = config
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.docs_per_task = docs_per_task
+        self.task_bytes = task_bytes
+        self.max_pending = max_pending or 2 * self.max_workers
+
+    def _tasks(self, files):
+        """Raggruppa i file in lotti consecutivi rispettando docs_per_task e task_bytes."""
+        batch, batch_bytes = [], 0
+        for path in files:
+            path = Path(path)
+            try:
+                size = path.stat().st_size
+            except OSError:
+                size = 0
+            if batch and (len(batch) >= self.docs_per_task or batch_bytes + size > self.task_bytes):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(path)
+            batch_bytes += size
+        if batch:
+            yield batch
+
+    def iter_chunks(self, strategy, files, on_decisions=None, on_skipped=None):
+        """
+        Args:
+            strategy (str): Strategia di chunking
+            files (list): File da elaborare, nell'ordine in cui produrre i chunk
+            on_decisions (callable, optional): Riceve le decisioni della modalita'
+                                               automatica prese nei worker, lotto per lotto
+            on_skipped (callable, optional): Riceve i file che i worker non sono riusciti a leggere
+
+        Yields:
+            ChunkRecord: I chunk di tutti i file, in ordine deterministico
+        """
+        def results(future):
+            records, decisions, skipped = future.result()
+            if on_decisions is not None and decisions:
+                on_decisions(decisions)
+            if on_skipped is not None and skipped:
+                on_skipped(skipped)
+            return records
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                 initargs=(self.config,)) as executor:
+            pending = deque()
+            for task in self._tasks(files):
+                pending.append(executor.submit(_chunk_task, strategy, task))
+                if len(pending) >= self.max_pending:
+                    yield from results(pending.popleft())
+            while pending:
+                yield from results(pending.popleft())
+        logging.debug(f"Chunking parallelo '{strategy}' completato con {self.max_workers} processi.")
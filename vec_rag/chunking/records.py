@@ -0,0 +1,91 @@
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class ChunkRecord:
+    """
+    Un chunk prodotto da ChunkManager.iter_chunks.
+
+    start/end sono offset in caratteri nel testo del documento sorgente
+    (None se il chunk non e' localizzabile, ad es. testo riscritto dallo splitter),
+    page e' la pagina (da 1) in cui inizia il chunk, se nota.
+    """
+    chunk_id: str
+    text: str
+    source: str
+    index: int
+    page: int = None
+    start: int = None
+    end: int = None
+    token_count: int = 0
+
+    def to_dict(self):
+        return {
+            "chunk_id": self.chunk_id,
+            "text": self.text,
+            "source": self.source,
+            "index": self.index,
+            "page": self.page,
+            "start": self.start,
+            "end": self.end,
+            "token_count": self.token_count,
+        }
+
+
+# Margine (in caratteri) della finestra in cui si cerca un chunk non trovato alla lettera
+_FALLBACK_SLACK = 1000
+
+
+def _find(text, chunk, cursor, limit=None):
+    """
+    Cerca chunk in text da cursor; se non c'e' alla lettera, tollera spazi diversi
+    ma solo fino a limit, cosi' un chunk introvabile non fa scorrere tutto il resto
+    del documento.
+    """
+    position = text.find(chunk, cursor)
+    if position >= 0:
+        return position, position + len(chunk)
+    # Gli splitter per frase riuniscono le frasi con " " anche dove il testo aveva "\n"
+    words = chunk.split()
+    if not words:
+        return None
+    limit = len(text) if limit is None else min(limit, len(text))
+    match = re.compile(r"\s+".join(map(re.escape, words))).search(text, cursor, limit)
+    if match is None:
+        return None
+    return match.start(), match.end()
+
+
+def locate_chunks(text, chunks):
+    """
+    Offset [start, end) di ogni chunk nel testo sorgente. I chunk devono essere
+    in ordine di posizione (possono sovrapporsi): la ricerca di ciascuno riparte
+    subito dopo l'inizio del precedente, quindi il costo totale e' lineare nel testo
+    per chunk che non si sovrappongono molto. La ricerca tollerante agli spazi si
+    ferma alla distanza in cui il chunk puo' ragionevolmente trovarsi: i caratteri
+    dei chunk dall'ultimo trovato, il doppio del chunk e _FALLBACK_SLACK.
+
+    Returns:
+        list: Una tupla (start, end) o None per ogni chunk
+    """
+    spans = []
+    cursor = 0
+    behind = 0
+    for chunk in chunks:
+        span = _find(text, chunk, cursor, cursor + behind + 2 * len(chunk) + _FALLBACK_SLACK)
+        spans.append(span)
+        if span is not None:
+            cursor = span[0] + 1
+            behind = span[1] - span[0]
+        else:
+            behind += len(chunk)
+    return spans
+
+
+def page_of(page_starts, offset):
+    """Pagina (da 1) che contiene l'offset, dati gli offset di inizio pagina in ordine."""
+    if not page_starts or offset is None:
+        return None
+    return max(1, bisect_right(page_starts, offset))
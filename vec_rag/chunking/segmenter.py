@@ -0,0 +1,113 @@
+"""
+Segmentatore di frasi basato su regole e regex compilate, alternativo a
+nltk.sent_tokenize: non richiede i dati punkt e restituisce gli offset delle
+frasi invece di copie del testo.
+"""
+import re
+
+# Abbreviazioni (minuscole, senza punto finale) dopo cui un punto non chiude la frase.
+# Niente parole comuni ("no", "al", "ed") ne' unita' di misura ("ms", "m")
+DEFAULT_ABBREVIATIONS = frozenset("""
+    approx art ca cap cf cfr dott dr ecc eds eg eq eqs etc fig figg ie inc jr
+    ltd mr mrs prof ref refs sez sig sigg sr tab vol vols vs
+""".split())
+
+# Abbreviazioni ambigue che non chiudono la frase solo se seguite da un numero ("No. 5", "p. 12")
+NUMBER_ABBREVIATIONS = frozenset("n no nr p pp pag pagg sec".split())
+
+# Parole che precedono un'iniziale puntata nei nomi ("Vaswani and N. Shazeer")
+_NAME_JOINERS = frozenset("and by da de del der di e van von".split())
+
+# Punteggiatura finale, eventuali chiusure (virgolette, parentesi) e lo spazio che segue
+_BOUNDARY_RE = re.compile(r"""[.!?…]+["'”’»)\]]*(\s+)""")
+_OPENERS = "\"'“‘«([{"
+_WHITESPACE = " \t\n\r\f\v"
+
+
+class RegexSentenceSegmenter:
+    """
+    Divide il testo in frasi cercando con una regex i candidati confine (., !, ?,
+    … seguiti da spazio) e scartando quelli dopo abbreviazioni (et al., ecc.,
+    Dr., Fig., No. 5), iniziali puntate (A. Vaswani, U.S.), o seguiti da una minuscola.
+    Una lettera maiuscola isolata e' un'iniziale solo se non segue una parola
+    minuscola qualsiasi ("vitamin C." chiude la frase), una minuscola isolata
+    ("3 m.") non lo e' mai. I numeri decimali non sono mai spezzati perche' il
+    punto non e' seguito da spazio.
+    """
+
+    def __init__(self, abbreviations=None, max_token_lookback=40):
+        """
+        Args:
+            abbreviations (iterable, optional): Abbreviazioni senza punto finale (default: italiano e inglese)
+            max_token_lookback (int): Caratteri esaminati prima del punto per trovare la parola
+        """
+        self.abbreviations = DEFAULT_ABBREVIATIONS if abbreviations is None else frozenset(
+            abbreviation.lower().rstrip(".") for abbreviation in abbreviations
+        )
+        self.max_token_lookback = max_token_lookback
+
+    def _token_before(self, text, position):
+        """Parola che precede la punteggiatura in position, senza aperture di parentesi/virgolette."""
+        low = max(0, position - self.max_token_lookback)
+        start = max(text.rfind(char, low, position) for char in _WHITESPACE) + 1
+        return text[max(start, low):position].lstrip(_OPENERS)
+
+    def _previous_token(self, text, position):
+        """Parola che precede quella che inizia in position (saltando gli spazi)."""
+        end = position
+        while end > 0 and text[end - 1] in _WHITESPACE:
+            end -= 1
+        return self._token_before(text, end)
+
+    def _is_boundary(self, text, match):
+        next_char_position = match.end()
+        if next_char_position < len(text) and text[next_char_position].islower():
+            return False
+        if text[match.start()] != ".":
+            return True
+        token = self._token_before(text, match.start())
+        if not token:
+            return True
+        lowered = token.lower()
+        if lowered in self.abbreviations:
+            return False
+        next_char = text[next_char_position] if next_char_position < len(text) else ""
+        if lowered in NUMBER_ABBREVIATIONS and next_char.isdigit():
+            return False
+        previous = self._previous_token(text, match.start() - len(token))
+        if lowered == "al" and previous.lower() == "et":
+            return False
+        if len(token) == 1 and token.isalpha():
+            # Iniziale puntata ("A. Vaswani", "and N. Shazeer") ma non "vitamin C." o "3 m."
+            if token.islower():
+                return True
+            return previous[:1].islower() and previous.lower() not in _NAME_JOINERS
+        if "." in token and all(len(part) <= 2 for part in token.split(".")):
+            # Sigle e abbreviazioni composte: "U.S.", "e.g.", "i.e."
+            return False
+        return True
+
+    def spans(self, text):
+        """
+        Offset delle frasi nel testo.
+
+        Returns:
+            list[tuple[int, int]]: Intervalli [inizio, fine) senza spazi iniziali e finali
+        """
+        spans = []
+        start = len(text) - len(text.lstrip())
+        for match in _BOUNDARY_RE.finditer(text, start):
+            if match.end() >= len(text) or not self._is_boundary(text, match):
+                continue
+            end = match.start(1)
+            if end > start:
+                spans.append((start, end))
+            start = match.end()
+        end = len(text.rstrip())
+        if end > start:
+            spans.append((start, end))
+        return spans
+
+    def split(self, text):
+        """Le frasi come stringhe (per compatibilita' con nltk.sent_tokenize)."""
+        return [text[start:end] for start, end in self.spans(text)]
@@ -0,0 +1,110 @@
+"""
+Chunking sentence-aware in tempo lineare.
+
+Ogni frase viene codificata una sola volta. Il numero di token di un chunk
+" ".join(frasi[i:j]) si ottiene con le somme prefisse dei conteggi per frase:
+il pre-tokenizer di tiktoken non unisce mai testo attraverso lo spazio di
+giunzione (lo spazio si attacca al primo pre-token della frase successiva),
+quindi basta correggere il conteggio della prima parola di ogni frase quando
+e' preceduta da uno spazio.
+"""
+
+
+def _head(sentence):
+    """Testo della frase fino al primo spazio (dove cade la correzione di giunzione)."""
+    space = sentence.find(" ")
+    return sentence if space < 0 else sentence[:space]
+
+
+def sentence_token_counts(sentences, count, count_batch=None):
+    """
+    Calcola per ogni frase i token da sola e i token quando segue un'altra frase
+    nel join con " ".
+
+    Args:
+        sentences (list[str]): Le frasi
+        count (callable): Funzione testo -> numero di token
+        count_batch (callable, optional): Funzione lista di testi -> lista di conteggi
+
+    Returns:
+        tuple: (token_da_sola, token_dopo_spazio), due liste di interi
+    """
+    if count_batch is not None:
+        alone = list(count_batch(sentences))
+    else:
+        alone = [count(sentence) for sentence in sentences]
+
+    # La correzione dipende solo dalla prima parola: memoizzata perche' molto ripetuta
+    corrections = {}
+    joined = []
+    for sentence, tokens in zip(sentences, alone):
+        if sentence[:1].isspace():
+            joined.append(count(" " + sentence))
+            continue
+        head = _head(sentence)
+        correction = corrections.get(head)
+        if correction is None:
+            correction = count(" " + head) - count(head)
+            corrections[head] = correction
+        joined.append(tokens + correction)
+    return alone, joined
+
+
+def pack_sentences(alone, joined, max_tokens, overlap_sentences=0):
+    """
+    Raggruppa le frasi in chunk di al massimo max_tokens token, con gli stessi
+    confini dell'algoritmo originale di ChunkManager._sentence_aware_chunking:
+    una frase piu' lunga del limite diventa un chunk a se', e dopo ogni chunk
+    chiuso per superamento del limite il successivo riparte overlap_sentences
+    frasi indietro (sempre avanzando di almeno una frase).
+
+    Args:
+        alone (list[int]): Token di ogni frase da sola
+        joined (list[int]): Token di ogni frase preceduta da uno spazio
+        max_tokens (int): Numero massimo di token per chunk
+        overlap_sentences (int): Frasi sovrapposte tra chunk consecutivi
+
+    Returns:
+        list[tuple[int, int]]: Intervalli [inizio, fine) di indici di frase
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens_per_chunk deve essere positivo.")
+    if overlap_sentences < 0:
+        raise ValueError("overlap_sentences non puo' essere negativo.")
+
+    n = len(alone)
+    prefix = [0] * (n + 1)
+    for k, count in enumerate(joined):
+        prefix[k + 1] = prefix[k] + count
+
+    spans = []
+    start = 0
+    while start < n:
+        if alone[start] > max_tokens:
+            spans.append((start, start + 1))
+            start += 1
+            continue
+        # Token di " ".join(frasi[start:end]) = alone[start] + sum(joined[start+1:end])
+        base = alone[start] - prefix[start + 1]
+        end = start + 1
+        while end < n and alone[end] <= max_tokens and base + prefix[end + 1] <= max_tokens:
+            end += 1
+        spans.append((start, end))
+        if end >= n:
+            break
+        if alone[end] > max_tokens:
+            start = end
+        else:
+            start = max(start + 1, end - overlap_sentences)
+    return spans
+
+
+def chunk_sentences(sentences, count, max_tokens, overlap_sentences=0, count_batch=None):
+    """
+    Divide una lista di frasi in chunk di testo rispettando il limite di token.
+
+    Returns:
+        list[str]: I chunk, ognuno ottenuto unendo le frasi con uno spazio
+    """
+    alone, joined = sentence_token_counts(sentences, count, count_batch)
+    return [" ".join(sentences[start:end]) for start, end in pack_sentences(alone, joined, max_tokens, overlap_sentences)]
@@ -0,0 +1,163 @@
+import json
+import mmap
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+_SPAN_DTYPE = np.dtype([("doc_id", "<u4"), ("start", "<i8"), ("end", "<i8"), ("token_count", "<u4")])
+
+
+def _byte_offsets(text, offsets):
+    """Converte offset in caratteri in offset in byte UTF-8, con una sola passata sul testo."""
+    if text.isascii():
+        return {offset: offset for offset in offsets}
+    converted = {}
+    previous_char = previous_byte = 0
+    for offset in sorted(set(offsets)):
+        previous_byte += len(text[previous_char:offset].encode('utf-8'))
+        previous_char = offset
+        converted[offset] = previous_byte
+    return converted
+
+
+class SpanStore:
+    """
+    Rappresentazione compatta dei chunk: il testo di tutti i documenti in un unico
+    buffer UTF-8 e, per ogni chunk, solo (doc_id, start, end, token_count) in array
+    tipizzati (24 byte per chunk). Il testo di un chunk viene ricavato su richiesta
+    da una memoryview del buffer, quindi l'overlap tra chunk non duplica testo.
+    Dopo save()/load() buffer e span sono mappati in memoria dal disco.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._sources = []
+        self._doc_bounds = array('q')
+        self._doc_ids = array('I')
+        self._starts = array('q')
+        self._ends = array('q')
+        self._token_counts = array('I')
+        self._view = None
+        self._mmap = None
+
+    def __len__(self):
+        return len(self._starts)
+
+    @property
+    def num_documents(self):
+        return len(self._sources)
+
+    def _check_writable(self):
+        if self._mmap is not None:
+            raise RuntimeError("SpanStore caricato da disco in sola lettura: creare un nuovo store per aggiungere documenti.")
+
+    def add_document(self, source, text, records):
+        """
+        Aggiunge un documento e i suoi chunk.
+
+        Args:
+            source (str): Identificativo del documento (es. percorso del file)
+            text (str): Testo completo del documento
+            records (list[ChunkRecord]): Chunk con offset in caratteri nel testo; quelli senza
+                                         offset vengono salvati in coda al documento
+
+        Returns:
+            int: doc_id del documento
+        """
+        self._check_writable()
+        records = list(records)
+        doc_id = len(self._sources)
+        base = len(self._buffer)
+        self._buffer += text.encode('utf-8')
+        self._sources.append(str(source))
+        # Limiti del solo testo del documento: i chunk non localizzabili vanno dopo
+        self._doc_bounds.append(base)
+        self._doc_bounds.append(len(self._buffer))
+
+        offsets = _byte_offsets(text, [offset for record in records if record.start is not None
+                                       for offset in (record.start, record.end)])
+        for record in records:
+            if record.start is None:
+                # Testo non presente alla lettera nel documento: lo conserva a parte
+                start = len(self._buffer)
+                self._buffer += record.text.encode('utf-8')
+                end = len(self._buffer)
+            else:
+                start, end = base + offsets[record.start], base + offsets[record.end]
+            self._doc_ids.append(doc_id)
+            self._starts.append(start)
+            self._ends.append(end)
+            self._token_counts.append(record.token_count)
+        self._view = None
+        return doc_id
+
+    def _buffer_view(self):
+        if self._view is None:
+            self._view = memoryview(self._mmap if self._mmap is not None else self._buffer)
+        return self._view
+
+    def span(self, index):
+        """(doc_id, start, end, token_count) del chunk, con offset in byte nel buffer."""
+        return (int(self._doc_ids[index]), int(self._starts[index]), int(self._ends[index]),
+                int(self._token_counts[index]))
+
+    def text_bytes(self, index):
+        """Il chunk come memoryview sul buffer, senza copie."""
+        return self._buffer_view()[self._starts[index]:self._ends[index]]
+
+    def text(self, index):
+        return str(self.text_bytes(index), 'utf-8')
+
+    def source(self, doc_id):
+        return self._sources[doc_id]
+
+    def document_text(self, doc_id):
+        start = self._doc_bounds[2 * doc_id]
+        end = self._doc_bounds[2 * doc_id + 1]
+        return str(self._buffer_view()[start:end], 'utf-8')
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.text(index)
+
+    def nbytes(self):
+        """Memoria occupata da buffer e span, in byte."""
+        spans = sum(a.itemsize * len(a) for a in (self._doc_ids, self._starts, self._ends, self._token_counts))
+        return len(self._buffer_view()) + spans
+
+    def save(self, directory):
+        """Salva text.bin, spans.npy e sources.json nella directory."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / "text.bin", 'wb') as f:
+            f.write(self._buffer_view())
+        spans = np.empty(len(self), dtype=_SPAN_DTYPE)
+        spans["doc_id"] = self._doc_ids
+        spans["start"] = self._starts
+        spans["end"] = self._ends
+        spans["token_count"] = self._token_counts
+        np.save(directory / "spans.npy", spans)
+        with open(directory / "sources.json", 'w', encoding='utf-8') as f:
+            json.dump({"sources": self._sources, "doc_bounds": list(self._doc_bounds)}, f)
+
+    @classmethod
+    def load(cls, directory):
+        """Carica uno store salvato, mappando in memoria testo e span (sola lettura)."""
+        directory = Path(directory)
+        store = cls()
+        with open(directory / "sources.json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        store._sources = meta["sources"]
+        store._doc_bounds = array('q', meta["doc_bounds"])
+        spans = np.load(directory / "spans.npy", mmap_mode='r')
+        store._doc_ids = spans["doc_id"]
+        store._starts = spans["start"]
+        store._ends = spans["end"]
+        store._token_counts = spans["token_count"]
+        with open(directory / "text.bin", 'rb') as f:
+            if (directory / "text.bin").stat().st_size:
+                store._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                store._mmap = b""
+        return store
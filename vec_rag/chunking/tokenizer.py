@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import OrderedDict
+
+import tiktoken
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+class TokenizerService:
+    """
+    Servizio di tokenizzazione condiviso: un encoder tiktoken per nome di codifica,
+    conteggio a lotti con encode_batch su piu' thread e una cache LRU dei
+    conteggi per le stringhe brevi e ripetute (intestazioni, piè di pagina,
+    frasi standard). Usare get_tokenizer() per ottenere l'istanza di processo.
+    """
+
+    def __init__(self, encoding_name="cl100k_base", memo_size=65536, memo_max_chars=512,
+                 num_threads=None, min_batch_for_threads=64):
+        """
+        Args:
+            encoding_name (str): Nome della codifica tiktoken
+            memo_size (int): Numero massimo di conteggi memorizzati
+            memo_max_chars (int): Lunghezza massima delle stringhe memorizzate
+            num_threads (int, optional): Thread per encode_batch (default: numero di core)
+            min_batch_for_threads (int): Lotti piu' piccoli vengono codificati senza thread
+        """
+        self.encoding_name = encoding_name
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self.memo_size = memo_size
+        self.memo_max_chars = memo_max_chars
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.min_batch_for_threads = min_batch_for_threads
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+    def encode(self, text):
+        return self.encoding.encode(text)
+
+    def decode(self, tokens):
+        return self.encoding.decode(tokens)
+
+    def encode_batch(self, texts):
+        """Codifica una lista di testi, su piu' thread se il lotto e' abbastanza grande."""
+        if self.num_threads > 1 and len(texts) >= self.min_batch_for_threads:
+            return self.encoding.encode_batch(texts, num_threads=self.num_threads)
+        return [self.encoding.encode(text) for text in texts]
+
+    def _memo_get(self, text):
+        with self._memo_lock:
+            count = self._memo.get(text)
+            if count is None:
+                self.memo_misses += 1
+            else:
+                self._memo.move_to_end(text)
+                self.memo_hits += 1
+            return count
+
+    def _memo_put(self, text, count):
+        with self._memo_lock:
+            self._memo[text] = count
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def count(self, text):
+        """Numero di token di un testo."""
+        if len(text) > self.memo_max_chars:
+            return len(self.encoding.encode(text))
+        count = self._memo_get(text)
+        if count is None:
+            count = len(self.encoding.encode(text))
+            self._memo_put(text, count)
+        return count
+
+    def count_batch(self, texts):
+        """
+        Numero di token di ogni testo della lista. I testi brevi gia' visti sono
+        serviti dalla cache, gli altri vengono codificati insieme con encode_batch.
+        """
+        counts = [None] * len(texts)
+        missing = []
+        for i, text in enumerate(texts):
+            if len(text) <= self.memo_max_chars:
+                counts[i] = self._memo_get(text)
+            if counts[i] is None:
+                missing.append(i)
+
+        if missing:
+            encoded = self.encode_batch([texts[i] for i in missing])
+            for i, tokens in zip(missing, encoded):
+                counts[i] = len(tokens)
+                if len(texts[i]) <= self.memo_max_chars:
+                    self._memo_put(texts[i], counts[i])
+        return counts
+
+
+def get_tokenizer(encoding_name="cl100k_base"):
+    """Restituisce il TokenizerService condiviso dal processo per la codifica indicata."""
+    service = _services.get(encoding_name)
+    if service is None:
+        with _services_lock:
+            service = _services.get(encoding_name)
+            if service is None:
+                service = TokenizerService(encoding_name)
+                _services[encoding_name] = service
+    return service
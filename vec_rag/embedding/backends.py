@@ -0,0 +1,94 @@
+import re
+import zlib
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class EmbeddingBackend:
+    """
+    Interfaccia dei backend di embedding: trasformano una lista di testi in una
+    matrice float32 (n_testi, dim). model_name identifica il modello nelle chiavi
+    di cache e negli store di vettori.
+    """
+
+    model_name = None
+    dim = None
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Embedding remoti tramite langchain_openai.OpenAIEmbeddings."""
+
+    def __init__(self, model="text-embedding-ada-002", **kwargs):
+        from langchain_openai.embeddings import OpenAIEmbeddings
+
+        self.model_name = f"openai/{model}"
+        self._client = OpenAIEmbeddings(model=model, **kwargs)
+
+    def embed(self, texts):
+        vectors = np.asarray(self._client.embed_documents(list(texts)), dtype=np.float32)
+        self.dim = vectors.shape[1] if vectors.ndim == 2 else self.dim
+        return vectors
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Backend locale e deterministico per lavorare offline e per i benchmark:
+    feature hashing con segno di parole e n-grammi di caratteri, normalizzato L2.
+    Testi con molte parole in comune hanno vettori vicini, il che basta a far
+    funzionare chunking semantico e ricerca senza un modello vero.
+    """
+
+    def __init__(self, dim=384, char_ngrams=3):
+        """
+        Args:
+            dim (int): Dimensione dei vettori
+            char_ngrams (int): Lunghezza degli n-grammi di caratteri (0 = solo parole)
+        """
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+        self.model_name = f"hashing/{dim}/{char_ngrams}"
+
+    def _features(self, text):
+        words = _WORD_RE.findall(text.lower())
+        features = list(words)
+        n = self.char_ngrams
+        if n:
+            for word in words:
+                padded = f"#{word}#"
+                features.extend(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+        return features
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode("utf-8")) for feature in self._features(text)),
+                dtype=np.uint32,
+            )
+            if not hashes.size:
+                continue
+            # Il bit alto decide il segno, il resto l'indice: le collisioni tendono ad annullarsi
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], (hashes & 0x7FFFFFFF) % self.dim, signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+def get_embedding_backend(backend="openai", **kwargs):
+    """
+    Restituisce un backend di embedding dal nome ("openai" o "hashing") oppure
+    l'istanza stessa se e' gia' un EmbeddingBackend.
+    """
+    if isinstance(backend, EmbeddingBackend):
+        return backend
+    if backend == "openai":
+        return OpenAIEmbeddingBackend(**kwargs)
+    if backend == "hashing":
+        return HashingEmbeddingBackend(**kwargs)
+    raise ValueError(f"Backend di embedding sconosciuto: '{backend}'. Backend validi: ['openai', 'hashing']")
@@ -0,0 +1,63 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Cache su disco dei vettori di embedding, indicizzata dall'hash del testo e dal
+    nome del modello. Usa SQLite, quindi regge milioni di voci senza caricarle in
+    memoria e puo' essere condivisa tra esecuzioni diverse.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): File SQLite della cache
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER, vector BLOB)"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name, text):
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Restituisce {chiave: vettore float32} per le chiavi presenti in cache."""
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            # SQLite limita il numero di parametri per query
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Salva una sequenza di coppie (chiave, vettore)."""
+        rows = [(key, int(vector.shape[0]), np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,67 @@
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Adattatore langchain Embeddings sopra un EmbeddingBackend: deduplica i testi,
+    li serve dalla EmbeddingCache quando possibile e calcola i mancanti a lotti
+    di batch_size. Con prefetch() si possono calcolare in anticipo i vettori di
+    tutti i file, cosi' le chiamate successive di SemanticChunker sono tutte hit.
+    """
+
+    def __init__(self, backend, cache=None, batch_size=512):
+        """
+        Args:
+            backend (EmbeddingBackend): Backend che calcola i vettori
+            cache (EmbeddingCache, optional): Cache persistente dei vettori
+            batch_size (int): Testi per ogni chiamata al backend
+        """
+        self.backend = backend
+        self.cache = cache
+        self.batch_size = batch_size
+        # Vettori dell'esecuzione corrente, per non rileggerli dalla cache
+        self._memory = {}
+
+    def embed_array(self, texts):
+        """Restituisce i vettori dei testi come matrice float32 (n, dim)."""
+        texts = list(texts)
+        self.prefetch(texts)
+        if not texts:
+            return np.zeros((0, self.backend.dim or 0), dtype=np.float32)
+        return np.stack([self._memory[text] for text in texts])
+
+    def prefetch(self, texts):
+        """Calcola (o legge dalla cache) i vettori dei testi non ancora disponibili."""
+        missing = [text for text in dict.fromkeys(texts) if text not in self._memory]
+        if not missing:
+            return
+
+        if self.cache is not None:
+            keys = {text: self.cache.make_key(self.backend.model_name, text) for text in missing}
+            cached = self.cache.get_many(keys.values())
+            for text in missing:
+                vector = cached.get(keys[text])
+                if vector is not None:
+                    self._memory[text] = vector
+            missing = [text for text in missing if text not in self._memory]
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            vectors = self.backend.embed(batch)
+            for text, vector in zip(batch, vectors):
+                self._memory[text] = vector
+            if self.cache is not None:
+                self.cache.put_many(
+                    (self.cache.make_key(self.backend.model_name, text), vector) for text, vector in zip(batch, vectors)
+                )
+
+    def clear(self):
+        """Svuota i vettori tenuti in memoria (la cache su disco resta)."""
+        self._memory.clear()
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
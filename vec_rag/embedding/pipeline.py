@@ -0,0 +1,168 @@
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+
+from input_module.utils.tools import find_project_root
+from vec_rag.embedding.backends import get_embedding_backend
+from vec_rag.embedding.store import VectorStore, VectorStoreWriter, content_hash
+
+
+class EmbeddingPipeline:
+    """
+    Stadio di embedding: riceve i ChunkRecord (es. da ChunkManager.iter_chunks),
+    li embedda a lotti con un EmbeddingBackend e scrive i vettori in un
+    VectorStore su disco. Alla riesecuzione i vettori dei chunk con lo stesso
+    hash del contenuto vengono copiati dallo store precedente invece di essere
+    ricalcolati. Per l'aggiornamento incrementale (ChunkManager.chunk_incremental)
+    remove_sources toglie i chunk dei documenti modificati o eliminati e
+    run(records, append=True) aggiunge i nuovi chunk a quelli gia' presenti.
+    """
+
+    def __init__(self, backend="openai", store_path=None, dtype="float32", batch_size=256):
+        """
+        Args:
+            backend (str | EmbeddingBackend): "openai" (come ChunkManager), "hashing" o un'istanza di EmbeddingBackend
+            store_path (str, optional): Directory dello store (default: <RAGnarok>/vector_db/vectors)
+            dtype (str): Tipo dei vettori salvati, "float32" o "float16"
+            batch_size (int): Chunk per lotto (e per chiamata al backend)
+        """
+        self.backend = get_embedding_backend(backend)
+        self.store_path = Path(store_path) if store_path else find_project_root(marker_name="RAGnarok") / "vector_db" / "vectors"
+        self.dtype = dtype
+        self.batch_size = batch_size
+
+    def _previous_store(self):
+        """Lo store precedente, se compatibile con il modello corrente."""
+        if not VectorStore.exists(self.store_path):
+            return None
+        store = VectorStore(self.store_path)
+        if store.model_name != self.backend.model_name:
+            logging.info(f"Store creato con {store.model_name}: i vettori verranno ricalcolati con {self.backend.model_name}.")
+            store.close()
+            return None
+        return store
+
+    def _embed_batch(self, texts, hashes, previous, stats):
+        """Vettori del lotto: copiati dallo store precedente per gli hash noti, calcolati per gli altri."""
+        vectors = [None] * len(texts)
+        reused = previous.rows_by_hash(set(hashes)) if previous is not None else {}
+        for i, digest in enumerate(hashes):
+            row = reused.get(digest)
+            if row is not None:
+                vectors[i] = np.asarray(previous.vectors[row], dtype=np.float32)
+        stats["reused"] += sum(vector is not None for vector in vectors)
+
+        # Testi uguali nello stesso lotto vengono embeddati una volta sola
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(hashes[i], []).append(i)
+        if missing:
+            unique = list(missing)
+            embedded = self.backend.embed([texts[missing[digest][0]] for digest in unique])
+            stats["embedded"] += len(unique)
+            for digest, vector in zip(unique, embedded):
+                for i in missing[digest]:
+                    vectors[i] = vector
+        return np.stack(vectors)
+
+    def remove_sources(self, sources):
+        """
+        Pubblica una nuova versione dello store senza i chunk dei documenti indicati
+        (i vettori restanti vengono copiati, non ricalcolati).
+
+        Args:
+            sources (iterable[str]): Percorsi dei documenti (ChunkRecord.source)
+        """
+        sources = set(sources)
+        if not sources or not VectorStore.exists(self.store_path):
+            return
+        store = VectorStore(self.store_path)
+        writer = None
+        try:
+            if not store.has_sources:
+                logging.warning(f"{self.store_path} non registra i documenti dei chunk: "
+                                f"va ricostruito con run() per poter rimuovere i documenti.")
+                return
+            if not store.count_sources(sources):
+                return
+            writer = VectorStoreWriter(self.store_path, store.dim, store.model_name, store.dtype.name)
+            for chunk_ids, hashes, batch_sources, vectors in store.iter_batches(exclude_sources=sources):
+                writer.append(chunk_ids, hashes, vectors, batch_sources)
+            store.close()
+            store = None
+            writer.close()
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        finally:
+            if store is not None:
+                store.close()
+
+    def run(self, records, append=False):
+        """
+        Embedda i chunk e riscrive lo store.
+
+        Args:
+            records (iterable[ChunkRecord]): I chunk, anche come generatore
+            append (bool): Tiene anche i chunk dello store precedente non ricevuti
+                           (quelli con lo stesso chunk_id vengono sostituiti)
+
+        Returns:
+            dict: chunk elaborati, vettori calcolati, vettori riutilizzati e tempo impiegato
+        """
+        started = time.perf_counter()
+        stats = {"chunks": 0, "embedded": 0, "reused": 0}
+        previous = self._previous_store()
+        if append and previous is None and VectorStore.exists(self.store_path):
+            raise ValueError(f"{self.store_path} e' stato creato con un altro modello: "
+                             f"i suoi vettori non si possono unire a quelli di {self.backend.model_name}.")
+        writer = None
+        # chunk_id ricevuti, da non copiare dallo store precedente (solo con append)
+        written = set() if append else None
+        try:
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    writer = self._write_batch(batch, previous, writer, stats, written)
+                    batch = []
+            if batch:
+                writer = self._write_batch(batch, previous, writer, stats, written)
+            if append and previous is not None:
+                for chunk_ids, hashes, sources, vectors in previous.iter_batches(exclude_ids=written):
+                    if writer is None:
+                        writer = VectorStoreWriter(self.store_path, previous.dim, self.backend.model_name, self.dtype)
+                    writer.append(chunk_ids, hashes, vectors, sources)
+            if previous is not None:
+                previous.close()
+                previous = None
+            if writer is None:
+                writer = VectorStoreWriter(self.store_path, self.backend.dim or 0, self.backend.model_name, self.dtype)
+            writer.close()
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        finally:
+            if previous is not None:
+                previous.close()
+
+        stats["seconds"] = time.perf_counter() - started
+        logging.info(f"Embedding completato in {self.store_path}: {stats}")
+        return stats
+
+    def _write_batch(self, batch, previous, writer, stats, written=None):
+        texts = [record.text for record in batch]
+        hashes = [content_hash(text) for text in texts]
+        vectors = self._embed_batch(texts, hashes, previous, stats)
+        if writer is None:
+            writer = VectorStoreWriter(self.store_path, vectors.shape[1], self.backend.model_name, self.dtype)
+        writer.append([record.chunk_id for record in batch], hashes, vectors, [record.source for record in batch])
+        stats["chunks"] += len(batch)
+        if written is not None:
+            written.update(record.chunk_id for record in batch)
+        return writer
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def content_hash(text):
+    """Hash del testo di un chunk, usato per riutilizzare i vettori dei chunk invariati."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+_CURRENT = "CURRENT"
+
+
+def _current_version(path):
+    """
+    Directory della versione corrente dello store: quella indicata dal file
+    CURRENT oppure, per gli store scritti prima del versionamento, path stessa.
+    """
+    try:
+        with open(path / _CURRENT, 'r', encoding='utf-8') as f:
+            return path / f.read().strip()
+    except FileNotFoundError:
+        return path
+
+
+def _version_time(name):
+    """Istante di creazione (ns) di una versione v<ns>-<pid>, -1 se il nome non e' una versione."""
+    try:
+        return int(name[1:].split("-", 1)[0]) if name.startswith("v") else -1
+    except ValueError:
+        return -1
+
+
+class VectorStore:
+    """
+    Store di vettori in sola lettura: una matrice contigua (count, dim) float32 o
+    float16 in vectors.bin, aperta con np.memmap senza caricarla in RAM, e un
+    indice SQLite a fianco (riga -> chunk_id, hash del contenuto, documento) per le ricerche
+    per id o per hash senza tenere gli id in memoria. I file stanno nella
+    versione indicata da <path>/CURRENT (vedi VectorStoreWriter).
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Directory dello store (scritta da VectorStoreWriter)
+        """
+        self.root = Path(path)
+        self.path = _current_version(self.root)
+        with open(self.path / "meta.json", 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.dim = self.meta["dim"]
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.model_name = self.meta["model_name"]
+        self.count = self.meta["count"]
+        if self.count:
+            self.vectors = np.memmap(self.path / "vectors.bin", dtype=self.dtype, mode='r', shape=(self.count, self.dim))
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=self.dtype)
+        self._conn = sqlite3.connect(f"file:{self.path / 'index.sqlite'}?mode=ro", uri=True, check_same_thread=False)
+
+    @classmethod
+    def exists(cls, path):
+        return (_current_version(Path(path)) / "meta.json").exists()
+
+    def __len__(self):
+        return self.count
+
+    def chunk_id(self, row):
+        found = self._conn.execute("SELECT chunk_id FROM rows WHERE row = ?", (int(row),)).fetchone()
+        return None if found is None else found[0]
+
+    def chunk_ids(self, rows):
+        """chunk_id delle righe indicate, nello stesso ordine."""
+        rows = [int(row) for row in rows]
+        found = {}
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._conn.execute(
+                f"SELECT row, chunk_id FROM rows WHERE row IN ({placeholders})", batch).fetchall())
+        return [found.get(row) for row in rows]
+
+    def row_of(self, chunk_id):
+        found = self._conn.execute("SELECT row FROM rows WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        return None if found is None else found[0]
+
+    def rows_by_hash(self, hashes):
+        """Riga di un vettore gia' calcolato per ciascun hash presente nello store."""
+        hashes = list(hashes)
+        found = {}
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._conn.execute(
+                f"SELECT content_hash, MIN(row) FROM rows WHERE content_hash IN ({placeholders}) GROUP BY content_hash",
+                batch).fetchall())
+        return found
+
+    def get(self, chunk_id):
+        row = self.row_of(chunk_id)
+        return None if row is None else np.asarray(self.vectors[row])
+
+    def iter_ids(self):
+        """(riga, chunk_id) in ordine di riga, letti in streaming dall'indice."""
+        yield from self._conn.execute("SELECT row, chunk_id FROM rows ORDER BY row")
+
+    @property
+    def has_sources(self):
+        """False per gli store scritti prima che l'indice registrasse il documento di ogni riga."""
+        return any(column[1] == "source" for column in self._conn.execute("PRAGMA table_info(rows)"))
+
+    def count_sources(self, sources):
+        """Righe dei documenti indicati (0 se lo store non registra i documenti)."""
+        if not self.has_sources:
+            return 0
+        sources = list(sources)
+        total = 0
+        for start in range(0, len(sources), 500):
+            batch = sources[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            total += self._conn.execute(f"SELECT COUNT(*) FROM rows WHERE source IN ({placeholders})", batch).fetchone()[0]
+        return total
+
+    def iter_batches(self, batch_size=4096, exclude_sources=(), exclude_ids=()):
+        """
+        Righe dello store a lotti, in ordine di riga, saltando quelle dei documenti
+        o dei chunk_id indicati (es. per copiarle in una nuova versione).
+
+        Yields:
+            tuple: (chunk_id, hash, documenti o None, vettori (n, dim))
+        """
+        exclude_sources, exclude_ids = set(exclude_sources), set(exclude_ids)
+        source_column = "source" if self.has_sources else "NULL"
+        cursor = self._conn.execute(f"SELECT row, chunk_id, content_hash, {source_column} FROM rows ORDER BY row")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            rows = [row for row in rows if row[1] not in exclude_ids and row[3] not in exclude_sources]
+            if rows:
+                yield ([row[1] for row in rows], [row[2] for row in rows], [row[3] for row in rows],
+                       np.asarray(self.vectors[[row[0] for row in rows]]))
+
+    def close(self):
+        self._conn.close()
+        if isinstance(self.vectors, np.memmap):
+            del self.vectors
+
+
+class VectorStoreWriter:
+    """
+    Scrive uno store di vettori in streaming (a lotti, memoria costante) in una
+    nuova versione <path>/v<...> e in close() la pubblica sostituendo
+    atomicamente il file <path>/CURRENT che la indica: un lettore che apre lo
+    store vede sempre una versione completa, mai una directory mancante. La
+    versione precedente viene tenuta fino alla scrittura successiva, cosi' chi
+    ha appena letto CURRENT fa in tempo ad aprirla; le versioni complete piu'
+    vecchie vengono cancellate, quelle ancora in scrittura da altri writer no.
+    """
+
+    def __init__(self, path, dim, model_name, dtype="float32"):
+        """
+        Args:
+            path (str): Directory finale dello store
+            dim (int): Dimensione dei vettori
+            model_name (str): Modello che ha prodotto i vettori
+            dtype (str): "float32" o "float16"
+        """
+        if np.dtype(dtype) not in (np.dtype("float32"), np.dtype("float16")):
+            raise ValueError("dtype deve essere float32 o float16.")
+        self.path = Path(path)
+        self.version = f"v{time.time_ns()}-{os.getpid()}"
+        self.tmp_path = self.path / self.version
+        self.tmp_path.mkdir(parents=True)
+        self.dim = dim
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self._vectors = open(self.tmp_path / "vectors.bin", 'wb')
+        self._conn = sqlite3.connect(str(self.tmp_path / "index.sqlite"))
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute("CREATE TABLE rows (row INTEGER PRIMARY KEY, chunk_id TEXT, content_hash TEXT, source TEXT)")
+
+    def append(self, chunk_ids, hashes, vectors, sources=None):
+        """Aggiunge un lotto di vettori (n, dim) con i rispettivi chunk_id, hash e documenti (opzionali)."""
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Attesi vettori di dimensione {self.dim}, ricevuti {vectors.shape}.")
+        self._vectors.write(vectors.tobytes())
+        sources = [None] * len(vectors) if sources is None else sources
+        self._conn.executemany(
+            "INSERT INTO rows VALUES (?, ?, ?, ?)",
+            [(self.count + i, chunk_id, digest, source)
+             for i, (chunk_id, digest, source) in enumerate(zip(chunk_ids, hashes, sources))],
+        )
+        self.count += len(vectors)
+
+    def close(self):
+        """Completa lo store e lo sostituisce a quello esistente."""
+        self._vectors.close()
+        self._conn.execute("CREATE INDEX rows_chunk_id ON rows (chunk_id)")
+        self._conn.execute("CREATE INDEX rows_content_hash ON rows (content_hash)")
+        self._conn.execute("CREATE INDEX rows_source ON rows (source)")
+        self._conn.commit()
+        self._conn.close()
+        with open(self.tmp_path / "meta.json", 'w', encoding='utf-8') as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name, "count": self.count,
+                       "model_name": self.model_name}, f)
+
+        previous = _current_version(self.path)
+        pointer_tmp = self.path / f"{_CURRENT}.tmp{os.getpid()}"
+        with open(pointer_tmp, 'w', encoding='utf-8') as f:
+            f.write(self.version)
+        os.replace(pointer_tmp, self.path / _CURRENT)
+
+        # Restano la versione nuova e quella appena sostituita. Si cancellano solo le
+        # versioni complete (con meta.json) piu' vecchie della precedente: una
+        # directory senza meta.json puo' essere di un altro writer ancora in corso
+        if previous != self.path:
+            for child in self.path.iterdir():
+                if (child.is_dir() and child not in (self.tmp_path, previous) and (child / "meta.json").exists()
+                        and _version_time(child.name) < _version_time(previous.name)):
+                    shutil.rmtree(child, ignore_errors=True)
+        if previous == self.path:
+            # Store senza versioni: i vecchi file non sono piu' raggiungibili
+            for name in ("meta.json", "vectors.bin", "index.sqlite"):
+                (self.path / name).unlink(missing_ok=True)
+
+    def abort(self):
+        self._vectors.close()
+        self._conn.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
@@ -0,0 +1,410 @@
+import json
+import os
+import re
+import shutil
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Token lessicali: parole e numeri in minuscolo (i codici come "ERR-404" diventano "err", "404")."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _smallest_uint(max_value):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+class _Segment:
+    """
+    Segmento immutabile dell'indice: vocabolario ordinato e posting contigue.
+    Per ogni termine: doc id locali codificati a delta e frequenze, nel tipo
+    intero piu' piccolo sufficiente per il segmento, piu' la frequenza massima
+    e la lunghezza minima dei documenti della lista (per i limiti di MaxScore).
+    Il documento di origine di ogni chunk e' salvato come indice in sources.json.
+    """
+
+    # Posting decodificate per blocco nel calcolo dei df al netto dei cancellati
+    _DF_BLOCK = 1 << 20
+
+    def __init__(self, path, mmap=True):
+        self.path = Path(path)
+        mmap_mode = 'r' if mmap else None
+        with open(self.path / "terms.json", 'r', encoding='utf-8') as f:
+            self.term_ids = {term: i for i, term in enumerate(json.load(f))}
+        with open(self.path / "docs.json", 'r', encoding='utf-8') as f:
+            self.doc_ids = json.load(f)
+        self.offsets = np.load(self.path / "offsets.npy")
+        self.deltas = np.load(self.path / "deltas.npy", mmap_mode=mmap_mode)
+        self.tfs = np.load(self.path / "tfs.npy", mmap_mode=mmap_mode)
+        self.max_tf = np.load(self.path / "max_tf.npy")
+        self.min_dl = np.load(self.path / "min_dl.npy")
+        self.doc_lengths = np.load(self.path / "doc_lengths.npy")
+        # Segmenti scritti prima che l'indice registrasse i documenti: sources None
+        self.sources = self.source_ids = None
+        if (self.path / "sources.json").exists():
+            with open(self.path / "sources.json", 'r', encoding='utf-8') as f:
+                self.sources = json.load(f)
+            self.source_ids = np.load(self.path / "source_ids.npy")
+        # Documenti cancellati (tombstone) e df dei termini al netto di questi, None se non ce ne sono
+        self.deleted = None
+        self.live_df = None
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def set_deleted(self, local_ids):
+        """
+        Imposta i documenti locali cancellati: vengono esclusi dalle posting. I df
+        dei termini vengono ricalcolati qui una volta sola, non a ogni query.
+        """
+        if not len(local_ids):
+            self.deleted = None
+            self.live_df = None
+            return
+        self.deleted = np.zeros(len(self), dtype=bool)
+        self.deleted[list(local_ids)] = True
+        counts = np.diff(self.offsets)
+        dead = np.zeros(len(counts), dtype=np.int64)
+        term = 0
+        while term < len(counts):
+            # Blocco di termini consecutivi con circa _DF_BLOCK posting (almeno un termine)
+            end_term = int(np.searchsorted(self.offsets, self.offsets[term] + self._DF_BLOCK, side='right')) - 1
+            end_term = min(max(end_term, term + 1), len(counts))
+            start, end = self.offsets[term], self.offsets[end_term]
+            starts = self.offsets[term:end_term] - start
+            deltas = np.asarray(self.deltas[start:end], dtype=np.int64)
+            # Il primo delta di ogni termine e' il doc id assoluto: si azzera la somma del termine precedente
+            docs = np.cumsum(deltas)
+            docs -= np.repeat(docs[starts] - deltas[starts], counts[term:end_term])
+            dead[term:end_term] = np.add.reduceat(self.deleted[docs].astype(np.int64), starts)
+            term = end_term
+        self.live_df = counts - dead
+
+    def df(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return 0
+        if self.live_df is not None:
+            return int(self.live_df[term_id])
+        return int(self.offsets[term_id + 1] - self.offsets[term_id])
+
+    def docs_of_sources(self, sources, prefixes):
+        """
+        Documenti locali (cancellati compresi) dei chunk dei documenti indicati. I
+        segmenti senza sources.json confrontano il prefisso dei chunk_id.
+        """
+        if self.sources is None:
+            return [doc for doc, chunk_id in enumerate(self.doc_ids) if chunk_id.startswith(prefixes)]
+        wanted = np.array([source in sources for source in self.sources] + [False], dtype=bool)
+        return np.flatnonzero(wanted[self.source_ids]).tolist()
+
+    def postings(self, term_id):
+        """(doc locali crescenti, frequenze) di un termine, esclusi i documenti cancellati."""
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        docs = np.cumsum(self.deltas[start:end], dtype=np.int64)
+        tfs = np.asarray(self.tfs[start:end], dtype=np.float32)
+        if self.deleted is not None:
+            live = ~self.deleted[docs]
+            docs, tfs = docs[live], tfs[live]
+        return docs, tfs
+
+    @staticmethod
+    def write(path, doc_ids, doc_term_counts, doc_sources):
+        """
+        Scrive un segmento a partire dai conteggi dei termini di ogni documento.
+        I file vengono scritti in una directory temporanea rinominata alla fine,
+        quindi path esiste solo se il segmento e' completo.
+        """
+        final_path = Path(path)
+        path = final_path.with_name(final_path.name + ".tmp")
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True)
+        vocabulary = {}
+        term_column, doc_column, tf_column = [], [], []
+        for doc, counts in enumerate(doc_term_counts):
+            term_column.extend(vocabulary.setdefault(term, len(vocabulary)) for term in counts)
+            doc_column.extend([doc] * len(counts))
+            tf_column.extend(counts.values())
+        doc_lengths = np.array([sum(counts.values()) for counts in doc_term_counts], dtype=np.uint32)
+
+        # Riordina le posting per termine (in ordine alfabetico) e documento
+        terms = sorted(vocabulary)
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+        term_column = rank[np.array(term_column, dtype=np.int64)]
+        doc_column = np.array(doc_column, dtype=np.int64)
+        order = np.lexsort((doc_column, term_column))
+        term_column, docs, tfs = term_column[order], doc_column[order], np.array(tf_column, dtype=np.int64)[order]
+
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_column, minlength=len(terms)), out=offsets[1:])
+        starts = offsets[:-1]
+        deltas = np.diff(docs, prepend=0)
+        deltas[starts] = docs[starts]
+        if len(terms):
+            max_tf = np.maximum.reduceat(tfs, starts).astype(np.uint32)
+            min_dl = np.minimum.reduceat(doc_lengths[docs], starts).astype(np.uint32)
+        else:
+            max_tf = min_dl = np.zeros(0, dtype=np.uint32)
+
+        np.save(path / "offsets.npy", offsets)
+        np.save(path / "deltas.npy", deltas.astype(_smallest_uint(int(deltas.max(initial=0)))))
+        np.save(path / "tfs.npy", tfs.astype(_smallest_uint(int(tfs.max(initial=0)))))
+        np.save(path / "max_tf.npy", max_tf)
+        np.save(path / "min_dl.npy", min_dl)
+        np.save(path / "doc_lengths.npy", doc_lengths)
+        with open(path / "terms.json", 'w', encoding='utf-8') as f:
+            json.dump(terms, f)
+        with open(path / "docs.json", 'w', encoding='utf-8') as f:
+            json.dump(doc_ids, f)
+        source_index = {}
+        source_ids = [source_index.setdefault(source, len(source_index)) for source in doc_sources]
+        np.save(path / "source_ids.npy", np.array(source_ids, dtype=_smallest_uint(len(source_index))))
+        with open(path / "sources.json", 'w', encoding='utf-8') as f:
+            json.dump(list(source_index), f)
+        os.replace(path, final_path)
+
+
+class BM25Index:
+    """
+    Indice invertito BM25 sui chunk, per la ricerca lessicale (codici, messaggi
+    di errore, nomi) e ibrida. L'indice e' una lista di segmenti immutabili su
+    disco: add() scrive nuovi segmenti senza toccare quelli esistenti e
+    remove_sources() marca i chunk cancellati (tombstone) nei metadati, che
+    vengono esclusi da ricerca e statistiche (N, avgdl, df). La ricerca
+    top-k usa MaxScore: i termini sono ordinati per contributo massimo e, quando
+    i termini rimanenti non possono piu' portare un documento nuovo sopra la
+    soglia del k-esimo risultato, le loro posting servono solo ad aggiornare i
+    candidati gia' trovati, che vengono a loro volta scartati appena non possono
+    piu' raggiungere la soglia.
+    """
+
+    def __init__(self, path, k1=1.2, b=0.75, mmap=True):
+        """
+        Args:
+            path (str): Directory dell'indice (creata se non esiste)
+            k1 (float): Saturazione della frequenza dei termini
+            b (float): Normalizzazione per lunghezza del documento
+            mmap (bool): Apre le posting dei segmenti in memory-map
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self.mmap = mmap
+        self.segments = []
+        self.meta = {"segments": [], "num_docs": 0, "total_length": 0, "next_segment": 0, "deleted": {}}
+        if (self.path / "index.json").exists():
+            with open(self.path / "index.json", 'r', encoding='utf-8') as f:
+                self.meta.update(json.load(f))
+            self.meta["next_segment"] = max(self.meta["next_segment"], len(self.meta["segments"]))
+            self.segments = [_Segment(self.path / name, mmap) for name in self.meta["segments"]]
+            for segment in self.segments:
+                segment.set_deleted(self.meta["deleted"].get(segment.path.name, []))
+        self._remove_orphans()
+
+    def _remove_orphans(self):
+        """Cancella i segmenti non registrati nei metadati (scritture interrotte o segmenti svuotati)."""
+        registered = set(self.meta["segments"])
+        for child in self.path.iterdir():
+            if child.is_dir() and child.name.startswith("seg_") and child.name not in registered:
+                shutil.rmtree(child, ignore_errors=True)
+
+    def __len__(self):
+        return self.meta["num_docs"]
+
+    @property
+    def avgdl(self):
+        return self.meta["total_length"] / self.meta["num_docs"] if self.meta["num_docs"] else 0.0
+
+    def _save_meta(self):
+        tmp_path = self.path / "index.json.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.path / "index.json")
+
+    def _flush(self, doc_ids, doc_term_counts, doc_sources):
+        name = f"seg_{self.meta['next_segment']:06d}"
+        _Segment.write(self.path / name, doc_ids, doc_term_counts, doc_sources)
+        self.segments.append(_Segment(self.path / name, self.mmap))
+        self.meta["segments"].append(name)
+        self.meta["next_segment"] += 1
+        self.meta["num_docs"] += len(doc_ids)
+        self.meta["total_length"] += int(self.segments[-1].doc_lengths.sum())
+        self._save_meta()
+
+    def add(self, records, segment_size=100000):
+        """
+        Indicizza i chunk (ad es. ChunkManager.iter_chunks) in nuovi segmenti.
+
+        Args:
+            records (iterable[ChunkRecord]): I chunk da aggiungere
+            segment_size (int): Chunk per segmento (limita la memoria della costruzione)
+
+        Returns:
+            int: Numero di chunk aggiunti
+        """
+        doc_ids, doc_term_counts, doc_sources = [], [], []
+        added = 0
+        for record in records:
+            doc_ids.append(record.chunk_id)
+            doc_term_counts.append(Counter(tokenize(record.text)))
+            doc_sources.append(record.source)
+            if len(doc_ids) >= segment_size:
+                self._flush(doc_ids, doc_term_counts, doc_sources)
+                added += len(doc_ids)
+                doc_ids, doc_term_counts, doc_sources = [], [], []
+        if doc_ids:
+            self._flush(doc_ids, doc_term_counts, doc_sources)
+            added += len(doc_ids)
+        return added
+
+    def remove_sources(self, sources):
+        """
+        Cancella i chunk dei documenti indicati (ad es. modificati o eliminati, vedi
+        ChunkManager.chunk_incremental). I segmenti restano immutabili: i chunk
+        vengono marcati come cancellati e i segmenti rimasti vuoti eliminati.
+
+        Args:
+            sources (iterable[str]): Percorsi dei documenti (ChunkRecord.source)
+
+        Returns:
+            int: Numero di chunk cancellati
+        """
+        sources = set(sources)
+        if not sources:
+            return 0
+        prefixes = tuple(f"{Path(source).name}#" for source in sources)
+        removed = 0
+        emptied = []
+        for segment in self.segments:
+            name = segment.path.name
+            deleted = set(self.meta["deleted"].get(name, []))
+            new = [doc for doc in segment.docs_of_sources(sources, prefixes) if doc not in deleted]
+            if not new:
+                continue
+            removed += len(new)
+            self.meta["num_docs"] -= len(new)
+            self.meta["total_length"] -= int(segment.doc_lengths[new].sum())
+            deleted.update(new)
+            if len(deleted) == len(segment):
+                emptied.append(segment)
+                self.meta["deleted"].pop(name, None)
+            else:
+                self.meta["deleted"][name] = sorted(deleted)
+                segment.set_deleted(deleted)
+        if removed:
+            self.segments = [segment for segment in self.segments if segment not in emptied]
+            self.meta["segments"] = [segment.path.name for segment in self.segments]
+            self._save_meta()
+            self._remove_orphans()
+        return removed
+
+    def _idf(self, df):
+        n = self.meta["num_docs"]
+        return np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def _term_scores(self, idf, tfs, lengths):
+        norm = self.k1 * (1.0 - self.b + self.b * lengths / self.avgdl)
+        return idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+    def search(self, query, k=10):
+        """
+        I k chunk con punteggio BM25 piu' alto per la query.
+
+        Returns:
+            list[tuple[str, float]]: (chunk_id, punteggio) in ordine decrescente
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.segments or k <= 0:
+            return []
+        idf = {term: self._idf(sum(segment.df(term) for segment in self.segments)) for term in terms}
+
+        best_scores = np.zeros(0, dtype=np.float32)
+        best_docs = []
+        threshold = 0.0
+        for segment in self.segments:
+            entries = []
+            for term in terms:
+                term_id = segment.term_ids.get(term)
+                if term_id is None:
+                    continue
+                # Limite superiore del contributo: frequenza massima e documento piu' corto della lista
+                bound = self._term_scores(idf[term], float(segment.max_tf[term_id]), float(segment.min_dl[term_id]))
+                entries.append((bound, term_id, idf[term]))
+            if not entries:
+                continue
+            entries.sort(key=lambda entry: -entry[0])
+            remaining = np.cumsum([entry[0] for entry in entries][::-1])[::-1].tolist() + [0.0]
+
+            docs = np.zeros(0, dtype=np.int64)
+            scores = np.zeros(0, dtype=np.float32)
+            for j, (_, term_id, term_idf) in enumerate(entries):
+                term_docs, tfs = segment.postings(term_id)
+                if len(term_docs) == 0:
+                    # Tutte le posting del termine sono cancellate
+                    continue
+                if remaining[j] > threshold:
+                    # Termine essenziale: documenti nuovi possono ancora entrare nel top-k
+                    term_scores = self._term_scores(term_idf, tfs, segment.doc_lengths[term_docs])
+                    docs, inverse = np.unique(np.concatenate([docs, term_docs]), return_inverse=True)
+                    scores = np.bincount(inverse, weights=np.concatenate([scores, term_scores]),
+                                         minlength=len(docs)).astype(np.float32)
+                elif len(docs):
+                    # Termine non essenziale: aggiorna solo i candidati gia' trovati
+                    positions = np.searchsorted(term_docs, docs)
+                    positions[positions == len(term_docs)] = 0
+                    hit = term_docs[positions] == docs
+                    if hit.any():
+                        scores[hit] += self._term_scores(
+                            term_idf, tfs[positions[hit]], segment.doc_lengths[docs[hit]].astype(np.float32))
+                else:
+                    break
+
+                if len(scores) >= k or len(best_scores) >= k:
+                    kth = np.partition(np.concatenate([best_scores, scores]), -k)[-k]
+                    threshold = max(threshold, float(kth))
+                # Scarta i candidati che non possono piu' raggiungere la soglia
+                keep = scores + remaining[j + 1] >= threshold
+                if not keep.all():
+                    docs, scores = docs[keep], scores[keep]
+
+            candidates = np.concatenate([best_scores, scores])
+            candidate_docs = best_docs + [segment.doc_ids[doc] for doc in docs]
+            if len(candidates) > k:
+                top = np.argpartition(-candidates, k - 1)[:k]
+                candidates = candidates[top]
+                candidate_docs = [candidate_docs[i] for i in top]
+            best_scores, best_docs = candidates, candidate_docs
+            if len(best_scores) >= k:
+                threshold = max(threshold, float(best_scores.min()))
+
+        order = np.argsort(-best_scores, kind='stable')
+        return [(best_docs[i], float(best_scores[i])) for i in order]
+
+
+def reciprocal_rank_fusion(rankings, k=60, top_k=10):
+    """
+    Fonde piu' classifiche (ad es. BM25 e ricerca vettoriale) con la Reciprocal Rank Fusion.
+
+    Args:
+        rankings (list[list[str]]): Classifiche di chunk_id, dal migliore
+        k (int): Costante di smorzamento della RRF
+        top_k (int): Risultati restituiti
+
+    Returns:
+        list[tuple[str, float]]: (chunk_id, punteggio RRF) in ordine decrescente
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])[:top_k]
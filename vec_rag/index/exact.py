@@ -0,0 +1,146 @@
+from pathlib import Path
+
+import numpy as np
+
+_METRICS = ("cosine", "ip", "l2")
+
+
+def _merge_topk(best_scores, best_ids, scores, ids, k):
+    """Unisce i migliori k correnti con quelli di un nuovo blocco (punteggi piu' alti = migliori)."""
+    if best_scores is None:
+        return scores, ids
+    scores = np.concatenate([best_scores, scores], axis=1)
+    ids = np.concatenate([best_ids, ids], axis=1)
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        ids = np.take_along_axis(ids, keep, axis=1)
+    return scores, ids
+
+
+class ExactIndex:
+    """
+    Ricerca esatta (forza bruta) sulla matrice degli embedding, senza servizi
+    esterni. Le query vengono elaborate a lotti con un'unica moltiplicazione di
+    matrici per blocco di righe, il top-k di ogni blocco si ottiene con
+    argpartition e viene unito a quello corrente: la matrice puo' quindi essere un
+    np.memmap piu' grande della RAM, letto un blocco alla volta. Le norme dei
+    vettori (per cosine e l2) sono calcolate una sola volta alla costruzione.
+    """
+
+    def __init__(self, vectors, metric="cosine", block_size=65536, query_batch_size=256, norms=None):
+        """
+        Args:
+            vectors (np.ndarray | np.memmap): Matrice (n, dim) float32 o float16
+            metric (str): "cosine", "ip" (prodotto scalare) o "l2"
+            block_size (int): Righe lette e confrontate per volta
+            query_batch_size (int): Query elaborate insieme (limita la matrice dei punteggi)
+            norms (np.ndarray, optional): Norme gia' calcolate da un indice precedente
+        """
+        if metric not in _METRICS:
+            raise ValueError(f"Metrica sconosciuta: '{metric}'. Metriche valide: {list(_METRICS)}")
+        if vectors.ndim != 2:
+            raise ValueError("vectors deve essere una matrice (n, dim).")
+        self.vectors = vectors
+        self.metric = metric
+        self.block_size = block_size
+        self.query_batch_size = query_batch_size
+        self.norms = norms
+        if norms is None:
+            self._build()
+
+    @classmethod
+    def from_store(cls, store, metric="cosine", **kwargs):
+        """Indice sui vettori di un VectorStore (memory-mapped), con le norme in cache nella directory dello store."""
+        norms_path = Path(store.path) / f"norms_{metric}.npy"
+        norms = None
+        if metric != "ip" and norms_path.exists():
+            norms = np.load(norms_path)
+            if len(norms) != len(store):
+                norms = None
+        index = cls(store.vectors, metric, norms=norms, **kwargs)
+        if norms is None and index.norms is not None:
+            np.save(norms_path, index.norms)
+        return index
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def _blocks(self):
+        for start in range(0, len(self), self.block_size):
+            end = min(start + self.block_size, len(self))
+            yield start, end, np.asarray(self.vectors[start:end], dtype=np.float32)
+
+    def _build(self):
+        """Precalcola per blocchi l'inverso delle norme (cosine) o le norme al quadrato (l2)."""
+        if self.metric == "ip":
+            return
+        norms = np.empty(len(self), dtype=np.float32)
+        for start, end, block in self._blocks():
+            squared = np.einsum('ij,ij->i', block, block)
+            if self.metric == "cosine":
+                norm = np.sqrt(squared)
+                norms[start:end] = np.divide(1.0, norm, out=np.zeros_like(norm), where=norm > 0)
+            else:
+                norms[start:end] = squared
+        self.norms = norms
+
+    def _prepare_queries(self, queries):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query di dimensione {queries.shape[1]}, l'indice ha dimensione {self.dim}.")
+        if self.metric == "cosine":
+            norm = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = np.divide(queries, norm, out=np.zeros_like(queries), where=norm > 0)
+        return queries
+
+    def _search_batch(self, queries, k):
+        best_scores = best_ids = None
+        for start, end, block in self._blocks():
+            scores = queries @ block.T
+            if self.metric == "cosine":
+                scores *= self.norms[start:end]
+            elif self.metric == "l2":
+                # -||q - x||^2 a meno di ||q||^2, costante per ogni query
+                scores *= 2.0
+                scores -= self.norms[start:end]
+            block_k = min(k, end - start)
+            if block_k < end - start:
+                top = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                ids = top + start
+            else:
+                ids = np.broadcast_to(np.arange(start, end), scores.shape).copy()
+            best_scores, best_ids = _merge_topk(best_scores, best_ids, scores, ids, k)
+
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_ids = np.take_along_axis(best_ids, order, axis=1)
+        if self.metric == "l2":
+            best_scores = np.maximum(np.einsum('ij,ij->i', queries, queries)[:, None] - best_scores, 0.0)
+        return best_scores, best_ids
+
+    def search(self, queries, k=10):
+        """
+        Cerca i k vettori piu' vicini a ogni query.
+
+        Args:
+            queries (np.ndarray): Una query (dim,) o un lotto di query (nq, dim)
+            k (int): Numero di risultati per query
+
+        Returns:
+            tuple: (punteggi, righe), matrici (nq, k) ordinate dal migliore; per "l2" i
+                   punteggi sono distanze al quadrato (crescenti), altrimenti similarita' (decrescenti)
+        """
+        queries = self._prepare_queries(queries)
+        k = max(min(k, len(self)), 0)
+        if k == 0 or len(queries) == 0:
+            empty = np.zeros((len(queries), k))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        results = [self._search_batch(queries[start:start + self.query_batch_size], k)
+                   for start in range(0, len(queries), self.query_batch_size)]
+        return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
@@ -0,0 +1,292 @@
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+_METRICS = ("cosine", "ip", "l2")
+
+
+def _nearest_centroids(vectors, centroids, centroid_norms):
+    """Indice del centroide piu' vicino (distanza L2) per ogni vettore."""
+    # argmin ||x - c||^2 = argmax (2 x.c - ||c||^2)
+    scores = vectors @ centroids.T
+    scores *= 2.0
+    scores -= centroid_norms
+    return scores.argmax(axis=1)
+
+
+def assign_blocks(vectors, centroids, num_threads=1, block_size=65536):
+    """Centroide piu' vicino per ogni vettore, calcolato a blocchi su piu' thread."""
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    bounds = range(0, len(vectors), block_size)
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        parts = executor.map(
+            lambda start: _nearest_centroids(vectors[start:start + block_size], centroids, centroid_norms), bounds)
+        return np.concatenate(list(parts)) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+def kmeans(sample, k, iterations=20, seed=0, num_threads=1, block_size=65536):
+    """
+    k-means (Lloyd) su un campione in memoria.
+
+    Args:
+        sample (np.ndarray): Matrice float32 (n, dim) con n >= k
+        k (int): Numero di centroidi
+        seed (int | np.random.Generator): Seme, oppure un generatore da cui proseguire l'estrazione
+
+    Returns:
+        np.ndarray: Centroidi (k, dim) float32
+    """
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_blocks(sample, centroids, num_threads, block_size)
+        counts = np.bincount(assignments, minlength=k)
+        # Somme per cella: vettori ordinati per cella e ridotti per segmenti contigui
+        order = np.argsort(assignments, kind='stable')
+        present = np.flatnonzero(counts)
+        sums = np.zeros_like(centroids)
+        sums[present] = np.add.reduceat(sample[order], (np.cumsum(counts) - counts)[present], axis=0)
+        empty = counts == 0
+        centroids = sums / np.maximum(counts, 1)[:, None]
+        if empty.any():
+            # Celle vuote: ripartono da vettori casuali del campione
+            centroids[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Indice approssimato a liste invertite (IVF): k-means divide lo spazio in
+    nlist celle, ogni vettore e' salvato nella lista della cella piu' vicina e una
+    query confronta solo i vettori delle nprobe celle piu' vicine. nprobe regola il
+    compromesso tra recall e latenza. Le liste sono salvate contigue (vettori ordinati
+    per cella e offset di inizio), quindi l'indice si salva con np.save e si riapre
+    in memory-map. Costruzione e ricerca usano piu' thread (numpy rilascia il GIL
+    durante le moltiplicazioni di matrici).
+    """
+
+    def __init__(self, nlist=1024, metric="cosine", nprobe=8, num_threads=None, block_size=65536):
+        """
+        Args:
+            nlist (int): Numero di celle (liste invertite)
+            metric (str): "cosine", "ip" o "l2"
+            nprobe (int): Celle visitate per query (default per search)
+            num_threads (int, optional): Thread per costruzione e ricerca (default: numero di core)
+            block_size (int): Vettori elaborati per blocco durante la costruzione
+        """
+        if metric not in _METRICS:
+            raise ValueError(f"Metrica sconosciuta: '{metric}'. Metriche valide: {list(_METRICS)}")
+        self.nlist = nlist
+        self.metric = metric
+        self.nprobe = nprobe
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.block_size = block_size
+        self.centroids = None
+        self.offsets = None
+        self.ids = None
+        self.vectors = None
+        self.norms = None
+        self._tmp_dir = None
+
+    def __len__(self):
+        return 0 if self.ids is None else len(self.ids)
+
+    def _prepare(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.metric == "cosine":
+            norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = np.divide(vectors, norm, out=np.zeros_like(vectors), where=norm > 0)
+        return vectors
+
+    def _map_blocks(self, function, vectors):
+        """Applica function a blocchi di vettori su piu' thread, nell'ordine dei blocchi."""
+        bounds = [(start, min(start + self.block_size, len(vectors))) for start in range(0, len(vectors), self.block_size)]
+        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+            return list(executor.map(lambda bound: function(self._prepare(vectors[bound[0]:bound[1]])), bounds))
+
+    def train(self, vectors, iterations=20, sample_size=None, seed=0):
+        """
+        Calcola i centroidi con k-means (Lloyd) su un campione dei vettori.
+
+        Args:
+            vectors (np.ndarray | np.memmap): Matrice (n, dim)
+            iterations (int): Iterazioni di k-means
+            sample_size (int, optional): Vettori del campione (default: 64 per cella)
+            seed (int): Seme per campionamento e inizializzazione
+        """
+        rng = np.random.default_rng(seed)
+        n = len(vectors)
+        if n < self.nlist:
+            raise ValueError(f"Servono almeno nlist={self.nlist} vettori per l'addestramento, ricevuti {n}.")
+        sample_size = min(n, sample_size or 64 * self.nlist)
+        sample_rows = np.sort(rng.choice(n, size=sample_size, replace=False))
+        sample = self._prepare(vectors[sample_rows])
+
+        # Stesso generatore del campionamento: centroidi identici a quelli dell'implementazione precedente
+        centroids = kmeans(sample, self.nlist, iterations, rng, self.num_threads, self.block_size)
+        if self.metric == "cosine":
+            centroids = self._prepare(centroids)
+        self.centroids = centroids.astype(np.float32)
+        return self
+
+    def build(self, vectors, ids=None, directory=None, **train_kwargs):
+        """
+        Addestra (se necessario) e riempie l'indice con tutti i vettori. Le liste
+        vengono scritte a blocchi in un file .npy in memory-map, quindi la
+        costruzione non tiene in RAM una copia del corpus.
+
+        Args:
+            vectors (np.ndarray | np.memmap): Matrice (n, dim), ad es. VectorStore.vectors
+            ids (np.ndarray, optional): Id dei vettori (default: numero di riga)
+            directory (str, optional): Directory in cui scrivere le liste, la stessa da
+                                       passare poi a save() (default: directory temporanea)
+        """
+        if self.centroids is None:
+            self.train(vectors, **train_kwargs)
+        centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        assignments = np.concatenate(self._map_blocks(
+            lambda block: _nearest_centroids(block, self.centroids, centroid_norms), vectors))
+
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=self.nlist)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        ids = np.arange(len(vectors), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        self.ids = ids[order]
+
+        if directory is None:
+            self._tmp_dir = tempfile.TemporaryDirectory()
+            directory = self._tmp_dir.name
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.vectors = np.lib.format.open_memmap(
+            directory / "vectors.npy", mode='w+', dtype=np.float32, shape=(len(vectors), vectors.shape[1]))
+        self.norms = np.empty(len(vectors), dtype=np.float32) if self.metric == "l2" else None
+        for start in range(0, len(order), self.block_size):
+            rows = order[start:start + self.block_size]
+            block = self._prepare(vectors[np.sort(rows)])[np.argsort(np.argsort(rows))]
+            self.vectors[start:start + len(rows)] = block
+            if self.norms is not None:
+                self.norms[start:start + len(rows)] = np.einsum('ij,ij->i', block, block)
+        self.vectors.flush()
+        return self
+
+    def _search_batch(self, queries, probes, k):
+        """
+        Ricerca di un lotto di query, lista per lista: i vettori di ogni cella visitata
+        vengono confrontati con tutte le query che la visitano in un'unica
+        moltiplicazione di matrici, e il top-k di ogni query viene aggiornato in blocco.
+        """
+        nq = len(queries)
+        best_scores = np.full((nq, k), -np.inf, dtype=np.float32)
+        best_rows = np.full((nq, k), -1, dtype=np.int64)
+        query_of = np.repeat(np.arange(nq), probes.shape[1])
+        cells = probes.ravel()
+        order = np.argsort(cells, kind='stable')
+        cells, query_of = cells[order], query_of[order]
+        boundaries = np.flatnonzero(np.diff(cells)) + 1
+        for group in np.split(np.arange(len(cells)), boundaries):
+            cell = cells[group[0]]
+            start, end = self.offsets[cell], self.offsets[cell + 1]
+            if end <= start:
+                continue
+            qidx = query_of[group]
+            scores = queries[qidx] @ np.asarray(self.vectors[start:end], dtype=np.float32).T
+            if self.metric == "l2":
+                scores *= 2.0
+                scores -= self.norms[start:end]
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            if end - start > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = top + start
+            merged_scores = np.concatenate([best_scores[qidx], scores], axis=1)
+            merged_rows = np.concatenate([best_rows[qidx], rows], axis=1)
+            keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores[qidx] = np.take_along_axis(merged_scores, keep, axis=1)
+            best_rows[qidx] = np.take_along_axis(merged_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        found = best_rows >= 0
+        best_ids = np.where(found, np.asarray(self.ids)[np.where(found, best_rows, 0)], -1)
+        if self.metric == "l2":
+            squared = np.einsum('ij,ij->i', queries, queries)[:, None]
+            best_scores = np.where(found, np.maximum(squared - best_scores, 0.0), np.inf)
+        return best_scores, best_ids
+
+    def search(self, queries, k=10, nprobe=None):
+        """
+        Cerca i k vicini approssimati di ogni query visitando nprobe celle.
+
+        Returns:
+            tuple: (punteggi, id), matrici (nq, k) ordinate dal migliore; id -1 se le celle
+                   visitate contengono meno di k vettori. Per "l2" i punteggi sono distanze al quadrato
+        """
+        if self.centroids is None or self.ids is None:
+            raise RuntimeError("Indice vuoto: chiamare build() o load() prima di search().")
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        queries = self._prepare(np.atleast_2d(queries))
+        k = max(k, 0)
+        if k == 0 or len(queries) == 0:
+            return np.zeros((len(queries), k), dtype=np.float32), np.zeros((len(queries), k), dtype=np.int64)
+        centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        coarse = 2.0 * (queries @ self.centroids.T) - centroid_norms
+        if nprobe < self.nlist:
+            probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(self.nlist), coarse.shape)
+
+        # Un lotto di query per thread
+        batch = max(1, -(-len(queries) // self.num_threads))
+        starts = range(0, len(queries), batch)
+        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+            results = list(executor.map(
+                lambda start: self._search_batch(queries[start:start + batch], probes[start:start + batch], k), starts))
+        return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+    def save(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "centroids.npy", self.centroids)
+        np.save(directory / "offsets.npy", self.offsets)
+        np.save(directory / "ids.npy", self.ids)
+        if self.norms is not None:
+            np.save(directory / "norms.npy", self.norms)
+        target = directory / "vectors.npy"
+        source = getattr(self.vectors, "filename", None)
+        if source is None or not target.exists() or not target.samefile(source):
+            # Liste scritte altrove (es. directory temporanea): copiate a blocchi
+            out = np.lib.format.open_memmap(target, mode='w+', dtype=np.float32, shape=self.vectors.shape)
+            for start in range(0, len(self.vectors), self.block_size):
+                out[start:start + self.block_size] = self.vectors[start:start + self.block_size]
+            out.flush()
+            del out
+        else:
+            self.vectors.flush()
+        with open(directory / "ivf.json", 'w', encoding='utf-8') as f:
+            json.dump({"nlist": self.nlist, "metric": self.metric, "nprobe": self.nprobe}, f)
+
+    @classmethod
+    def load(cls, directory, num_threads=None, mmap=True):
+        """Riapre un indice salvato; con mmap=True liste e vettori restano su disco."""
+        directory = Path(directory)
+        with open(directory / "ivf.json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        index = cls(meta["nlist"], meta["metric"], meta["nprobe"], num_threads)
+        mmap_mode = 'r' if mmap else None
+        index.centroids = np.load(directory / "centroids.npy")
+        index.offsets = np.load(directory / "offsets.npy")
+        index.ids = np.load(directory / "ids.npy", mmap_mode=mmap_mode)
+        index.vectors = np.load(directory / "vectors.npy", mmap_mode=mmap_mode)
+        if index.metric == "l2":
+            if (directory / "norms.npy").exists():
+                index.norms = np.load(directory / "norms.npy", mmap_mode=mmap_mode)
+            else:
+                # Indici salvati prima che le norme venissero scritte
+                index.norms = np.einsum('ij,ij->i', index.vectors, index.vectors)
+        return index
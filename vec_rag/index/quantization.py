@@ -0,0 +1,283 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from vec_rag.index.exact import _merge_topk
+from vec_rag.index.ivf import assign_blocks, kmeans
+
+_METRICS = ("cosine", "ip", "l2")
+
+
+class ScalarQuantizer:
+    """
+    Quantizzazione scalare int8: ogni dimensione viene mappata linearmente
+    dall'intervallo [min, max] osservato in addestramento a 256 livelli.
+    4 volte meno memoria di float32, con perdita di recall di solito trascurabile.
+    """
+
+    kind = "sq8"
+
+    def __init__(self):
+        self.low = None
+        self.scale = None
+
+    @property
+    def code_size(self):
+        return len(self.low)
+
+    @property
+    def trained(self):
+        return self.low is not None
+
+    def train(self, sample):
+        self.low = sample.min(axis=0).astype(np.float32)
+        high = sample.max(axis=0).astype(np.float32)
+        self.scale = np.maximum(high - self.low, 1e-12) / 255.0
+        return self
+
+    def encode(self, vectors):
+        levels = np.rint((vectors - self.low) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes):
+        return (codes.astype(np.float32) + 128.0) * self.scale + self.low
+
+    def inner_products(self, queries, codes):
+        """Prodotti scalari approssimati query . decode(codes), senza decodificare i vettori."""
+        # q . ((c + 128) * scale + low) = (q * scale) . c + q . (128 * scale + low)
+        return (queries * self.scale) @ codes.T.astype(np.float32) + (queries @ (128.0 * self.scale + self.low))[:, None]
+
+    def sq_norms(self, codes):
+        decoded = self.decode(codes)
+        return np.einsum('ij,ij->i', decoded, decoded)
+
+    def state(self):
+        return {"low": self.low, "scale": self.scale}
+
+    def load_state(self, arrays):
+        self.low, self.scale = arrays["low"], arrays["scale"]
+        return self
+
+
+class ProductQuantizer:
+    """
+    Product quantization: il vettore e' diviso in m sottovettori, ognuno
+    sostituito dall'indice (1 byte) del centroide piu' vicino tra 256 appresi con
+    k-means. La ricerca usa l'asymmetric distance computation: per ogni query si
+    calcola una tabella (m, 256) di prodotti scalari e il punteggio di un vettore e'
+    la somma di m voci della tabella.
+    """
+
+    kind = "pq"
+
+    def __init__(self, m=16, iterations=20, num_threads=1, max_train_points=256 * 40):
+        """
+        Args:
+            m (int): Numero di sottovettori (byte per vettore); deve dividere la dimensione
+            iterations (int): Iterazioni di k-means per sottospazio
+            num_threads (int): Thread per il k-means
+            max_train_points (int): Vettori usati al massimo per addestrare ogni sottospazio
+        """
+        self.m = m
+        self.iterations = iterations
+        self.num_threads = num_threads
+        self.max_train_points = max_train_points
+        self.codebooks = None
+
+    @property
+    def code_size(self):
+        return self.m
+
+    @property
+    def trained(self):
+        return self.codebooks is not None
+
+    def _subspaces(self, vectors):
+        dim = vectors.shape[1]
+        if dim % self.m:
+            raise ValueError(f"La dimensione {dim} non e' divisibile per m={self.m}.")
+        return np.split(vectors, self.m, axis=1)
+
+    def train(self, sample):
+        if len(sample) < 256:
+            raise ValueError("Servono almeno 256 vettori per addestrare il product quantizer.")
+        if len(sample) > self.max_train_points:
+            rows = np.random.default_rng(0).choice(len(sample), size=self.max_train_points, replace=False)
+            sample = sample[np.sort(rows)]
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(sub), 256, self.iterations, seed=i, num_threads=self.num_threads)
+            for i, sub in enumerate(self._subspaces(sample))
+        ])
+        return self
+
+    def encode(self, vectors):
+        return np.stack([
+            assign_blocks(np.ascontiguousarray(sub), self.codebooks[i]).astype(np.uint8)
+            for i, sub in enumerate(self._subspaces(vectors))
+        ], axis=1)
+
+    def decode(self, codes):
+        return np.concatenate([self.codebooks[i][codes[:, i]] for i in range(self.m)], axis=1)
+
+    def inner_products(self, queries, codes):
+        # Tabelle ADC (nq, m, 256): prodotto scalare di ogni sottoquery con ogni centroide
+        tables = np.einsum('qmd,mkd->qmk', queries.reshape(len(queries), self.m, -1), self.codebooks)
+        scores = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for i in range(self.m):
+            # np.take con indici intp e' molto piu' veloce dell'indicizzazione con uint8
+            scores += np.take(tables[:, i, :], codes[:, i].astype(np.intp), axis=1)
+        return scores
+
+    def sq_norms(self, codes):
+        centroid_norms = np.einsum('mkd,mkd->mk', self.codebooks, self.codebooks)
+        return sum(centroid_norms[i][codes[:, i]] for i in range(self.m))
+
+    def state(self):
+        return {"codebooks": self.codebooks}
+
+    def load_state(self, arrays):
+        self.codebooks = arrays["codebooks"]
+        self.m = self.codebooks.shape[0]
+        return self
+
+
+class QuantizedIndex:
+    """
+    Ricerca sui codici compressi (ScalarQuantizer o ProductQuantizer) con
+    re-ranking esatto opzionale: i rerank_factor * k migliori candidati
+    approssimati vengono rivalutati sui vettori a piena precisione, che possono
+    restare su disco (ad es. VectorStore.vectors in memory-map).
+    """
+
+    def __init__(self, quantizer, metric="cosine", block_size=65536, rerank_vectors=None, rerank_factor=4):
+        """
+        Args:
+            quantizer (ScalarQuantizer | ProductQuantizer): Quantizzatore (addestrato in build se necessario)
+            metric (str): "cosine", "ip" o "l2"
+            block_size (int): Codici confrontati per volta
+            rerank_vectors (np.ndarray | np.memmap, optional): Vettori originali per il re-ranking esatto
+            rerank_factor (int): Candidati rivalutati per ogni risultato richiesto
+        """
+        if metric not in _METRICS:
+            raise ValueError(f"Metrica sconosciuta: '{metric}'. Metriche valide: {list(_METRICS)}")
+        self.quantizer = quantizer
+        self.metric = metric
+        self.block_size = block_size
+        self.rerank_vectors = rerank_vectors
+        self.rerank_factor = rerank_factor
+        self.codes = None
+        self.sq_norms = None
+
+    def __len__(self):
+        return 0 if self.codes is None else len(self.codes)
+
+    def _prepare(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.metric == "cosine":
+            norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = np.divide(vectors, norm, out=np.zeros_like(vectors), where=norm > 0)
+        return vectors
+
+    def build(self, vectors, sample_size=65536, seed=0):
+        """Addestra il quantizzatore (se necessario) su un campione e codifica tutti i vettori a blocchi."""
+        if not self.quantizer.trained:
+            rng = np.random.default_rng(seed)
+            rows = np.sort(rng.choice(len(vectors), size=min(len(vectors), sample_size), replace=False))
+            self.quantizer.train(self._prepare(vectors[rows]))
+        self.codes = np.concatenate([
+            self.quantizer.encode(self._prepare(vectors[start:start + self.block_size]))
+            for start in range(0, len(vectors), self.block_size)
+        ])
+        if self.metric == "l2":
+            self.sq_norms = self.quantizer.sq_norms(self.codes).astype(np.float32)
+        return self
+
+    def memory_bytes(self):
+        """Memoria dei codici e dei parametri del quantizzatore (esclusi i vettori per il re-ranking)."""
+        total = self.codes.nbytes if self.codes is not None else 0
+        total += sum(array.nbytes for array in self.quantizer.state().values())
+        if self.sq_norms is not None:
+            total += self.sq_norms.nbytes
+        return total
+
+    def _approximate_scores(self, queries, start, end):
+        scores = self.quantizer.inner_products(queries, self.codes[start:end])
+        if self.metric == "l2":
+            scores *= 2.0
+            scores -= self.sq_norms[start:end]
+        return scores
+
+    def _exact_scores(self, queries, candidates):
+        """Punteggi esatti (piu' alti = migliori) delle righe candidate per ogni query."""
+        scores = np.empty(candidates.shape, dtype=np.float32)
+        for i, rows in enumerate(candidates):
+            order = np.argsort(rows)
+            vectors = self._prepare(self.rerank_vectors[rows[order]])
+            exact = vectors @ queries[i]
+            if self.metric == "l2":
+                exact = 2.0 * exact - np.einsum('ij,ij->i', vectors, vectors)
+            scores[i, order] = exact
+        return scores
+
+    def search(self, queries, k=10, rerank=None):
+        """
+        Args:
+            queries (np.ndarray): Query (dim,) o (nq, dim)
+            k (int): Risultati per query
+            rerank (bool, optional): Re-ranking esatto (default: se sono disponibili i vettori originali)
+
+        Returns:
+            tuple: (punteggi, righe) come ExactIndex.search
+        """
+        queries = self._prepare(np.atleast_2d(queries))
+        rerank = self.rerank_vectors is not None if rerank is None else rerank
+        if rerank and self.rerank_vectors is None:
+            raise ValueError("Re-ranking richiesto ma rerank_vectors non e' impostato.")
+        k = max(min(k, len(self)), 0)
+        if k == 0 or len(queries) == 0:
+            return np.zeros((len(queries), k), dtype=np.float32), np.zeros((len(queries), k), dtype=np.int64)
+        candidates_k = min(len(self), k * self.rerank_factor) if rerank else k
+
+        best_scores = best_rows = None
+        for start in range(0, len(self), self.block_size):
+            end = min(start + self.block_size, len(self))
+            scores = self._approximate_scores(queries, start, end)
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            if end - start > candidates_k:
+                top = np.argpartition(-scores, candidates_k - 1, axis=1)[:, :candidates_k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = top + start
+            best_scores, best_rows = _merge_topk(best_scores, best_rows, scores, np.asarray(rows), candidates_k)
+
+        if rerank:
+            best_scores = self._exact_scores(queries, best_rows)
+        order = np.argsort(-best_scores, axis=1, kind='stable')[:, :k]
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        if self.metric == "l2":
+            best_scores = np.maximum(np.einsum('ij,ij->i', queries, queries)[:, None] - best_scores, 0.0)
+        return best_scores, best_rows
+
+    def save(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "codes.npy", self.codes)
+        np.savez(directory / "quantizer.npz", **self.quantizer.state())
+        with open(directory / "quantized.json", 'w', encoding='utf-8') as f:
+            json.dump({"kind": self.quantizer.kind, "metric": self.metric, "rerank_factor": self.rerank_factor}, f)
+
+    @classmethod
+    def load(cls, directory, rerank_vectors=None, mmap=True):
+        """Riapre un indice salvato; i codici restano su disco con mmap=True."""
+        directory = Path(directory)
+        with open(directory / "quantized.json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        quantizer = ScalarQuantizer() if meta["kind"] == "sq8" else ProductQuantizer()
+        with np.load(directory / "quantizer.npz") as arrays:
+            quantizer.load_state({name: arrays[name] for name in arrays.files})
+        index = cls(quantizer, meta["metric"], rerank_vectors=rerank_vectors, rerank_factor=meta["rerank_factor"])
+        index.codes = np.load(directory / "codes.npy", mmap_mode='r' if mmap else None)
+        if index.metric == "l2":
+            index.sq_norms = quantizer.sq_norms(np.asarray(index.codes)).astype(np.float32)
+        return index